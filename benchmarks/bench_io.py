@@ -0,0 +1,97 @@
+"""
+HTTP transfer benchmark: bytes downloaded per CPU-second of the client.
+
+Compares the streaming loop HttpDownloader used before (fixed-size
+iter_content chunks written and hashed on the network thread) with the
+current path (adaptive readinto buffers and a write-behind file). The file
+is served by benchmarks.server in a child process, so only the
+downloader's CPU is counted, including the writer thread.
+
+    python -m benchmarks.bench_io [--size-mb 256] [--repeat 3] [--json out.json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import requests
+
+from benchmarks.server import ServerConfig, spawn
+from core.cancellation import CancellationToken
+from downloaders.file_downloader import FileDownloader
+from downloaders.partial import partial_path
+
+
+def legacy_download(session, url, output_folder, chunk_size):
+    """The single-stream write loop HttpDownloader used before the write-behind stage"""
+    path = partial_path(output_folder, url)
+    hasher = hashlib.sha256()
+    with session.get(url, stream=True) as response, open(path, "wb") as file:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if chunk:
+                file.write(chunk)
+                hasher.update(chunk)
+    os.remove(path)
+    return hasher.hexdigest()
+
+
+def current_download(session, url, output_folder):
+    downloader = FileDownloader(output_folder, segments=1, session=session)
+    path = downloader._stream(url, output_folder, lambda response: "bench.bin", CancellationToken())
+    os.remove(path)
+
+
+def bench(run, size, repeat):
+    cpu_seconds, wall_seconds = [], []
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        run()
+        cpu_seconds.append(time.process_time() - cpu)
+        wall_seconds.append(time.perf_counter() - wall)
+    cpu, wall = min(cpu_seconds), min(wall_seconds)
+    return {
+        "bytes": size,
+        "cpu_seconds": cpu,
+        "wall_seconds": wall,
+        "mb_per_cpu_second": size / cpu / 1e6,
+        "mb_per_second": size / wall / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory() as output:
+        server, base_url = spawn(ServerConfig())
+        url = f"{base_url}/file/{size}/bench.bin"
+        session = requests.Session()
+        try:
+            variants = {
+                "iter_content_1k": lambda: legacy_download(session, url, output, 1024),
+                "iter_content_8k": lambda: legacy_download(session, url, output, 8192),
+                "adaptive_write_behind": lambda: current_download(session, url, output),
+            }
+            results = {name: bench(run, size, args.repeat) for name, run in variants.items()}
+        finally:
+            server.terminate()
+            server.wait()
+
+    for name, values in results.items():
+        row = ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in values.items())
+        print(f"{name}: {row}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Scheduler benchmark: CPU burned by the dispatch loop and dispatch latency.
+
+Compares DownloadManager.start_downloads against the previous busy-polling
+loop, using a stub download that only sleeps so no network is involved.
+
+    python -m benchmarks.bench_scheduler [--tasks 2000] [--json out.json]
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import threading
+import time
+
+from managers.download_manager import DownloadManager
+
+
+def legacy_start_downloads(manager, progress_callback=None, prompt_user=None):
+    """The busy-polling loop start_downloads used before the event-driven scheduler"""
+    active_futures = []
+    while not manager.queue.empty() or active_futures:
+        optimal_workers = min(
+            manager.max_workers, max(manager.min_workers, len(active_futures) + 1)
+        )
+        if len(active_futures) < optimal_workers:
+            task = manager.queue.get()
+            if task:
+                future = manager.executor.submit(
+                    manager.download, task, progress_callback, prompt_user
+                )
+                active_futures.append(future)
+        active_futures = [f for f in active_futures if not f.done()]
+
+
+def _make_manager(folder, work_seconds, started):
+    manager = DownloadManager(folder, max_workers=5)
+
+    def fake_download(task, progress_callback=None, prompt_user=None):
+        started[task.url] = time.perf_counter()
+        time.sleep(work_seconds)
+        manager.active_downloads.pop(task.url, None)
+
+    manager.download = fake_download
+    return manager
+
+
+def _run_scheduler(run, manager):
+    """Run ``run(manager)`` on its own thread and return its CPU seconds"""
+    result = {}
+
+    def target():
+        cpu = time.thread_time()
+        run(manager)
+        result["cpu"] = time.thread_time() - cpu
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, result
+
+
+def bench_throughput(run, tasks, work_seconds):
+    """Queue everything up front and drain it"""
+    with tempfile.TemporaryDirectory() as folder:
+        started = {}
+        manager = _make_manager(folder, work_seconds, started)
+        for i in range(tasks):
+            manager.queue_download(f"http://bench.invalid/{i}")
+        wall = time.perf_counter()
+        thread, result = _run_scheduler(run, manager)
+        thread.join()
+        wall = time.perf_counter() - wall
+        manager.executor.shutdown()
+        ideal = tasks * work_seconds / manager.max_workers
+        return {
+            "tasks": tasks,
+            "wall_seconds": wall,
+            "scheduler_cpu_seconds": result["cpu"],
+            "overhead_vs_ideal": wall / ideal,
+        }
+
+
+def bench_latency(run, tasks, interval):
+    """Trickle tasks in while a long download keeps the scheduler alive"""
+    with tempfile.TemporaryDirectory() as folder:
+        started = {}
+        manager = _make_manager(folder, 0.001, started)
+        # A slow task keeps the legacy loop from exiting while the queue is empty.
+        manager.queue_download("http://bench.invalid/keepalive", priority=10)
+        original = manager.download
+
+        def download(task, *args):
+            if task.url.endswith("keepalive"):
+                time.sleep(tasks * interval + 0.5)
+                return
+            original(task, *args)
+
+        manager.download = download
+        thread, result = _run_scheduler(run, manager)
+        queued = {}
+        for i in range(tasks):
+            time.sleep(interval)
+            url = f"http://bench.invalid/{i}"
+            queued[url] = time.perf_counter()
+            manager.queue_download(url)
+        thread.join()
+        manager.executor.shutdown()
+        latencies = sorted((started[url] - queued[url]) * 1000 for url in queued)
+        return {
+            "tasks": tasks,
+            "scheduler_cpu_seconds": result["cpu"],
+            "dispatch_latency_ms_p50": statistics.median(latencies),
+            "dispatch_latency_ms_p99": latencies[int(len(latencies) * 0.99) - 1],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--work-ms", type=float, default=2.0)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    schedulers = {
+        "busy_polling": legacy_start_downloads,
+        "event_driven": lambda manager: manager.start_downloads(),
+    }
+    results = {}
+    for name, run in schedulers.items():
+        results[name] = {
+            "throughput": bench_throughput(run, args.tasks, args.work_ms / 1000),
+            "latency": bench_latency(run, 200, 0.005),
+        }
+
+    for name, result in results.items():
+        print(f"{name}:")
+        for section, values in result.items():
+            row = ", ".join(f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}" for k, v in values.items())
+            print(f"  {section}: {row}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Local stand-in HTTP server for benchmarks, so nothing needs the network.
+
+Serves synthetic files with Range/If-Range, ETag/Last-Modified and
+conditional GETs, optional per-request latency, per-connection bandwidth
+and injected failures. Content is generated from the path, so huge files
+cost no memory and are identical on every run.
+
+    python -m benchmarks.server [--port 8000] [--latency-ms 20] [--bandwidth-mbps 50]
+
+Corpora:
+    /small/<i>.bin   --small-count files of --small-size bytes
+    /huge/<i>.bin    --huge-count files of --huge-size bytes
+    /file/<size>/<name>   any size on demand
+"""
+import argparse
+import hashlib
+import http.server
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+_BLOCK = 64 * 1024
+
+
+@dataclass
+class ServerConfig:
+    small_count: int = 1000
+    small_size: int = 16 * 1024
+    huge_count: int = 2
+    huge_size: int = 256 * 1024 * 1024
+    latency: float = 0.0  # seconds before each response
+    bandwidth: Optional[float] = None  # bytes per second per connection
+    error_rate: float = 0.0  # share of GETs answered with 500
+    throttle_rate: float = 0.0  # share of GETs answered with 429 + Retry-After
+    drop_rate: float = 0.0  # share of GETs whose connection drops halfway through the body
+    retry_after: int = 1
+    seed: int = 0
+
+
+@dataclass
+class ServerStats:
+    requests: int = 0
+    range_requests: int = 0
+    not_modified: int = 0
+    errors: int = 0
+    throttled: int = 0
+    dropped: int = 0
+    bytes_sent: int = 0
+    connections: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **counts: int) -> None:
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {k: v for k, v in vars(self).items() if k != "lock"}
+
+
+@lru_cache(maxsize=256)
+def _content_block(path: str) -> bytes:
+    """64 KiB of pseudo-random bytes derived from ``path``; files repeat it with a rolling offset."""
+    seed = hashlib.sha256(path.encode()).digest()
+    return random.Random(seed).getrandbits(_BLOCK * 8).to_bytes(_BLOCK, "little")
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "BenchServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.stats.add(connections=1)
+
+    def _resolve(self) -> Optional[int]:
+        path = self.path.split("?", 1)[0]
+        config = self.server.config
+        match = re.fullmatch(r"/(small|huge)/(\d+)\.bin", path)
+        if match:
+            kind, index = match.group(1), int(match.group(2))
+            if kind == "small" and index < config.small_count:
+                return config.small_size
+            if kind == "huge" and index < config.huge_count:
+                return config.huge_size
+            return None
+        match = re.fullmatch(r"/file/(\d+)/[^/]+", path)
+        return int(match.group(1)) if match else None
+
+    def _etag(self, size: int) -> str:
+        return '"%s"' % hashlib.md5(f"{self.path.split('?', 1)[0]}:{size}".encode()).hexdigest()
+
+    def _send_empty(self, code: int, headers: Tuple[Tuple[str, str], ...] = ()) -> None:
+        self.send_response(code)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _headers(self, code: int, size: int, length: int, extra=()) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", self._etag(size))
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        for name, value in extra:
+            self.send_header(name, value)
+        self.end_headers()
+
+    def do_HEAD(self) -> None:
+        size = self._resolve()
+        if size is None:
+            self._send_empty(404)
+            return
+        self._headers(200, size, size)
+
+    def do_GET(self) -> None:
+        config, stats = self.server.config, self.server.stats
+        stats.add(requests=1)
+        if config.latency:
+            time.sleep(config.latency)
+        size = self._resolve()
+        if size is None:
+            self._send_empty(404)
+            return
+        roll = self.server.roll()
+        if roll < config.error_rate:
+            stats.add(errors=1)
+            self._send_empty(500)
+            return
+        roll -= config.error_rate
+        if roll < config.throttle_rate:
+            stats.add(throttled=1)
+            self._send_empty(429, (("Retry-After", str(config.retry_after)),))
+            return
+        roll -= config.throttle_rate
+        drop = roll < config.drop_rate
+
+        etag = self._etag(size)
+        if self.headers.get("If-None-Match") == etag:
+            stats.add(not_modified=1)
+            self._send_empty(304, (("ETag", etag),))
+            return
+
+        start, end = 0, size
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if match and (if_range is None or if_range in (etag, LAST_MODIFIED)):
+            start = int(match.group(1))
+            end = min(size, int(match.group(2)) + 1) if match.group(2) else size
+            if start >= size:
+                self._send_empty(416, (("Content-Range", f"bytes */{size}"),))
+                return
+            stats.add(range_requests=1)
+            self._headers(206, size, end - start, (("Content-Range", f"bytes {start}-{end - 1}/{size}"),))
+        else:
+            self._headers(200, size, size)
+
+        stop = start + (end - start) // 2 if drop else end
+        self._send_body(start, stop)
+        if drop:
+            stats.add(dropped=1)
+            self.close_connection = True
+
+    def _send_body(self, start: int, end: int) -> None:
+        block = _content_block(self.path.split("?", 1)[0])
+        bandwidth = self.server.config.bandwidth
+        began = time.monotonic()
+        sent = 0
+        position = start
+        try:
+            while position < end:
+                offset = position % _BLOCK
+                chunk = block[offset:offset + min(_BLOCK - offset, end - position)]
+                self.wfile.write(chunk)
+                position += len(chunk)
+                sent += len(chunk)
+                if bandwidth:
+                    ahead = sent / bandwidth - (time.monotonic() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server.stats.add(bytes_sent=sent)
+
+
+def expected_content(path: str, size: int) -> bytes:
+    """The bytes the server sends for ``path`` (only sensible for small sizes)."""
+    block = _content_block(path)
+    return (block * (size // _BLOCK + 1))[:size]
+
+
+class BenchServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: Optional[ServerConfig] = None, port: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.config = config or ServerConfig()
+        self.stats = ServerStats()
+        self._random = random.Random(self.config.seed)
+        self._random_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def roll(self) -> float:
+        with self._random_lock:
+            return self._random.random()
+
+    def start(self) -> "BenchServer":
+        """Serve on a background thread of this process."""
+        self._thread = threading.Thread(target=self.serve_forever, name="BenchServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def _config_args(config: ServerConfig):
+    args = [
+        "--small-count", str(config.small_count), "--small-size", str(config.small_size),
+        "--huge-count", str(config.huge_count), "--huge-size", str(config.huge_size),
+        "--latency-ms", str(config.latency * 1000),
+        "--error-rate", str(config.error_rate), "--throttle-rate", str(config.throttle_rate),
+        "--drop-rate", str(config.drop_rate), "--retry-after", str(config.retry_after),
+        "--seed", str(config.seed),
+    ]
+    if config.bandwidth:
+        args += ["--bandwidth-mbps", str(config.bandwidth * 8 / 1e6)]
+    return args
+
+
+def spawn(config: Optional[ServerConfig] = None) -> Tuple[subprocess.Popen, str]:
+    """
+    Run the server in a child process, so its CPU time is not counted
+    against the downloader being measured. Returns the process and base URL.
+    """
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.server", "--port", "0", *_config_args(config or ServerConfig())],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    base_url = process.stdout.readline().strip()
+    if not base_url:
+        process.kill()
+        raise RuntimeError("Benchmark server failed to start")
+    return process, base_url
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.server", description=__doc__.split("\n")[1])
+    defaults = ServerConfig()
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--small-count", type=int, default=defaults.small_count)
+    parser.add_argument("--small-size", type=int, default=defaults.small_size)
+    parser.add_argument("--huge-count", type=int, default=defaults.huge_count)
+    parser.add_argument("--huge-size", type=int, default=defaults.huge_size)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--bandwidth-mbps", type=float, help="per-connection bandwidth in megabits per second")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    config = ServerConfig(
+        small_count=args.small_count,
+        small_size=args.small_size,
+        huge_count=args.huge_count,
+        huge_size=args.huge_size,
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth_mbps * 1e6 / 8 if args.bandwidth_mbps else None,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        drop_rate=args.drop_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    server = BenchServer(config, args.port)
+    print(server.base_url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Benchmark suite for the download engines, runnable on an offline machine.
+
+Runs every benchmark against the local stand-in server (benchmarks.server)
+and writes the results as JSON, so runs can be compared for regressions:
+
+    python -m benchmarks.suite --json before.json
+    ... change something ...
+    python -m benchmarks.suite --json after.json --compare before.json
+
+Benchmarks: end-to-end throughput (many small files, a few huge ones, and
+small files with injected errors), scheduler dispatch overhead, queue
+operations at 100k items, memory per queued task and the cost of the
+progress path that feeds the GUI.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Optional
+
+from benchmarks import bench_scheduler
+from benchmarks.server import ServerConfig, spawn
+from core.download_task import DownloadTask
+from core.priority_queue import PriorityDownloadQueue
+from core.progress import ProgressBus, ProgressThrottle
+from core.tracing import enable_tracing
+from managers.download_manager import DownloadManager
+from utils.logging_setup import setup_logging
+
+
+def _timed(run: Callable[[], Any]) -> Dict[str, float]:
+    wall, cpu = time.perf_counter(), time.process_time()
+    run()
+    return {"wall_seconds": time.perf_counter() - wall, "cpu_seconds": time.process_time() - cpu}
+
+
+def bench_end_to_end(config: ServerConfig, paths, **manager_options) -> Dict[str, Any]:
+    """Download ``paths`` from a server child process with a fresh DownloadManager"""
+    server, base_url = spawn(config)
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            manager = DownloadManager(folder, revalidate=False, **manager_options)
+            for path in paths:
+                manager.queue_download(base_url + path, choice="file")
+            outcomes: Dict[str, int] = {}
+            lock = threading.Lock()
+
+            def progress(task):
+                if task.status in ("completed", "failed", "stopped"):
+                    with lock:
+                        outcomes[task.url] = task.status
+
+            result = _timed(lambda: manager.start_downloads(progress))
+            manager.executor.shutdown()
+            if manager.journal:
+                manager.journal.close()
+            downloaded = sum(
+                os.path.getsize(os.path.join(folder, name))
+                for name in os.listdir(folder)
+                if name.endswith(".bin")
+            )
+    finally:
+        server.terminate()
+        server.wait()
+    statuses = list(outcomes.values())
+    result.update(
+        files=len(paths),
+        completed=statuses.count("completed"),
+        failed=statuses.count("failed"),
+        bytes=downloaded,
+        mb_per_second=downloaded / result["wall_seconds"] / 1e6,
+        mb_per_cpu_second=downloaded / result["cpu_seconds"] / 1e6 if result["cpu_seconds"] else None,
+        files_per_second=len(paths) / result["wall_seconds"],
+    )
+    return result
+
+
+def bench_scheduler_overhead(tasks: int) -> Dict[str, Any]:
+    run = lambda manager: manager.start_downloads()
+    return {
+        "throughput": bench_scheduler.bench_throughput(run, tasks, 0.002),
+        "latency": bench_scheduler.bench_latency(run, 200, 0.005),
+    }
+
+
+def bench_queue(items: int) -> Dict[str, float]:
+    """Microseconds per PriorityDownloadQueue operation with ``items`` queued"""
+    tasks = [
+        DownloadTask(url=f"http://host{i % 50}.test/file{i}", filename="", priority=i % 10)
+        for i in range(items)
+    ]
+    queue = PriorityDownloadQueue()
+    sample = tasks[:: max(1, items // 10000)]
+    per_op = lambda seconds, count: seconds / count * 1e6
+
+    start = time.perf_counter()
+    for task in tasks:
+        queue.put(task)
+    put = per_op(time.perf_counter() - start, items)
+
+    start = time.perf_counter()
+    for task in sample:
+        task.url in queue
+    contains = per_op(time.perf_counter() - start, len(sample))
+
+    start = time.perf_counter()
+    for task in sample:
+        queue.update_priority(task.url, 20)
+    update = per_op(time.perf_counter() - start, len(sample))
+
+    blocked = {f"host{i}.test" for i in range(25)}
+    start = time.perf_counter()
+    for _ in range(len(sample)):
+        queue.get(blocked=blocked)
+    get_blocked = per_op(time.perf_counter() - start, len(sample))
+
+    removed = tasks[1:: max(1, items // 10000)]
+    start = time.perf_counter()
+    for task in removed:
+        queue.remove(task.url)
+    remove = per_op(time.perf_counter() - start, len(removed))
+
+    remaining = len(queue)
+    start = time.perf_counter()
+    while queue.get() is not None:
+        pass
+    get = per_op(time.perf_counter() - start, max(1, remaining))
+    return {
+        "items": items,
+        "put_us": put,
+        "contains_us": contains,
+        "update_priority_us": update,
+        "get_with_blocked_hosts_us": get_blocked,
+        "remove_us": remove,
+        "get_us": get,
+    }
+
+
+def bench_memory(tasks: int) -> Dict[str, float]:
+    """Bytes of Python heap per task queued through DownloadManager.queue_download"""
+    with tempfile.TemporaryDirectory() as folder:
+        manager = DownloadManager(folder, journal=False, dedup=False, revalidate=False)
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for i in range(tasks):
+            manager.queue_download(f"http://host{i % 50}.test/file{i}", choice="file")
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        managed = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+        manager.executor.shutdown()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    bare = [DownloadTask(url=f"http://host.test/file{i}", filename="") for i in range(tasks)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    task_only = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del bare
+    return {
+        "tasks": tasks,
+        "bytes_per_queued_task": managed / tasks,
+        "bytes_per_download_task": task_only / tasks,
+    }
+
+
+def bench_progress(tasks: int, chunks: int) -> Dict[str, Optional[float]]:
+    """
+    Cost of the per-chunk progress path the GUI listens to: the manager's
+    throttled reporter publishing into a ProgressBus, and the UI draining it.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        manager = DownloadManager(folder, journal=False, dedup=False, revalidate=False)
+        bus = ProgressBus()
+        items = [DownloadTask(url=f"http://host.test/file{i}", filename="") for i in range(tasks)]
+        reporters = [manager._progress_reporter(bus.publish) for _ in items]
+
+        start = time.perf_counter()
+        for _ in range(chunks):
+            for task, report in zip(items, reporters):
+                task.add_bytes(65536)
+                report(task)
+        per_chunk = (time.perf_counter() - start) / (chunks * tasks) * 1e6
+
+        forced = ProgressThrottle(bus.publish)
+        start = time.perf_counter()
+        for task in items:
+            forced(task, force=True)
+        per_publish = (time.perf_counter() - start) / tasks * 1e6
+
+        start = time.perf_counter()
+        drained = len(bus.drain())
+        drain = (time.perf_counter() - start) * 1000
+        manager.executor.shutdown()
+
+    return {
+        "tasks": tasks,
+        "per_chunk_report_us": per_chunk,
+        "per_forced_publish_us": per_publish,
+        "drain_ms": drain,
+        "drained": drained,
+        "gui_frame_ms": _gui_frame(items),
+    }
+
+
+def _gui_frame(tasks) -> Optional[float]:
+    """Milliseconds for DownloadList to apply one update per task and redraw; None without a display"""
+    try:
+        import tkinter as tk
+
+        from gui.components.download_list import DownloadList
+
+        root = tk.Tk()
+    except Exception:
+        return None
+    try:
+        download_list = DownloadList(root)
+        download_list.pack()
+        for task in tasks:
+            download_list.add(task)
+        download_list.refresh()
+        root.update()
+        start = time.perf_counter()
+        for task in tasks:
+            download_list.update(task)
+        download_list.refresh()
+        root.update()
+        return (time.perf_counter() - start) * 1000
+    finally:
+        root.destroy()
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.time(),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline: Dict[str, Any], results: Dict[str, Any]) -> None:
+    """Print every metric present in both runs with its ratio new/old"""
+    old, new = _flatten(baseline["results"]), _flatten(results["results"])
+    print(f"\n{'metric':60} {'baseline':>14} {'current':>14} {'ratio':>8}")
+    for name in sorted(old.keys() & new.keys()):
+        ratio = new[name] / old[name] if old[name] else float("nan")
+        print(f"{name:60} {old[name]:14.4f} {new[name]:14.4f} {ratio:8.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description=__doc__.split("\n")[1])
+    parser.add_argument("--quick", action="store_true", help="smaller corpora for a fast smoke run")
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=["end_to_end", "scheduler", "queue", "memory", "progress"],
+        help="run only these benchmarks",
+    )
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--trace", help="write a Chrome/Perfetto trace of every download to this file")
+    args = parser.parse_args(argv)
+
+    # Keep manager logging off the console while measuring.
+    setup_logging(console_level=logging.WARNING, level=logging.WARNING)
+    tracer = enable_tracing() if args.trace else None
+
+    small_count = 200 if args.quick else 2000
+    huge_size = (32 if args.quick else 256) * 1024 * 1024
+    small = ServerConfig(small_count=small_count, small_size=16 * 1024, latency=0.002)
+    huge = ServerConfig(huge_count=2, huge_size=huge_size)
+    faulty = ServerConfig(
+        small_count=small_count // 2, small_size=16 * 1024, latency=0.002,
+        error_rate=0.05, throttle_rate=0.02, drop_rate=0.02, retry_after=1,
+    )
+    benchmarks = {
+        "end_to_end": lambda: {
+            "small_files": bench_end_to_end(small, [f"/small/{i}.bin" for i in range(small_count)]),
+            "huge_files": bench_end_to_end(huge, ["/huge/0.bin", "/huge/1.bin"]),
+            "small_files_faulty": bench_end_to_end(
+                faulty, [f"/small/{i}.bin" for i in range(faulty.small_count)]
+            ),
+        },
+        "scheduler": lambda: bench_scheduler_overhead(200 if args.quick else 2000),
+        "queue": lambda: bench_queue(100_000),
+        "memory": lambda: bench_memory(10_000 if args.quick else 100_000),
+        "progress": lambda: bench_progress(1000, 10 if args.quick else 100),
+    }
+
+    results = {"environment": _environment(), "results": {}}
+    for name, run in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        print(f"Running {name}...", flush=True)
+        results["results"][name] = run()
+
+    for name, value in _flatten(results["results"]).items():
+        print(f"  {name} = {value:.4f}" if isinstance(value, float) else f"  {name} = {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if tracer:
+        tracer.export(args.trace)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+CANCEL, PAUSE = "cancel", "pause"
+
+
+class CancellationToken:
+    """
+    Stop signal for one download, shared by everything working on it.
+
+    Downloaders check ``is_set`` at chunk and progress-hook boundaries, so
+    no thread has to poll on their behalf. Blocking network reads are
+    interrupted too: resources registered with ``on_cancel`` (see
+    ``closing_on_cancel``) are closed by the thread that cancels. ``pause``
+    stops the download the same way but records that its partial data is
+    meant to be resumed.
+
+    The token has the ``set``/``is_set``/``wait`` interface of
+    threading.Event, so code written against events keeps working.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: Dict[int, Callable[[], None]] = {}
+        self._next_id = 0
+        self.reason: Optional[str] = None
+
+    def _trigger(self, reason: str) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = list(self._callbacks.values()), {}
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def cancel(self) -> None:
+        self._trigger(CANCEL)
+
+    def pause(self) -> None:
+        self._trigger(PAUSE)
+
+    def set(self) -> None:
+        self.cancel()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason == CANCEL
+
+    @property
+    def paused(self) -> bool:
+        return self.reason == PAUSE
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Call ``callback`` when the token is cancelled or paused (at once if it
+        already is). Returns a function that unregisters it.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                key = self._next_id
+                self._next_id += 1
+                self._callbacks[key] = callback
+                return lambda: self._unregister(key)
+        callback()
+        return lambda: None
+
+    def _unregister(self, key: int) -> None:
+        with self._lock:
+            self._callbacks.pop(key, None)
+
+
+def abort_response(response) -> None:
+    """Shut down the socket under a streaming ``requests`` response so a read blocked on it returns now."""
+    connection = getattr(getattr(response, "raw", None), "_connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    response.close()
+
+
+@contextmanager
+def closing_on_cancel(token, response) -> Iterator[None]:
+    """
+    Abort ``response`` if ``token`` is cancelled or paused inside the block.
+    Plain threading.Event objects have no callbacks and are only polled.
+    """
+    register = getattr(token, "on_cancel", None)
+    unregister = register(lambda: abort_response(response)) if register else None
+    try:
+        yield
+    finally:
+        if unregister:
+            unregister()
@@ -0,0 +1,297 @@
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional, Set
+
+from utils.url_utils import normalize_url
+
+
+def host_key(url: str) -> str:
+    """Host part of the normalized URL, as used by PriorityDownloadQueue."""
+    parts = normalize_url(url).split("/", 3)
+    return parts[2] if len(parts) > 2 else ""
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _HostState:
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.active = 0
+        self.slow_start = True
+        self.latency: Optional[float] = None
+        self.min_latency: Optional[float] = None
+        self.samples = 0
+        self.last_decrease = 0.0
+        self.last_latency_decrease = 0.0
+        self.completed = 0
+        self.errors = 0
+        self.throttled = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+
+class AdaptiveConcurrency:
+    """
+    Decides how many downloads may run at once, overall and per host.
+
+    Every host starts at ``host_limit`` concurrent downloads and follows
+    AIMD: each successful download while the host was using its whole
+    allowance adds 1/limit (a whole slot while still in slow start), and an
+    error, a 429/503 or response latency drifting past ``latency_tolerance``
+    times the fastest seen cuts the limit multiplicatively, at most once per
+    ``cooldown``. A Retry-After on 429/503 pauses the host.
+
+    The global limit grows the same way between ``min_limit`` and
+    ``max_limit`` and is checked once per ``window``: if the error rate was
+    above ``error_threshold`` it is cut, and if the last whole-slot increase
+    did not raise aggregate goodput it is stepped back.
+    """
+
+    def __init__(
+        self,
+        min_limit: int = 1,
+        max_limit: int = 5,
+        host_limit: int = 2,
+        max_host_limit: Optional[int] = None,
+        goodput: Optional[Callable[[], float]] = None,
+        window: float = 5.0,
+        cooldown: float = 2.0,
+        latency_tolerance: float = 2.0,
+        latency_slack: float = 0.1,
+        error_threshold: float = 0.25,
+        max_pause: float = 300.0,
+    ):
+        """
+        Args:
+            min_limit (int): Lowest global concurrency.
+            max_limit (int): Highest global concurrency.
+            host_limit (int): Starting concurrency for a host not seen before.
+            max_host_limit (int, optional): Highest concurrency per host; defaults to max_limit.
+            goodput (Callable, optional): Returns the current aggregate bytes per second;
+                defaults to the bytes of downloads finished in the last window.
+            window (float): Seconds between global goodput and error-rate checks.
+            cooldown (float): Minimum seconds between two decreases of the same limit.
+            latency_tolerance (float): Latency (as a multiple of the host's fastest) that counts as overload.
+            latency_slack (float): Seconds latency must also rise by, so jitter on fast hosts is ignored.
+            error_threshold (float): Share of failed downloads in a window that shrinks the global limit.
+            max_pause (float): Longest Retry-After pause honoured.
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.host_limit = max(1, host_limit)
+        self.max_host_limit = max_host_limit or self.max_limit
+        self.window = window
+        self.cooldown = cooldown
+        self.latency_tolerance = latency_tolerance
+        self.latency_slack = latency_slack
+        self.error_threshold = error_threshold
+        self.max_pause = max_pause
+        self._goodput = goodput
+
+        self.limit = float(self.min_limit)
+        self.active = 0
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._hosts: Dict[str, _HostState] = {}
+        self._blocked: Set[str] = set()
+        self._paused: Dict[str, float] = {}
+
+        self._window_start = time.monotonic()
+        self._window_done = 0
+        self._window_errors = 0
+        self._window_bytes = 0
+        self._previous: Optional[tuple] = None
+        self.goodput = 0.0
+        self._lock = threading.Lock()
+
+    def _host(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(float(min(self.host_limit, self.max_host_limit)))
+        return state
+
+    def _update_blocked(self, host: str, state: _HostState) -> None:
+        if state.active >= int(state.limit) or host in self._paused:
+            self._blocked.add(host)
+        else:
+            self._blocked.discard(host)
+
+    def _decrease_host(
+        self, host: str, state: _HostState, factor: float, now: float, latency: bool = False
+    ) -> None:
+        # A latency cut never holds back the harder cut for an error that follows it.
+        last = max(state.last_decrease, state.last_latency_decrease) if latency else state.last_decrease
+        if now - last < self.cooldown:
+            return
+        state.limit = max(1.0, state.limit * factor)
+        state.slow_start = False
+        if latency:
+            state.last_latency_decrease = now
+        else:
+            state.last_decrease = now
+        self._update_blocked(host, state)
+        logging.info(f"Concurrency for {host} lowered to {int(state.limit)}")
+
+    def _decrease_global(self, factor: float, now: float) -> None:
+        if now - self._last_decrease < self.cooldown:
+            return
+        self.limit = max(float(self.min_limit), self.limit * factor)
+        self._slow_start = False
+        self._last_decrease = now
+        logging.info(f"Download concurrency lowered to {int(self.limit)}")
+
+    def _expire_pauses(self, now: float) -> None:
+        for host, until in list(self._paused.items()):
+            if until <= now:
+                del self._paused[host]
+                self._update_blocked(host, self._host(host))
+
+    def _check_window(self, now: float) -> None:
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return
+        self.goodput = self._goodput() if self._goodput else self._window_bytes / elapsed
+        if self._window_done and self._window_errors / self._window_done > self.error_threshold:
+            self._decrease_global(0.75, now)
+        elif self._previous is not None:
+            previous_goodput, previous_limit = self._previous
+            if int(self.limit) > int(previous_limit) and self.goodput < previous_goodput:
+                # The extra workers did not buy any throughput.
+                self.limit = max(float(self.min_limit), previous_limit)
+                self._slow_start = False
+                logging.info(f"Download concurrency stepped back to {int(self.limit)}")
+        self._previous = (self.goodput, self.limit)
+        self._window_start = now
+        self._window_done = self._window_errors = self._window_bytes = 0
+
+    def started(self, host: str) -> None:
+        """Record that a download for ``host`` was dispatched."""
+        with self._lock:
+            state = self._host(host)
+            state.active += 1
+            self.active += 1
+            self._update_blocked(host, state)
+
+    def finished(self, host: str, nbytes: int, seconds: float, failed: bool = False) -> None:
+        """Record the outcome of a download started with ``started``."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._host(host)
+            host_saturated = state.active >= int(state.limit)
+            saturated = self.active >= int(self.limit)
+            state.active -= 1
+            self.active -= 1
+            state.completed += 1
+            state.bytes += nbytes
+            state.seconds += seconds
+            self._window_done += 1
+            self._window_bytes += nbytes
+            if failed:
+                state.errors += 1
+                self._window_errors += 1
+                self._decrease_host(host, state, 0.5, now)
+            else:
+                if host_saturated:
+                    step = 1.0 if state.slow_start else 1.0 / state.limit
+                    state.limit = min(float(self.max_host_limit), state.limit + step)
+                if saturated:
+                    step = 1.0 if self._slow_start else 1.0 / self.limit
+                    self.limit = min(float(self.max_limit), self.limit + step)
+            self._update_blocked(host, state)
+            self._check_window(now)
+
+    def observe_response(self, response, *args, **kwargs) -> None:
+        """
+        Response hook for HttpPool: feeds latency and throttling signals.
+
+        Every response, including each redirect hop, counts for its own host.
+        """
+        now = time.monotonic()
+        host = host_key(response.url)
+        latency = response.elapsed.total_seconds()
+        status = response.status_code
+        with self._lock:
+            state = self._host(host)
+            if status in (429, 503):
+                state.throttled += 1
+                pause = _retry_after(response.headers.get("Retry-After"))
+                if pause:
+                    self._paused[host] = max(self._paused.get(host, 0.0), now + min(pause, self.max_pause))
+                    logging.info(f"{host} asked to retry in {pause:.0f}s; pausing it")
+                self._decrease_host(host, state, 0.5, now)
+                self._update_blocked(host, state)
+                return
+            if status >= 500:
+                self._decrease_host(host, state, 0.5, now)
+                return
+            state.samples += 1
+            state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+            if state.min_latency is None or latency < state.min_latency:
+                state.min_latency = latency
+            if state.samples >= 5 and state.latency > max(
+                self.latency_tolerance * state.min_latency, state.min_latency + self.latency_slack
+            ):
+                self._decrease_host(host, state, 0.8, now, latency=True)
+
+    def has_capacity(self) -> bool:
+        """True if another download may start somewhere."""
+        with self._lock:
+            self._check_window(time.monotonic())
+            return self.active < int(self.limit)
+
+    def blocked_hosts(self) -> Set[str]:
+        """Hosts that must not get another download right now."""
+        with self._lock:
+            self._expire_pauses(time.monotonic())
+            return set(self._blocked)
+
+    def retry_in(self) -> Optional[float]:
+        """
+        Seconds until the controller may allow more work on its own (a pause
+        expiring or the next window check), or None if only a finishing
+        download can change that.
+        """
+        now = time.monotonic()
+        with self._lock:
+            deadlines = list(self._paused.values())
+            if self.active:
+                deadlines.append(self._window_start + self.window)
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "active": self.active,
+                "goodput": self.goodput,
+                "hosts": {
+                    host: {
+                        "limit": int(state.limit),
+                        "active": state.active,
+                        "completed": state.completed,
+                        "errors": state.errors,
+                        "throttled": state.throttled,
+                        "latency": state.latency,
+                        "goodput": state.bytes / state.seconds if state.seconds else 0.0,
+                        "paused_for": max(0.0, self._paused.get(host, now) - now),
+                    }
+                    for host, state in self._hosts.items()
+                },
+            }
@@ -0,0 +1,216 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl request that makes a file share another file's extents (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+
+def _reflink(source: str, target: str) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        if os.path.exists(target):
+            os.remove(target)
+        return False
+
+
+def share_content(source: str, target: str) -> bool:
+    """
+    Replace ``target`` with a hardlink to ``source``, or a reflink where
+    hardlinks are not possible. Returns False (leaving ``target`` alone) if
+    neither works, e.g. across file systems.
+    """
+    tmp_path = target + ".dedup"
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        if not _reflink(source, tmp_path):
+            return False
+    os.replace(tmp_path, target)
+    return True
+
+
+class ContentStore:
+    """
+    Index of downloaded files by SHA-256 of their content.
+
+    Files whose content is already stored elsewhere are turned into
+    hardlinks (or reflinks) of the first copy, and every URL remembers the
+    digest it produced, so a URL downloaded before can be satisfied from
+    disk without a transfer. The index lives in a SQLite database; files
+    deleted or changed behind its back are detected and dropped on lookup.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): SQLite database file.
+        """
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    linked INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS files_digest ON files(digest)")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS urls (
+                    url TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    path TEXT NOT NULL
+                )"""
+            )
+
+    def _intact(self, path: str, size: int) -> bool:
+        try:
+            return os.path.getsize(path) == size
+        except OSError:
+            return False
+
+    def _copy_of(self, digest: str, exclude: Optional[str] = None) -> Optional[str]:
+        """Path of an intact stored file with ``digest``; forgets stale rows on the way."""
+        rows = self._conn.execute(
+            "SELECT path, size FROM files WHERE digest = ? ORDER BY linked", (digest,)
+        ).fetchall()
+        for path, size in rows:
+            if path == exclude:
+                continue
+            if self._intact(path, size):
+                return path
+            with self._conn:
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        return None
+
+    def lookup(self, url: str, output_folder: Optional[str] = None) -> Optional[str]:
+        """
+        A file holding the content ``url`` had when it was last downloaded, or
+        None. If the original file is gone but the same content is stored
+        elsewhere, it is linked back into place first. With ``output_folder``,
+        only files in that folder are returned.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT digest, path FROM urls WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            digest, path = row
+            if output_folder is not None and os.path.dirname(path) != os.path.normpath(output_folder):
+                return None
+            known = self._conn.execute(
+                "SELECT size FROM files WHERE path = ? AND digest = ?", (path, digest)
+            ).fetchone()
+            if known and self._intact(path, known[0]):
+                return path
+            source = self._copy_of(digest, exclude=path)
+            if source is None or os.path.exists(path) or not share_content(source, path):
+                return None
+            size = os.path.getsize(path)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (path, digest, size, linked) VALUES (?, ?, ?, 1)",
+                    (path, digest, size),
+                )
+            return path
+
+    def add(self, url: str, file_path: str, digest: str) -> str:
+        """
+        Register a freshly downloaded file. If its content is already stored,
+        the file is replaced with a link to the existing copy. Returns ``file_path``.
+        """
+        file_path = os.path.normpath(file_path)
+        size = os.path.getsize(file_path)
+        with self._lock:
+            source = self._copy_of(digest, exclude=file_path)
+            linked = source is not None and share_content(source, file_path)
+            if linked:
+                logging.info(f"{file_path} has the same content as {source}; linked instead of copied")
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (path, digest, size, linked) VALUES (?, ?, ?, ?)",
+                    (file_path, digest, size, int(linked)),
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO urls (url, digest, path) VALUES (?, ?, ?)",
+                    (url, digest, file_path),
+                )
+        return file_path
+
+    def stats(self) -> Dict[str, Any]:
+        """Space accounting: bytes as seen by the user versus bytes actually stored."""
+        with self._lock:
+            files, logical = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files"
+            ).fetchone()
+            unique, = self._conn.execute("SELECT COUNT(DISTINCT digest) FROM files").fetchone()
+            # One stored copy per content, plus any duplicates that could not be linked.
+            stored, = self._conn.execute(
+                "SELECT COALESCE(SUM(size * MAX(1, copies)), 0) FROM "
+                "(SELECT MAX(size) AS size, SUM(linked = 0) AS copies FROM files GROUP BY digest)"
+            ).fetchone()
+            urls, = self._conn.execute("SELECT COUNT(*) FROM urls").fetchone()
+        return {
+            "files": files,
+            "unique_contents": unique,
+            "urls": urls,
+            "logical_bytes": logical,
+            "stored_bytes": stored,
+            "saved_bytes": logical - stored,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m core.content_store",
+        description="Report space saved by content deduplication in a download folder.",
+    )
+    parser.add_argument("download_folder")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    db_path = os.path.join(args.download_folder, ".downloader", "content.db")
+    if not os.path.exists(db_path):
+        print(f"No content index in {args.download_folder}", file=sys.stderr)
+        return 1
+    store = ContentStore(db_path)
+    stats = store.stats()
+    store.close()
+
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return 0
+    mib = 1024 * 1024
+    print(f"Files:           {stats['files']} ({stats['unique_contents']} unique, {stats['urls']} URLs)")
+    print(f"Logical size:    {stats['logical_bytes'] / mib:.1f} MiB")
+    print(f"Stored size:     {stats['stored_bytes'] / mib:.1f} MiB")
+    print(f"Saved by dedup:  {stats['saved_bytes'] / mib:.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
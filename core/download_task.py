@@ -1,5 +1,7 @@
+import math
 import time
-from dataclasses import dataclass
+import uuid
+from dataclasses import dataclass, field
 from typing import Optional
 
 
@@ -14,34 +16,59 @@ class DownloadTask:
     error: Optional[str] = None
     speed: float = 0.0
     start_time: Optional[float] = None
-    last_update_time: Optional[float] = None
-    chunk_sizes: list[int] = None
+    last_update_time: Optional[float] = None  # time.monotonic() of the last progress update
     resumable: bool = False
     etag: Optional[str] = None
     choice: str = None
-    def __post_init__(self):
-        self.chunk_sizes = []
+    parent: Optional[str] = None  # URL of the playlist this task is an entry of
+    # Playlists only: entries queued so far, how many of them finished or
+    # failed, and whether every entry has been queued.
+    entries: int = 0
+    entries_done: int = 0
+    entries_failed: int = 0
+    expanded: bool = False
+    conversion: float = 0.0  # fraction of the post-download audio conversion done
+    queued_at: Optional[float] = None  # time.monotonic() when the task last entered the queue
+    task_id: str = field(default_factory=lambda: uuid.uuid4().hex)
 
-    def calculate_speed(self) -> float:
-        """Calculate current download speed based on recent chunks"""
-        if not self.chunk_sizes or not self.last_update_time:
-            return 0.0
+    # Time constant of the speed average in seconds
+    SPEED_SMOOTHING = 2.0
 
-        recent_chunks = self.chunk_sizes[-5:]
-        if not recent_chunks:
-            return 0.0
+    def update_progress(self, downloaded: int, total_size: Optional[int] = None) -> None:
+        """Record absolute byte progress and fold it into the speed average.
+
+        Speed is an exponentially weighted moving average with a time-based
+        weight, so it uses constant memory however many chunks arrive.
+        """
+        now = time.monotonic()
+        if total_size:
+            self.total_size = total_size
+        if self.last_update_time is not None:
+            elapsed = now - self.last_update_time
+            if elapsed > 0:
+                instant = max(0, downloaded - self.downloaded) / elapsed
+                weight = 1 - math.exp(-elapsed / self.SPEED_SMOOTHING)
+                self.speed += weight * (instant - self.speed)
+        self.downloaded = downloaded
+        self.last_update_time = now
 
-        chunk_size = sum(recent_chunks)
-        time_diff = time.time() - self.last_update_time
-        if time_diff > 0:
-            self.speed = chunk_size / time_diff
+    def add_bytes(self, nbytes: int) -> None:
+        """Record ``nbytes`` more bytes received"""
+        self.update_progress(self.downloaded + nbytes)
+
+    def calculate_speed(self) -> float:
+        """Current download speed in bytes per second, decayed if the transfer has stalled"""
+        if not self.last_update_time:
+            return 0.0
 
-        return self.speed
+        idle = time.monotonic() - self.last_update_time
+        return self.speed * math.exp(-idle / self.SPEED_SMOOTHING)
 
     def estimate_time_remaining(self) -> Optional[int]:
         """Estimate seconds remaining based on current speed"""
-        if self.speed <= 0 or self.total_size <= 0:
+        speed = self.calculate_speed()
+        if speed <= 0 or self.total_size <= 0:
             return None
 
-        remaining_bytes = self.total_size - self.downloaded
-        return int(remaining_bytes / self.speed)
+        remaining_bytes = max(0, self.total_size - self.downloaded)
+        return int(remaining_bytes / speed)
@@ -0,0 +1,163 @@
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from core.tracing import span
+
+
+class PoolStats:
+    """Thread-safe connection checkout counters shared by every host pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.new_connections = 0
+
+    def record_checkout(self) -> None:
+        with self._lock:
+            self.checkouts += 1
+
+    def record_new_connection(self) -> None:
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = max(0, self.checkouts - self.new_connections)
+            return {
+                "requests": self.checkouts,
+                "hits": hits,
+                "misses": self.new_connections,
+                "hit_rate": hits / self.checkouts if self.checkouts else 0.0,
+            }
+
+
+def _traced_connection(base: type) -> type:
+    """Subclass a urllib3 connection so opening it (DNS, TCP and TLS) shows up in traces."""
+
+    class TracedConnection(base):
+        def connect(self):
+            with span("connect", "http", host=self.host):
+                super().connect()
+
+    TracedConnection.__name__ = f"Traced{base.__name__}"
+    return TracedConnection
+
+
+def _counting_pool(base: type, stats: PoolStats) -> type:
+    """Subclass a urllib3 pool so checkouts and fresh connections are counted."""
+
+    class CountingPool(base):
+        ConnectionCls = _traced_connection(base.ConnectionCls)
+
+        def _get_conn(self, timeout=None):
+            stats.record_checkout()
+            return super()._get_conn(timeout)
+
+        def _new_conn(self):
+            stats.record_new_connection()
+            return super()._new_conn()
+
+    CountingPool.__name__ = f"Counting{base.__name__}"
+    return CountingPool
+
+
+class _PooledAdapter(HTTPAdapter):
+    def __init__(self, stats: PoolStats, timeout, **kwargs):
+        self._stats = stats
+        self._timeout = timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self._stats),
+            "https": _counting_pool(HTTPSConnectionPool, self._stats),
+        }
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self._timeout
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+class HttpPool:
+    """
+    Shared keep-alive HTTP session for every downloader.
+
+    Connections are pooled per host and reused across downloads, so DNS
+    lookups and TLS handshakes are paid once per connection rather than once
+    per request. ``pool_maxsize`` caps concurrent connections to a single
+    host; with ``block`` set, extra requests wait for a free connection
+    instead of opening more.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 32,
+        pool_maxsize: int = 8,
+        block: bool = True,
+        timeout: Union[float, Tuple[float, float], None] = (10, 60),
+        keep_alive: bool = True,
+        max_retries: int = 0,
+    ):
+        """
+        Args:
+            pool_connections (int): Number of per-host pools kept alive at once.
+            pool_maxsize (int): Maximum connections per host.
+            block (bool): Wait for a free connection instead of exceeding pool_maxsize.
+            timeout: Default (connect, read) timeout applied when a call passes none.
+            keep_alive (bool): Reuse connections, and with them their TLS sessions.
+            max_retries (int): Connection-level retries handled by urllib3.
+        """
+        self.stats = PoolStats()
+        self.session = requests.Session()
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+        adapter = _PooledAdapter(
+            self.stats,
+            timeout,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=block,
+            max_retries=max_retries,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.session.get(url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.session.head(url, **kwargs)
+
+    def add_response_hook(self, hook: Callable[..., None]) -> None:
+        """Call ``hook(response)`` for every response received through the pool."""
+        self.session.hooks["response"].append(hook)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool hit/miss counts: a hit is a request served on a reused connection."""
+        return self.stats.snapshot()
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_default_pool: Optional[HttpPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool() -> HttpPool:
+    """Process-wide pool used when no pool is injected."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HttpPool()
+        return _default_pool
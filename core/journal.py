@@ -0,0 +1,188 @@
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .download_task import DownloadTask
+
+
+class DownloadJournal:
+    """
+    Crash-safe record of queued downloads, their status and byte progress.
+
+    Backed by SQLite in WAL mode. Callers only update an in-memory map of the
+    latest row per URL; a background thread group-commits that map every
+    ``flush_interval`` seconds, or sooner once ``batch_size`` rows are
+    waiting, so recording never blocks a transfer loop on disk I/O.
+    """
+
+    RESUMABLE_STATUSES = ("pending", "downloading", "converting", "paused")
+    FINISHED_STATUSES = ("completed", "failed", "stopped")
+
+    _COLUMNS = (
+        "url", "filename", "priority", "choice", "status",
+        "total_size", "downloaded", "etag", "error", "parent", "updated",
+    )
+
+    def __init__(self, path: str, flush_interval: float = 0.5, batch_size: int = 1000):
+        """
+        Args:
+            path (str): SQLite database file.
+            flush_interval (float): Longest time a change waits before being committed.
+            batch_size (int): Commit early once this many rows are waiting.
+        """
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._pending: Dict[str, Optional[Tuple]] = {}
+        self._pending_parents: Set[str] = set()  # playlists whose entries are to be dropped
+        self._cond = threading.Condition()
+        self._db_lock = threading.Lock()
+        self._closed = False
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS tasks (
+                url TEXT PRIMARY KEY,
+                filename TEXT,
+                priority INTEGER,
+                choice TEXT,
+                status TEXT,
+                total_size INTEGER,
+                downloaded INTEGER,
+                etag TEXT,
+                error TEXT,
+                parent TEXT,
+                updated REAL
+            )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        if "parent" not in columns:
+            # Journals written before playlist entries were linked to their playlist
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN parent TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks(status)")
+        self._conn.commit()
+
+        self._writer = threading.Thread(target=self._run, name="JournalWriter", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def record(self, task: DownloadTask) -> None:
+        """Remember the task's current state; committed on the next flush."""
+        row = (
+            task.url, task.filename, task.priority, task.choice, task.status,
+            task.total_size, task.downloaded, task.etag, task.error, task.parent, time.time(),
+        )
+        with self._cond:
+            self._pending[task.url] = row
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def forget(self, url: str) -> None:
+        """Drop a task from the journal."""
+        with self._cond:
+            self._pending[url] = None
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def forget_entries(self, parent: str) -> None:
+        """Drop every entry of the playlist ``parent`` from the journal."""
+        parent_index = self._COLUMNS.index("parent")
+        with self._cond:
+            for url, row in self._pending.items():
+                if row is not None and row[parent_index] == parent:
+                    self._pending[url] = None
+            self._pending_parents.add(parent)
+
+    def load_resumable(self) -> List[DownloadTask]:
+        """Tasks that were queued or in flight when the journal was last written."""
+        return self._load(self.RESUMABLE_STATUSES, "")
+
+    def load_finished_entries(self) -> List[DownloadTask]:
+        """Playlist entries that already finished, with their final status."""
+        return self._load(self.FINISHED_STATUSES, " AND parent IS NOT NULL")
+
+    def _load(self, statuses: Tuple[str, ...], condition: str) -> List[DownloadTask]:
+        self.flush()
+        placeholders = ",".join("?" * len(statuses))
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(self._COLUMNS[:-1])} FROM tasks "
+                f"WHERE status IN ({placeholders}){condition}",
+                statuses,
+            ).fetchall()
+        tasks = []
+        for url, filename, priority, choice, status, total_size, downloaded, etag, error, parent in rows:
+            task = DownloadTask(
+                url=url,
+                filename=filename or "",
+                priority=priority or 0,
+                total_size=total_size or 0,
+                downloaded=downloaded or 0,
+                etag=etag,
+                choice=choice,
+                parent=parent,
+            )
+            # Interrupted downloads start over as pending; paused and finished ones keep their status.
+            if status == "paused" or status in self.FINISHED_STATUSES:
+                task.status = status
+                task.error = error
+            tasks.append(task)
+        return tasks
+
+    def _commit(self, batch: Dict[str, Optional[Tuple]], parents: Set[str]) -> None:
+        if not batch and not parents:
+            return
+        rows = [row for row in batch.values() if row is not None]
+        removed = [(url,) for url, row in batch.items() if row is None]
+        try:
+            with self._conn:
+                # Entries recorded after their playlist was dropped are in ``rows``, so they are kept.
+                if parents:
+                    self._conn.executemany("DELETE FROM tasks WHERE parent = ?", [(p,) for p in parents])
+                if rows:
+                    self._conn.executemany(
+                        f"INSERT OR REPLACE INTO tasks ({', '.join(self._COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(self._COLUMNS))})",
+                        rows,
+                    )
+                if removed:
+                    self._conn.executemany("DELETE FROM tasks WHERE url = ?", removed)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to write download journal: {e}")
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self) -> None:
+        """Commit everything recorded so far before returning."""
+        # Taking and committing a batch under one lock keeps batches in order,
+        # so an older snapshot can never overwrite a newer one.
+        with self._db_lock:
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                parents, self._pending_parents = self._pending_parents, set()
+            self._commit(batch, parents)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._writer.join()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
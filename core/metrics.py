@@ -0,0 +1,300 @@
+import bisect
+import http.server
+import math
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core.concurrency import host_key
+
+# Upper bounds in seconds; one more bucket catches everything above the last.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DURATION_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The series for these label values (strings, in ``labelnames`` order)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _series(self) -> List[Tuple[Dict[str, str], Any]]:
+        with self._lock:
+            children = list(self._children.items())
+        return [(dict(zip(self.labelnames, values)), child) for values, child in children]
+
+
+class Counter(_Metric):
+    """Monotonic total per label set, e.g. bytes or requests."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def samples(self) -> List[Dict[str, Any]]:
+        return [{"labels": labels, "value": child.value} for labels, child in self._series()]
+
+
+class Histogram(_Metric):
+    """Distribution per label set in fixed buckets, e.g. latencies."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def samples(self) -> List[Dict[str, Any]]:
+        samples = []
+        for labels, child in self._series():
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative, running = [], 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            samples.append({
+                "labels": labels,
+                "count": running,
+                "sum": total,
+                "buckets": dict(zip([*map(str, self.buckets), "+Inf"], cumulative)),
+            })
+        return samples
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    """
+    Named counters and histograms, readable as a dict or as Prometheus text.
+
+    Recording costs a dict lookup and an uncontended lock per call, so it is
+    cheap enough to stay on all the time.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """The counter called ``name``, created on first use."""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """The histogram called ``name``, created on first use."""
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every metric with its type, help text and samples, as plain JSON-able data."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {"type": metric.kind, "help": metric.documentation, "samples": metric.samples()}
+            for metric in metrics
+        }
+
+    def render_prometheus(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, metric in self.snapshot().items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for sample in metric["samples"]:
+                labels = sample["labels"]
+                if metric["type"] == "counter":
+                    lines.append(f"{name}{_label_text(labels)} {_number(sample['value'])}")
+                    continue
+                for bound, count in sample["buckets"].items():
+                    lines.append(f"{name}_bucket{_label_text({**labels, 'le': bound})} {count}")
+                lines.append(f"{name}_sum{_label_text(labels)} {_number(sample['sum'])}")
+                lines.append(f"{name}_count{_label_text(labels)} {sample['count']}")
+        return "\n".join(lines) + "\n"
+
+
+_default_registry: Optional[MetricsRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def default_registry() -> MetricsRegistry:
+    """Process-wide registry used when no registry is injected."""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = MetricsRegistry()
+        return _default_registry
+
+
+class DownloadMetrics:
+    """
+    The download engine's metrics, labelled by host and by the kind of
+    download (file, image, video, ...).
+
+    ``observe_response`` is an HttpPool response hook for per-request
+    numbers; the manager reports queue waits and finished transfers.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or default_registry()
+        r = self.registry
+        self.requests = r.counter("http_requests_total", "HTTP responses received", ("host", "status"))
+        self.ttfb = r.histogram(
+            "http_time_to_first_byte_seconds", "Time from sending a request to its response headers", ("host",)
+        )
+        self.queue_wait = r.histogram(
+            "download_queue_wait_seconds", "Time a download waited in the queue", ("host", "kind"), DURATION_BUCKETS
+        )
+        self.duration = r.histogram(
+            "download_duration_seconds", "Time from dispatch to the end of a transfer", ("host", "kind"),
+            DURATION_BUCKETS,
+        )
+        self.bytes = r.counter("download_bytes_total", "Bytes received by downloads", ("host", "kind"))
+        self.downloads = r.counter(
+            "downloads_total", "Downloads that ended, by outcome", ("host", "kind", "status")
+        )
+        self.retries = _retries(r)
+
+    def observe_response(self, response, *args, **kwargs) -> None:
+        """Response hook for HttpPool: counts the request and its time to first byte."""
+        host = host_key(response.url)
+        self.requests.labels(host, str(response.status_code)).inc()
+        self.ttfb.labels(host).observe(response.elapsed.total_seconds())
+
+    def queued(self, host: str, kind: str, seconds: float) -> None:
+        self.queue_wait.labels(host, kind).observe(seconds)
+
+    def finished(self, host: str, kind: str, status: str, nbytes: int, seconds: float) -> None:
+        """Record a transfer that ended with ``status`` after ``seconds``."""
+        if nbytes > 0:
+            self.bytes.labels(host, kind).inc(nbytes)
+        self.downloads.labels(host, kind, status).inc()
+        if status == "completed":
+            self.duration.labels(host, kind).observe(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self.registry.snapshot()
+
+
+def _retries(registry: MetricsRegistry) -> Counter:
+    return registry.counter(
+        "download_retries_total", "Transfers restarted or attempted again, by reason", ("host", "reason")
+    )
+
+
+def record_retry(url: str, reason: str, registry: Optional[MetricsRegistry] = None) -> None:
+    """Count a transfer of ``url`` that had to be restarted or tried again."""
+    _retries(registry or default_registry()).labels(host_key(url), reason).inc()
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    server: "MetricsServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer(http.server.ThreadingHTTPServer):
+    """Serves a registry at /metrics for Prometheus to scrape, on a background thread."""
+
+    daemon_threads = True
+
+    def __init__(self, registry: MetricsRegistry, port: int = 9100, host: str = "127.0.0.1"):
+        super().__init__((host, port), _MetricsHandler)
+        self.registry = registry
+        self._thread = threading.Thread(target=self.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_port}/metrics"
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
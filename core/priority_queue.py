@@ -1,35 +1,218 @@
-import queue
+import heapq
+import itertools
+import math
 import threading
-from typing import Dict, Optional
+import time
+from typing import Container, Dict, Iterable, List, Optional, Tuple
 
+from utils.url_utils import normalize_url
 from .download_task import DownloadTask
 
 
 class PriorityDownloadQueue:
-    """Priority queue for download tasks"""
+    """
+    Indexed priority queue for download tasks.
 
-    def __init__(self):
-        self._queue = queue.PriorityQueue()
-        self._tasks: Dict[str, DownloadTask] = {}
+    Tasks are keyed by normalized URL, so queuing a URL that is already
+    waiting is a no-op. The heap uses lazy deletion: ``remove`` and
+    ``update_priority`` only invalidate the old entry, which keeps every
+    operation O(log n). Within one priority level, tasks from different
+    hosts are served round-robin. With ``aging_interval`` set, a waiting
+    task gains one priority level per interval so low priorities cannot
+    starve. ``get`` can skip hosts that are at their concurrency limit;
+    their entries are parked in per-host heaps so they are not rescanned
+    on every call.
+    """
+
+    # Entry layout: [level, round, seq, key, host, task]; task is None once invalidated.
+    _TASK = 5
+
+    def __init__(self, aging_interval: Optional[float] = None):
+        """
+        Args:
+            aging_interval (float, optional): Seconds a task must wait to gain one priority level.
+        """
+        self._heap: List[list] = []
+        self._held: Dict[str, List[list]] = {}
+        self._entries: Dict[str, list] = {}
+        self._enqueued_at: Dict[str, float] = {}
+        self._rounds: Dict[Tuple[int, str], int] = {}
+        self._served: Dict[int, int] = {}
+        self._live: Dict[Tuple[int, str], int] = {}
+        self._level_live: Dict[int, int] = {}
+        self._stale = 0
+        self._seq = itertools.count()
         self._lock = threading.Lock()
+        self._aging_interval = aging_interval
+        self._epoch = time.monotonic()
 
-    def put(self, task: DownloadTask) -> None:
-        with self._lock:
-            self._tasks[task.url] = task
-            self._queue.put((-task.priority, task.url))
-
-    def get(self) -> Optional[DownloadTask]:
-        try:
-            _, url = self._queue.get_nowait()
-            with self._lock:
-                return self._tasks.get(url)
-        except queue.Empty:
+    def _level(self, priority: int, enqueued_at: float) -> int:
+        """Heap level, lower first. Aging is folded into a key that never changes:
+        a task enqueued one interval later ranks one level lower."""
+        if not self._aging_interval:
+            return -priority
+        return math.ceil((enqueued_at - self._epoch) / self._aging_interval) - priority
+
+    def _push(self, key: str, task: DownloadTask, enqueued_at: float) -> None:
+        level = self._level(task.priority, enqueued_at)
+        parts = key.split("/", 3)
+        host = parts[2] if len(parts) > 2 else ""
+        slot = (level, host)
+        # A host that joins a level late starts at the level's current round
+        # instead of jumping ahead of everyone already waiting.
+        round_ = max(self._rounds.get(slot, 0), self._served.get(level, 0))
+        self._rounds[slot] = round_ + 1
+        self._live[slot] = self._live.get(slot, 0) + 1
+        self._level_live[level] = self._level_live.get(level, 0) + 1
+        entry = [level, round_, next(self._seq), key, host, task]
+        self._entries[key] = entry
+        self._enqueued_at[key] = enqueued_at
+        task.queued_at = enqueued_at
+        heapq.heappush(self._heap, entry)
+
+    def _retire(self, entry: list) -> None:
+        """Bookkeeping for an entry leaving the queue (popped or invalidated)."""
+        level, host = entry[0], entry[4]
+        slot = (level, host)
+        self._live[slot] -= 1
+        if not self._live[slot]:
+            del self._live[slot]
+            del self._rounds[slot]
+        self._level_live[level] -= 1
+        if not self._level_live[level]:
+            del self._level_live[level]
+            self._served.pop(level, None)
+
+    def _invalidate(self, key: str) -> Optional[DownloadTask]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
             return None
+        self._enqueued_at.pop(key, None)
+        task = entry[self._TASK]
+        entry[self._TASK] = None
+        self._retire(entry)
+        self._stale += 1
+        if self._stale > 1024 and self._stale > len(self._entries):
+            self._heap = [e for e in self._heap if e[self._TASK] is not None]
+            heapq.heapify(self._heap)
+            for host, held in list(self._held.items()):
+                held = [e for e in held if e[self._TASK] is not None]
+                if held:
+                    heapq.heapify(held)
+                    self._held[host] = held
+                else:
+                    del self._held[host]
+            self._stale = 0
+        return task
+
+    def _discard_stale_head(self, heap: Optional[List[list]] = None) -> None:
+        heap = self._heap if heap is None else heap
+        while heap and heap[0][self._TASK] is None:
+            heapq.heappop(heap)
+            self._stale -= 1
+
+    def _head(self, blocked: Container[str]) -> Optional[List[list]]:
+        """The heap whose top entry is the next one to serve, skipping ``blocked`` hosts."""
+        self._discard_stale_head()
+        while blocked and self._heap and self._heap[0][4] in blocked:
+            entry = heapq.heappop(self._heap)
+            heapq.heappush(self._held.setdefault(entry[4], []), entry)
+            self._discard_stale_head()
+        best = self._heap if self._heap else None
+        for host, held in list(self._held.items()):
+            self._discard_stale_head(held)
+            if not held:
+                del self._held[host]
+                continue
+            if host in blocked:
+                continue
+            if best is None or held[0] < best[0]:
+                best = held
+        return best
+
+    def put(self, task: DownloadTask) -> bool:
+        """Queue a task. Returns False if its URL is already queued; the waiting
+        task then keeps its place, raised to the higher of the two priorities."""
+        key = normalize_url(task.url)
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                queued = existing[self._TASK]
+                if task.priority > queued.priority:
+                    self._update(key, task.priority)
+                return False
+            self._push(key, task, time.monotonic())
+            return True
+
+    def extend(self, tasks: Iterable[DownloadTask]) -> int:
+        """Queue many tasks at once with a single heapify. Returns how many were new."""
+        added = 0
+        with self._lock:
+            now = time.monotonic()
+            heap, self._heap = self._heap, []
+            for task in tasks:
+                key = normalize_url(task.url)
+                if key in self._entries:
+                    continue
+                self._push(key, task, now)
+                added += 1
+            heap.extend(self._heap)
+            heapq.heapify(heap)
+            self._heap = heap
+        return added
 
-    def remove(self, url: str) -> None:
+    def get(self, blocked: Container[str] = ()) -> Optional[DownloadTask]:
+        """
+        Pop the highest-priority task whose host is not in ``blocked``, or
+        None if there is no such task.
+        """
         with self._lock:
-            if url in self._tasks:
-                del self._tasks[url]
+            heap = self._head(blocked)
+            if heap is None:
+                return None
+            entry = heapq.heappop(heap)
+            key = entry[3]
+            del self._entries[key]
+            self._enqueued_at.pop(key, None)
+            self._served[entry[0]] = max(self._served.get(entry[0], 0), entry[1])
+            self._retire(entry)
+            return entry[self._TASK]
+
+    def peek(self) -> Optional[DownloadTask]:
+        """Return the task get() would return, without removing it."""
+        with self._lock:
+            heap = self._head(())
+            return heap[0][self._TASK] if heap else None
+
+    def remove(self, url: str) -> Optional[DownloadTask]:
+        """Remove a waiting task. Returns it, or None if it was not queued."""
+        with self._lock:
+            return self._invalidate(normalize_url(url))
+
+    def _update(self, key: str, priority: int) -> None:
+        enqueued_at = self._enqueued_at[key]
+        task = self._invalidate(key)
+        task.priority = priority
+        self._push(key, task, enqueued_at)
+
+    def update_priority(self, url: str, priority: int) -> bool:
+        """Change the priority of a waiting task, keeping its aging credit."""
+        key = normalize_url(url)
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._update(key, priority)
+            return True
+
+    def contains(self, url: str) -> bool:
+        with self._lock:
+            return normalize_url(url) in self._entries
+
+    def __contains__(self, url: str) -> bool:
+        return self.contains(url)
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
     def empty(self) -> bool:
-        return self._queue.empty()
+        return not self._entries
@@ -0,0 +1,53 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .download_task import DownloadTask
+
+
+class ProgressThrottle:
+    """
+    Forwards progress updates to ``callback`` at most once per ``interval``
+    seconds. Status changes and forced updates always go through, so
+    callers can report after every chunk without flooding listeners.
+    """
+
+    def __init__(self, callback: Optional[Callable[[DownloadTask], None]], interval: float = 0.1):
+        self.callback = callback
+        self.interval = interval
+        self._last_time = 0.0
+        self._last_status = None
+
+    def __call__(self, task: DownloadTask, force: bool = False) -> None:
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if not force and task.status == self._last_status and now - self._last_time < self.interval:
+            return
+        self._last_time = now
+        self._last_status = task.status
+        self.callback(task)
+
+
+class ProgressBus:
+    """
+    Hand-off point between download threads and a UI thread.
+
+    Workers ``publish`` tasks from any thread; the UI periodically calls
+    ``drain`` and gets each task that changed since the last drain exactly
+    once, in its latest state. Storage is bounded by the number of distinct
+    downloads, however often they publish.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, DownloadTask] = {}
+
+    def publish(self, task: DownloadTask) -> None:
+        with self._lock:
+            self._pending[task.url] = task
+
+    def drain(self) -> List[DownloadTask]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return list(pending.values())
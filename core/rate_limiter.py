@@ -1,25 +1,336 @@
+import asyncio
+import heapq
+import itertools
 import threading
-from time import time
+import time
+from typing import Dict, List, Optional
+
+# Longest an async waiter sleeps before checking its cancellation token again
+CANCEL_POLL = 0.1
 
 
 class RateLimiter:
-    """Simple token bucket rate limiter"""
+    """Token bucket rate limiter. A rate of None means unlimited."""
 
-    def __init__(self, rate: float, capacity: int):
-        self.rate = rate
-        self.capacity = capacity
-        self.tokens = capacity
-        self.last_update = time.time()
+    def __init__(self, rate: Optional[float], capacity: Optional[int] = None):
         self.lock = threading.Lock()
+        self.rate = None
+        self.capacity = 0
+        self.set_rate(rate, capacity)
+        self.tokens = self.capacity
+        self.last_update = time.monotonic()
+
+    def set_rate(self, rate: Optional[float], capacity: Optional[int] = None) -> None:
+        """Change the rate at runtime; the default capacity is one second of tokens."""
+        with self.lock:
+            self.rate = rate if rate and rate > 0 else None
+            self.capacity = capacity or int(self.rate or 0)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_update) * self.rate)
+        self.last_update = now
 
     def acquire(self, tokens: int = 1) -> bool:
+        """Take tokens if they are available right now, without waiting."""
         with self.lock:
-            now = time.time()
-            time_passed = now - self.last_update
-            self.tokens = min(self.capacity, self.tokens + time_passed * self.rate)
-            self.last_update = now
+            if self.rate is None:
+                return True
+            self._refill(time.monotonic())
 
             if tokens <= self.tokens:
                 self.tokens -= tokens
                 return True
             return False
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Take tokens unconditionally and return how long the caller must wait
+        before using them. Reservations are served in arrival order.
+        """
+        with self.lock:
+            if self.rate is None:
+                return 0.0
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class FairBucket:
+    """
+    Token bucket shared by several flows that grants bytes in start-time fair
+    queuing order: every flow's requests are tagged with its cumulative
+    bytes, and the lowest tag is served first whenever tokens are available.
+    Flows therefore get equal byte shares of a congested bucket regardless of
+    the chunk size each one asks for, while an idle flow's share is used by
+    the others.
+    """
+
+    def __init__(self, rate: Optional[float]):
+        self._bucket = RateLimiter(rate)
+        self._cond = threading.Condition()
+        self._waiters: List[tuple] = []
+        self._finish: Dict[str, float] = {}
+        self._vtime = 0.0
+        self._seq = itertools.count()
+
+    @property
+    def rate(self) -> Optional[float]:
+        return self._bucket.rate
+
+    def set_rate(self, rate: Optional[float]) -> None:
+        self._bucket.set_rate(rate)
+        with self._cond:
+            self._cond.notify_all()
+
+    def forget(self, flow: str) -> None:
+        with self._cond:
+            self._finish.pop(flow, None)
+
+    def _enqueue(self, flow: str, size: int) -> tuple:
+        start = max(self._vtime, self._finish.get(flow, 0.0))
+        self._finish[flow] = start + size
+        ticket = (start, next(self._seq))
+        heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _try_take(self, ticket: tuple, size: int) -> float:
+        """Take tokens for ``ticket`` if it is first in line; otherwise return a wait hint."""
+        bucket = self._bucket
+        with bucket.lock:
+            if bucket.rate is None:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                return 0.0
+            bucket._refill(time.monotonic())
+            needed = min(size, bucket.capacity)
+            if self._waiters[0] == ticket and bucket.tokens >= needed:
+                # Large requests may push the bucket into debt; later flows wait it out.
+                bucket.tokens -= size
+                heapq.heappop(self._waiters)
+                self._vtime = ticket[0]
+                self._cond.notify_all()
+                return 0.0
+            return max((needed - bucket.tokens) / bucket.rate, 0.001)
+
+    def _leave(self, ticket: tuple) -> None:
+        """Take an abandoned ticket out of line so the flows behind it are served."""
+        with self._cond:
+            if ticket in self._waiters:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def acquire(self, flow: str, size: int, cancellation_event=None) -> None:
+        """Block until ``size`` bytes of ``flow`` may pass, or ``cancellation_event`` is set."""
+        if self._bucket.rate is None:
+            return
+        unregister = None
+        with self._cond:
+            ticket = self._enqueue(flow, size)
+            try:
+                while True:
+                    wait = self._try_take(ticket, size)
+                    if not wait:
+                        ticket = None
+                        return
+                    if cancellation_event is not None:
+                        if cancellation_event.is_set():
+                            return
+                        if unregister is None:
+                            unregister = cancellation_event.on_cancel(self._wake)
+                    self._cond.wait(wait)
+            finally:
+                if unregister is not None:
+                    unregister()
+                if ticket is not None:
+                    self._leave(ticket)
+
+    async def acquire_async(self, flow: str, size: int, cancellation_event=None) -> None:
+        """Coroutine form of acquire; cancellation is noticed within CANCEL_POLL seconds."""
+        if self._bucket.rate is None:
+            return
+        with self._cond:
+            ticket = self._enqueue(flow, size)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_take(ticket, size)
+                if not wait:
+                    ticket = None
+                    return
+                if cancellation_event is not None:
+                    if cancellation_event.is_set():
+                        return
+                    wait = min(wait, CANCEL_POLL)
+                await asyncio.sleep(wait)
+        finally:
+            if ticket is not None:
+                self._leave(ticket)
+
+
+class BandwidthLimiter:
+    """
+    Hierarchical byte-rate limiter with a global cap, per-host caps and
+    per-task caps, all adjustable at runtime.
+
+    A transfer calls ``acquire(nbytes, host, task_id)`` after reading each
+    chunk. The global and per-host caps are shared fairly between the
+    downloads using them (see FairBucket); per-task caps are plain token
+    buckets.
+    """
+
+    def __init__(
+        self,
+        global_rate: Optional[float] = None,
+        host_rate: Optional[float] = None,
+        task_rate: Optional[float] = None,
+    ):
+        """
+        Args:
+            global_rate (float, optional): Bytes per second across all downloads.
+            host_rate (float, optional): Default bytes per second per host.
+            task_rate (float, optional): Default bytes per second per download.
+        """
+        self._lock = threading.Lock()
+        self._global = FairBucket(global_rate)
+        self._host_rate = host_rate
+        self._task_rate = task_rate
+        self._host_overrides: Dict[str, Optional[float]] = {}
+        self._task_overrides: Dict[str, Optional[float]] = {}
+        self._hosts: Dict[str, FairBucket] = {}
+        self._tasks: Dict[str, RateLimiter] = {}
+        self._active: Dict[str, Optional[str]] = {}
+
+    def set_global_rate(self, rate: Optional[float]) -> None:
+        self._global.set_rate(rate)
+
+    def set_host_rate(self, rate: Optional[float], host: Optional[str] = None) -> None:
+        """Set the cap for one host, or the default for all hosts when host is None."""
+        with self._lock:
+            if host is None:
+                self._host_rate = rate
+                hosts = [h for h in self._hosts if h not in self._host_overrides]
+            else:
+                self._host_overrides[host] = rate
+                hosts = [host] if host in self._hosts else []
+            for h in hosts:
+                self._hosts[h].set_rate(rate)
+
+    def set_task_rate(self, rate: Optional[float], task_id: Optional[str] = None) -> None:
+        """Set the cap for one download, or the default for all downloads when task_id is None."""
+        with self._lock:
+            if task_id is None:
+                self._task_rate = rate
+                tasks = [t for t in self._tasks if t not in self._task_overrides]
+            else:
+                self._task_overrides[task_id] = rate
+                tasks = [task_id] if task_id in self._tasks else []
+            for t in tasks:
+                self._tasks[t].set_rate(rate)
+
+    def register(self, task_id: str, host: Optional[str] = None) -> None:
+        """Mark a download as active so fair shares can be computed."""
+        with self._lock:
+            self._active[task_id] = host
+
+    def release(self, task_id: str) -> None:
+        """Forget a finished download and its per-task state."""
+        with self._lock:
+            host = self._active.pop(task_id, None)
+            self._tasks.pop(task_id, None)
+            self._task_overrides.pop(task_id, None)
+            host_bucket = self._hosts.get(host)
+        self._global.forget(task_id)
+        if host_bucket is not None:
+            host_bucket.forget(task_id)
+
+    def _buckets(self, host: Optional[str], task_id: Optional[str]):
+        """Per-task and per-host buckets that apply, created on first use."""
+        task_bucket = host_bucket = None
+        with self._lock:
+            if task_id is not None:
+                task_bucket = self._tasks.get(task_id)
+                rate = self._task_overrides.get(task_id, self._task_rate)
+                if task_bucket is None and rate:
+                    task_bucket = self._tasks[task_id] = RateLimiter(rate)
+            if host is not None:
+                host_bucket = self._hosts.get(host)
+                rate = self._host_overrides.get(host, self._host_rate)
+                if host_bucket is None and rate:
+                    host_bucket = self._hosts[host] = FairBucket(rate)
+        return task_bucket, host_bucket
+
+    def acquire(
+        self,
+        nbytes: int,
+        host: Optional[str] = None,
+        task_id: Optional[str] = None,
+        cancellation_event=None,
+    ) -> None:
+        """
+        Block until ``nbytes`` may be transferred under every applicable cap.
+        Returns early once ``cancellation_event`` is set, so a throttled
+        download can still be paused or stopped at once.
+        """
+        task_bucket, host_bucket = self._buckets(host, task_id)
+        flow = task_id or ""
+        if task_bucket is not None:
+            wait = task_bucket.reserve(nbytes)
+            if wait > 0:
+                if cancellation_event is None:
+                    time.sleep(wait)
+                elif cancellation_event.wait(wait):
+                    return
+        if host_bucket is not None:
+            host_bucket.acquire(flow, nbytes, cancellation_event)
+            if cancellation_event is not None and cancellation_event.is_set():
+                return
+        self._global.acquire(flow, nbytes, cancellation_event)
+
+    async def acquire_async(
+        self,
+        nbytes: int,
+        host: Optional[str] = None,
+        task_id: Optional[str] = None,
+        cancellation_event=None,
+    ) -> None:
+        """Coroutine form of acquire for the asyncio engine."""
+        task_bucket, host_bucket = self._buckets(host, task_id)
+        flow = task_id or ""
+        if task_bucket is not None:
+            deadline = time.monotonic() + task_bucket.reserve(nbytes)
+            while (wait := deadline - time.monotonic()) > 0:
+                if cancellation_event is not None:
+                    if cancellation_event.is_set():
+                        return
+                    wait = min(wait, CANCEL_POLL)
+                await asyncio.sleep(wait)
+        if host_bucket is not None:
+            await host_bucket.acquire_async(flow, nbytes, cancellation_event)
+            if cancellation_event is not None and cancellation_event.is_set():
+                return
+        await self._global.acquire_async(flow, nbytes, cancellation_event)
+
+    def rate_for(self, task_id: str, host: Optional[str] = None) -> Optional[float]:
+        """
+        Current fair-share rate for one download: the tightest of its own cap,
+        its host's cap split across that host's active downloads, and the
+        global cap split across all active downloads. None if unlimited.
+        """
+        with self._lock:
+            active = max(1, len(self._active))
+            on_host = max(1, sum(1 for h in self._active.values() if h == host))
+            host_rate = self._host_overrides.get(host, self._host_rate) if host else None
+            rates = [
+                self._task_overrides.get(task_id, self._task_rate),
+                host_rate / on_host if host_rate else None,
+            ]
+        if self._global.rate:
+            rates.append(self._global.rate / active)
+        rates = [rate for rate in rates if rate]
+        return min(rates) if rates else None
@@ -0,0 +1,136 @@
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+_NOOP = contextlib.nullcontext()
+
+
+class Tracer:
+    """
+    Timed spans from every download, exportable to Chrome/Perfetto trace JSON.
+
+    Spans are complete ("X") events on the thread that ran them; intervals
+    no thread spends, such as a task waiting in the queue, are async events
+    on the task's own track. Load the export in chrome://tracing or
+    https://ui.perfetto.dev.
+
+    Tracing is off until ``enable_tracing()`` is called. Until then ``span()``
+    returns a shared no-op context manager, so the hooks throughout the
+    engine cost one global lookup each.
+    """
+
+    def __init__(self, max_events: int = 1_000_000):
+        """
+        Args:
+            max_events (int): Events kept; the oldest are dropped beyond this.
+        """
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._threads: Dict[int, str] = {}
+        self._origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    def _timestamp(self, perf_time: float) -> float:
+        return (perf_time - self._origin) * 1e6
+
+    @contextlib.contextmanager
+    def span(self, name: str, cat: str = "download", **args) -> Iterator[None]:
+        """Time the block as ``name`` on the current thread."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.complete(name, start, time.perf_counter(), cat, args)
+
+    def complete(self, name: str, start: float, end: float, cat: str = "download", args=None) -> None:
+        """Record a span on the current thread from ``time.perf_counter()`` readings."""
+        thread = threading.current_thread()
+        tid = thread.ident or 0
+        if tid not in self._threads:
+            self._threads[tid] = thread.name
+        self._events.append({
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": self._timestamp(start),
+            "dur": (end - start) * 1e6,
+            "pid": self.pid,
+            "tid": tid,
+            "args": args or {},
+        })
+
+    def interval(self, name: str, seconds: float, key: str, cat: str = "download", **args) -> None:
+        """Record the ``seconds`` just ended as an async span on the track of ``key`` (e.g. a task id)."""
+        end = time.perf_counter()
+        event = {"name": name, "cat": cat, "id": key, "pid": self.pid, "tid": 0}
+        self._events.append({**event, "ph": "b", "ts": self._timestamp(end - seconds), "args": args})
+        self._events.append({**event, "ph": "e", "ts": self._timestamp(end)})
+
+    def events(self) -> List[Dict[str, Any]]:
+        return list(self._events)
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """The trace in Chrome's JSON object format, with thread names."""
+        names = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self._threads.items())
+        ]
+        return {"traceEvents": names + self.events(), "displayTimeUnit": "ms"}
+
+    def export(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f, default=str)
+
+
+_tracer: Optional[Tracer] = None
+_lock = threading.Lock()
+
+
+def enable_tracing(export_to: Optional[str] = None, max_events: int = 1_000_000) -> Tracer:
+    """
+    Start tracing the whole process; returns the tracer (the running one if
+    tracing is already on).
+
+    Args:
+        export_to (str, optional): Write the trace to this file when the process exits.
+        max_events (int): Events kept; the oldest are dropped beyond this.
+    """
+    global _tracer
+    with _lock:
+        if _tracer is None:
+            _tracer = Tracer(max_events)
+        tracer = _tracer
+    if export_to:
+        atexit.register(tracer.export, export_to)
+    return tracer
+
+
+def disable_tracing() -> Optional[Tracer]:
+    """Stop tracing; returns the tracer that was running, if any."""
+    global _tracer
+    with _lock:
+        tracer, _tracer = _tracer, None
+    return tracer
+
+
+def active_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def span(name: str, cat: str = "download", **args):
+    """Context manager timing the block as ``name`` if tracing is on."""
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+    return tracer.span(name, cat, **args)
+
+
+def record_interval(name: str, seconds: float, key: str, cat: str = "download", **args) -> None:
+    """Record an interval that just ended (see Tracer.interval) if tracing is on."""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.interval(name, seconds, key, cat, **args)
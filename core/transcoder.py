@@ -0,0 +1,156 @@
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from utils.ffmpeg import find_ffmpeg
+from .cancellation import CancellationToken
+from .download_task import DownloadTask
+from .tracing import span
+
+# Output format -> (ffmpeg encoder, file extension)
+CODECS = {
+    "mp3": ("libmp3lame", ".mp3"),
+    "m4a": ("aac", ".m4a"),
+    "opus": ("libopus", ".opus"),
+}
+
+
+class TranscodeCancelled(Exception):
+    pass
+
+
+class Transcoder:
+    """
+    Post-processing stage that converts downloaded audio with ffmpeg.
+
+    Jobs run in their own ffmpeg processes, at most ``workers`` at a time
+    (one per core by default), so download workers hand a finished file
+    over and go back to the network instead of sitting through the
+    transcode. At most ``max_pending`` jobs may be waiting or running;
+    ``submit`` blocks beyond that, which holds downloads back when the CPU
+    cannot keep up.
+    """
+
+    def __init__(
+        self,
+        ffmpeg: Optional[str] = None,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        codec: str = "mp3",
+        bitrate: str = "192k",
+    ):
+        """
+        Args:
+            ffmpeg (str, optional): ffmpeg executable; found with find_ffmpeg() by default.
+            workers (int, optional): Concurrent ffmpeg processes; defaults to the number of cores.
+            max_pending (int, optional): Jobs allowed in the stage at once; defaults to twice ``workers``.
+            codec (str): Output format, one of CODECS.
+            bitrate (str): Target audio bitrate.
+        """
+        self.ffmpeg = ffmpeg or find_ffmpeg()
+        if self.ffmpeg is None:
+            raise RuntimeError("ffmpeg is required for audio conversion but was not found")
+        self.workers = workers or os.cpu_count() or 1
+        self.encoder, self.extension = CODECS[codec]
+        self.bitrate = bitrate
+        self._slots = threading.BoundedSemaphore(max_pending or 2 * self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="Transcoder")
+        self._lock = threading.Lock()
+        self._stats = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+
+    def target_path(self, source: str) -> str:
+        return os.path.splitext(source)[0] + self.extension
+
+    def submit(
+        self,
+        source: str,
+        duration: Optional[float] = None,
+        task: Optional[DownloadTask] = None,
+        progress: Optional[Callable] = None,
+        cancellation_event: Optional[CancellationToken] = None,
+    ) -> Future:
+        """
+        Queue the conversion of ``source``; blocks while the stage is full.
+
+        The returned future resolves to the converted file's path. The source
+        file is removed once the conversion succeeded. With ``duration`` (in
+        seconds), ``task.conversion`` is kept up to date and ``progress`` is
+        called with the task as ffmpeg reports its position.
+        """
+        # Time a download worker spends blocked here means the stage is the bottleneck.
+        with span("transcode_slot", "ffmpeg", source=source):
+            self._slots.acquire()
+        with self._lock:
+            self._stats["queued"] += 1
+        try:
+            future = self._executor.submit(self._run, source, duration, task, progress, cancellation_event)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _move(self, from_state: str, to_state: str) -> None:
+        with self._lock:
+            self._stats[from_state] -= 1
+            self._stats[to_state] += 1
+
+    def _run(self, source, duration, task, progress, cancellation_event) -> str:
+        self._move("queued", "running")
+        target = self.target_path(source)
+        tmp_path = target + ".part" + self.extension
+        command = [
+            self.ffmpeg, "-nostdin", "-y", "-loglevel", "error",
+            "-i", source, "-vn", "-codec:a", self.encoder, "-b:a", self.bitrate,
+            "-progress", "pipe:1", "-nostats", tmp_path,
+        ]
+        try:
+            # stderr goes to a file: a pipe nobody reads until stdout ends could fill up and stall ffmpeg.
+            with tempfile.TemporaryFile("w+") as stderr, span("transcode", "ffmpeg", source=source):
+                with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr, text=True) as process:
+                    # Cancelling kills ffmpeg right away instead of at its next progress line.
+                    register = getattr(cancellation_event, "on_cancel", None)
+                    unregister = register(process.kill) if register else None
+                    try:
+                        # ffmpeg writes key=value progress blocks a few times a second.
+                        for line in process.stdout:
+                            if cancellation_event is not None and cancellation_event.is_set():
+                                break
+                            key, _, value = line.strip().partition("=")
+                            if key == "out_time_us" and duration and task is not None and value.isdigit():
+                                task.conversion = min(1.0, int(value) / 1e6 / duration)
+                                if progress:
+                                    progress(task)
+                        if cancellation_event is not None and cancellation_event.is_set():
+                            process.kill()
+                            raise TranscodeCancelled(f"Conversion of {source} cancelled")
+                    finally:
+                        if unregister:
+                            unregister()
+                stderr.seek(0)
+                errors = stderr.read()
+            if process.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed on {source}: {errors.strip() or process.returncode}")
+            os.replace(tmp_path, target)
+            os.remove(source)
+        except BaseException:
+            self._move("running", "failed")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._move("running", "completed")
+        if task is not None:
+            task.conversion = 1.0
+        logging.info(f"Converted {source} to {target}")
+        return target
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass
+class CachedResponse:
+    """Validators of a finished download and the file it was saved to."""
+
+    url: str
+    path: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    size: int
+    checked: float
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def matches(self, headers) -> bool:
+        """True if a full response's headers still describe the cached file.
+
+        Catches servers that ignore conditional headers but report validators.
+        """
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if not (etag or last_modified) or (etag or None) != self.etag:
+            return False
+        if last_modified and last_modified != self.last_modified:
+            return False
+        length = headers.get("Content-Length")
+        return length is None or int(length) == self.size
+
+
+class ValidatorCache:
+    """
+    Persistent ETag/Last-Modified/size record per URL, so a re-run can ask
+    the server whether a file changed instead of downloading it again.
+
+    Entries are only returned while the file they describe is still on disk
+    with the recorded size.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): SQLite database file.
+        """
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS validators (
+                    url TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    size INTEGER NOT NULL,
+                    checked REAL NOT NULL
+                )"""
+            )
+
+    def get(self, url: str, output_folder: Optional[str] = None) -> Optional[CachedResponse]:
+        """Validators for ``url`` if its file is intact (and inside ``output_folder``, if given)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, path, etag, last_modified, size, checked FROM validators WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = CachedResponse(*row)
+        if output_folder is not None and os.path.dirname(entry.path) != os.path.normpath(output_folder):
+            return None
+        try:
+            if os.path.getsize(entry.path) != entry.size:
+                return None
+        except OSError:
+            return None
+        return entry
+
+    def put(self, url: str, path: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """Remember the validators of a finished download; ignored if the server sent none."""
+        if not (etag or last_modified):
+            return
+        path = os.path.normpath(path)
+        size = os.path.getsize(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO validators (url, path, etag, last_modified, size, checked) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, path, etag, last_modified, size, time.time()),
+            )
+
+    def touch(self, url: str) -> None:
+        """Record that ``url`` was just confirmed unchanged."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE validators SET checked = ? WHERE url = ?", (time.time(), url))
+
+    def forget(self, url: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM validators WHERE url = ?", (url,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
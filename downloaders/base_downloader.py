@@ -1,37 +1,30 @@
-import logging
 from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
+from core.rate_limiter import BandwidthLimiter
 
 
 class BaseDownloader(ABC):
-    def __init__(self, download_folder: str, cancellation_event=None):
+    def __init__(self, download_folder: str, cancellation_event=None, limiter: Optional[BandwidthLimiter] = None):
         self.download_folder = Path(download_folder)
         self.download_folder.mkdir(parents=True, exist_ok=True)
-        self._setup_logging()
+        self.limiter = limiter
+
     @abstractmethod
     def download(self, *args, **kwargs):
         """Abstract method for downloading files."""
         pass
 
-    def _setup_logging(self):
-        """Configure logging with both file and console handlers"""
-        logger = logging.getLogger()
-        logger.handlers.clear()
-
-        console = logging.StreamHandler()
-        console.setLevel(logging.INFO)
-        console.setFormatter(
-            logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        )
-
-        file_handler = logging.FileHandler(self.download_folder / "downloader.log")
-        file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(
-            logging.Formatter(
-                "%(asctime)s - %(threadName)s - %(levelname)s - %(message)s"
-            )
-        )
+    def _throttle(self, nbytes: int, url: str, cancellation_event=None) -> None:
+        """Block until the bandwidth limiter lets ``nbytes`` of ``url`` through, or the download is cancelled."""
+        if self.limiter is not None:
+            self.limiter.acquire(nbytes, urlparse(url).netloc, url, cancellation_event)
 
-        logger.addHandler(console)
-        logger.addHandler(file_handler)
-        logger.setLevel(logging.DEBUG)
+    def _ytdlp_rate_options(self, url: str) -> dict:
+        """Map the current fair-share cap for ``url`` onto yt-dlp's ``ratelimit`` option."""
+        if self.limiter is None:
+            return {}
+        rate = self.limiter.rate_for(url, urlparse(url).netloc)
+        return {"ratelimit": int(rate)} if rate else {}
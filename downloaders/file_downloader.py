@@ -1,44 +1,195 @@
+import hashlib
 import mimetypes
 import os
 import logging
 import requests
-import threading
-from .base_downloader import BaseDownloader
+from typing import Optional
+from core.cancellation import CancellationToken
+from core.content_store import ContentStore
+from core.http_pool import HttpPool
+from core.metrics import record_retry
+from core.rate_limiter import BandwidthLimiter
+from core.tracing import span
+from core.validator_cache import ValidatorCache
+from .http_downloader import HttpDownloader
+from .partial import PartialState, partial_path
+from .segmented import RangeNotSupported, SegmentedDownload
 
 
-class FileDownloader(BaseDownloader):
-    def download(self, url: str, output_folder: str, cancellation_event=None):
+class FileDownloader(HttpDownloader):
+    def __init__(
+        self,
+        download_folder: str,
+        segments: int = 4,
+        min_segment_size: int = 1024 * 1024,
+        session: Optional[HttpPool] = None,
+        limiter: Optional[BandwidthLimiter] = None,
+        content_store: Optional[ContentStore] = None,
+        validator_cache: Optional[ValidatorCache] = None,
+    ):
+        """
+        Args:
+            download_folder (str): Path to the download folder.
+            segments (int): Parallel range connections per file; 1 disables segmented mode.
+            min_segment_size (int): Smallest byte range worth its own connection.
+            session (HttpPool, optional): Shared connection pool; defaults to the process-wide pool.
+            limiter (BandwidthLimiter, optional): Bandwidth caps applied to every chunk.
+            content_store (ContentStore, optional): Deduplicates finished files by content.
+            validator_cache (ValidatorCache, optional): Revalidates earlier downloads instead of refetching.
+        """
+        super().__init__(download_folder, session, limiter, content_store, validator_cache)
+        self.segments = segments
+        self.min_segment_size = min_segment_size
+
+    def _file_name(self, url: str, content_type: str) -> str:
+        file_name = url.split("/")[-1] or "downloaded_file"
+        extension = mimetypes.guess_extension(content_type.split(";")[0]) or ""
+
+        if not file_name.endswith(extension):
+            file_name += extension
+        return file_name
+
+    def _probe(self, url: str, headers=None):
+        """HEAD ``url``; returns the response, or None if the request failed."""
+        try:
+            with span("probe", "http", url=url):
+                response = self.session.head(url, allow_redirects=True, timeout=10, headers=headers)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logging.debug(f"Range probe failed for {url}: {e}")
+            return None
+        return response
+
+    def _segmentable(self, headers) -> bool:
+        """True if the server can serve byte ranges of a file worth splitting."""
+        size = int(headers.get("Content-Length") or 0)
+        return (
+            headers.get("Accept-Ranges", "").lower() == "bytes"
+            and not headers.get("Content-Encoding")
+            and size >= 2 * self.min_segment_size
+        )
+
+    def _download_segmented(self, url, output_folder, headers, cancellation_event, task=None, progress=None):
+        """Segmented transfer into a ``.part`` file; returns None if cancelled."""
+        size = int(headers["Content-Length"])
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        part_path = partial_path(output_folder, url)
+
+        state = PartialState.load(part_path)
+        resume_segments = None
+        if state and state.segments and state.matches(etag, last_modified, size):
+            resume_segments = state.segments
+            logging.info(f"Resuming segmented download of {url}")
+        else:
+            PartialState.discard(part_path)
+        state = PartialState(url=url, etag=etag, last_modified=last_modified, total_size=size)
+        on_progress = None
+        if task is not None:
+            task.etag = etag
+            task.resumable = bool(state.validator)
+            task.total_size = size
+
+            def on_progress(received):
+                # Workers report concurrently, so a smaller total can arrive after a larger one.
+                if received <= task.downloaded:
+                    return
+                task.update_progress(received)
+                if progress:
+                    progress(task)
+
+        def checkpoint(segments):
+            state.segments = segments
+            state.save(part_path)
+
+        hasher = hashlib.sha256()
+        completed = SegmentedDownload(
+            url,
+            part_path,
+            size,
+            segments=self.segments,
+            min_segment_size=self.min_segment_size,
+            validator=state.validator,
+            resume_segments=resume_segments,
+            on_checkpoint=checkpoint if state.validator else None,
+            session=self.session,
+            throttle=self._throttle,
+            on_progress=on_progress,
+            hasher=hasher,
+        ).run(cancellation_event)
+        if not completed:
+            if not state.validator:
+                PartialState.discard(part_path)
+            return None
+
+        file_path = os.path.join(output_folder, self._file_name(url, headers.get("Content-Type", "")))
+        return self._finalize(url, part_path, file_path, hasher.hexdigest(), headers)
+
+    def download(self, url: str, output_folder: str, cancellation_event=None, task=None, progress=None, probe=None):
+        """
+        Download ``url`` into ``output_folder``, in segments when the server allows it.
+
+        Args:
+            probe (requests.Response, optional): A HEAD response for ``url`` the caller already
+                has, e.g. from revalidating an earlier download; used instead of probing again.
+        """
         try:
             if cancellation_event is None:
-                cancellation_event = threading.Event()
+                cancellation_event = CancellationToken()
             os.makedirs(output_folder, exist_ok=True)
             if cancellation_event.is_set():
                 logging.info("File download stopped before starting")
                 return None
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
+            cached = self._cached(url, output_folder)
+            if cached is None:
+                file_path = self._stored(url, output_folder)
+                if file_path:
+                    return file_path
 
-            file_name = url.split("/")[-1] or "downloaded_file"
-            content_type = response.headers.get("Content-Type", "")
-            extension = mimetypes.guess_extension(content_type.split(";")[0]) or ""
-
-            if not file_name.endswith(extension):
-                file_name += extension
-
-            file_path = os.path.join(output_folder, file_name)
-            with open(file_path, "wb") as file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if cancellation_event.is_set():
-                        file.close()
-                        os.remove(file_path)
-                        logging.info("File download stopped")
-                        return None
-                    if chunk:
-                        file.write(chunk)
-            print(f"File downloaded successfully: {file_path}")
+            headers = None
+            if self.segments > 1:
+                if probe is not None:
+                    response = probe if probe.ok else None
+                else:
+                    response = self._probe(url, cached.conditional_headers() if cached else None)
+                if response is not None and cached and (
+                    response.status_code == 304 or cached.matches(response.headers)
+                ):
+                    return self._not_modified(url, cached, task)
+                if response is not None and self._segmentable(response.headers):
+                    headers = response.headers
+            if headers:
+                try:
+                    file_path = self._download_segmented(
+                        url, output_folder, headers, cancellation_event, task, progress
+                    )
+                except RangeNotSupported as e:
+                    logging.info(f"{e}; falling back to a single stream")
+                    record_retry(url, "range_ignored")
+                    PartialState.discard(partial_path(output_folder, url))
+                    headers = None
+            if not headers:
+                file_path = self._stream(
+                    url,
+                    output_folder,
+                    lambda response: self._file_name(url, response.headers.get("Content-Type", "")),
+                    cancellation_event,
+                    task,
+                    progress,
+                    cached,
+                )
+
+            if file_path is None:
+                logging.info("File download stopped")
+                return None
+            logging.debug(f"File downloaded successfully: {file_path}")
+            return file_path
         except requests.RequestException as e:
             if not cancellation_event.is_set():
                 logging.info(f"Network error downloading file: {e}")
+                if task is not None:
+                    task.error = str(e)
             return None
         except Exception as e:
-            print(f"Failed to download file: {e}")
+            logging.error(f"Failed to download file: {e}")
+            if task is not None:
+                task.error = str(e)
@@ -0,0 +1,291 @@
+import hashlib
+import logging
+import os
+from typing import Callable, Optional
+
+import requests
+
+from core.cancellation import CancellationToken, closing_on_cancel
+from core.content_store import ContentStore
+from core.http_pool import HttpPool, default_pool
+from core.metrics import record_retry
+from core.tracing import span
+from core.rate_limiter import BandwidthLimiter
+from core.validator_cache import CachedResponse, ValidatorCache
+from .base_downloader import BaseDownloader
+from .partial import PartialState, partial_path
+from .stream_io import ChunkSizer, WriteBehindFile, body_reader
+
+
+class HttpDownloader(BaseDownloader):
+    """Base class for plain HTTP downloads that stream into a resumable ``.part`` file."""
+
+    # First read size; ChunkSizer grows it up to max_chunk_size with throughput.
+    chunk_size = 64 * 1024
+    max_chunk_size = 4 * 1024 * 1024
+
+    def __init__(
+        self,
+        download_folder: str,
+        session: Optional[HttpPool] = None,
+        limiter: Optional[BandwidthLimiter] = None,
+        content_store: Optional[ContentStore] = None,
+        validator_cache: Optional[ValidatorCache] = None,
+    ):
+        super().__init__(download_folder, limiter=limiter)
+        self.session = session or default_pool()
+        self.content_store = content_store
+        self.validator_cache = validator_cache
+
+    def _check_response(self, response: requests.Response) -> None:
+        """Hook for subclasses to reject a response before anything is written."""
+
+    def _stored(self, url: str, output_folder: str) -> Optional[str]:
+        """File already holding this URL's content, so the transfer can be skipped"""
+        if self.content_store is None:
+            return None
+        file_path = self.content_store.lookup(url, output_folder)
+        if file_path:
+            logging.info(f"{url} was downloaded before; reusing {file_path}")
+        return file_path
+
+    def _cached(self, url: str, output_folder: str) -> Optional[CachedResponse]:
+        """Validators of an earlier download of ``url`` whose file is still intact"""
+        if self.validator_cache is None:
+            return None
+        return self.validator_cache.get(url, output_folder)
+
+    def _not_modified(self, url: str, cached: CachedResponse, task=None) -> str:
+        logging.info(f"{url} is unchanged; keeping {cached.path}")
+        self.validator_cache.touch(url)
+        if task is not None:
+            task.update_progress(cached.size, cached.size)
+        return cached.path
+
+    def _remember(self, url: str, file_path: str, headers) -> None:
+        if self.validator_cache is not None:
+            self.validator_cache.put(url, file_path, headers.get("ETag"), headers.get("Last-Modified"))
+
+    def _deduplicate(self, url: str, file_path: str, digest: Optional[str]) -> str:
+        if self.content_store is not None and digest:
+            self.content_store.add(url, file_path, digest)
+        return file_path
+
+    def _resume_request(self, part_path: str, cached: Optional[CachedResponse] = None):
+        """
+        Resume state of ``part_path`` and the headers of the request that continues it.
+
+        Returns the state (None if there is none), the byte to resume from, and
+        Range/If-Range headers for a resume or else the conditional headers of ``cached``.
+        """
+        state = PartialState.load(part_path)
+        offset = state.resume_offset(part_path) if state else 0
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = state.validator
+        elif cached:
+            headers.update(cached.conditional_headers())
+        return state, offset, headers
+
+    def _interpret(self, url: str, status: int, cached, part_path: str, state, offset: int) -> str:
+        """
+        What to do with a response to the request from ``_resume_request``.
+
+        Returns "not_modified" for a 304, when ``cached`` is kept; "restart" for a
+        416, after discarding the ``.part`` file; otherwise "write", and the body
+        goes to ``_begin``.
+        """
+        if status == 304 and cached:
+            return "not_modified"
+        if status != 416:
+            return "write"
+        if state and state.total_size and offset >= state.total_size:
+            # Our own resume state is wrong, not the server's file.
+            reason = "stale_partial"
+        else:
+            # Our offset is past the end of the remote file: it changed under us.
+            reason = "remote_changed"
+        logging.info(f"Range request for {url} was not satisfiable ({reason}); restarting")
+        record_retry(url, reason)
+        PartialState.discard(part_path)
+        return "restart"
+
+    def _begin(self, url: str, status: int, headers, part_path: str, offset: int, task=None):
+        """
+        Start writing a response body into ``part_path``.
+
+        A 206 continues the file at ``offset`` and hashes the bytes already there;
+        any other status replaces it. The resume state is saved and ``task`` updated.
+
+        Returns the state, the offset the body starts at and the running SHA-256.
+        """
+        hasher = hashlib.sha256()
+        if offset and status == 206:
+            logging.info(f"Resuming {url} from byte {offset}")
+            with open(part_path, "rb") as file, span("rehash", "disk", offset=offset):
+                remaining = offset
+                while remaining:
+                    block = file.read(min(1024 * 1024, remaining))
+                    if not block:
+                        break
+                    hasher.update(block)
+                    remaining -= len(block)
+        else:
+            if offset:
+                logging.info(f"Validator changed for {url}; restarting from scratch")
+            offset = 0
+
+        length = int(headers.get("Content-Length") or 0)
+        state = PartialState(
+            url=url,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            total_size=offset + length if length else 0,
+            written=offset,
+        )
+        state.save(part_path)
+        if task is not None:
+            task.etag = state.etag
+            task.resumable = bool(state.validator and headers.get("Accept-Ranges", "").lower() == "bytes")
+            task.update_progress(offset, state.total_size)
+        return state, offset, hasher
+
+    @staticmethod
+    def _part_writer(part_path: str, state: PartialState, offset: int, hasher) -> WriteBehindFile:
+        """
+        WriteBehindFile for a body started by ``_begin``.
+
+        The file is preallocated when the size is known, and every write is
+        hashed; after each fdatasync ``state.written`` is saved, so a resume after
+        a crash starts from durable bytes. Close it with ``truncate_to`` set to
+        the end of the data, so an early stop cuts off the preallocated tail.
+        """
+        end = offset
+
+        def written(position: int, data: memoryview) -> None:
+            nonlocal end
+            hasher.update(data)
+            end = position + len(data)
+
+        def synced() -> None:
+            # The file is preallocated, so its size says nothing after a crash.
+            state.written = end
+            state.save(part_path)
+
+        return WriteBehindFile(
+            part_path,
+            size=state.total_size or None,
+            truncate=not offset,
+            on_written=written,
+            on_sync=synced,
+        )
+
+    def _stopped(self, url: str, part_path: str, state: PartialState) -> None:
+        if not state.validator:
+            # Without ETag/Last-Modified a resume could splice two versions of the file.
+            logging.info(f"Download of {url} stopped; the server gave no validator, so it cannot resume")
+            PartialState.discard(part_path)
+            return
+        logging.info(f"Download of {url} stopped; keeping partial file for resume")
+
+    def _finalize(self, url: str, part_path: str, file_path: str, digest: Optional[str], headers) -> str:
+        """Move the finished ``.part`` file to ``file_path`` and record it for later runs."""
+        with span("finalize", "disk"):
+            PartialState.finish(part_path, file_path)
+            self._deduplicate(url, file_path, digest)
+            self._remember(url, file_path, headers)
+        return file_path
+
+    def _write(self, url, response, part_path, offset, cancellation_event, task, progress) -> Optional[str]:
+        """Write the response body into ``part_path``.
+
+        The body is read into recycled buffers, sized by ChunkSizer, and
+        written and hashed by the ``_part_writer``, so this thread only reads
+        from the network.
+
+        Returns the SHA-256 of the whole file, or None if cancelled.
+        """
+        state, offset, hasher = self._begin(
+            url, response.status_code, response.headers, part_path, offset, task
+        )
+        writer = self._part_writer(part_path, state, offset, hasher)
+        sizer = ChunkSizer(self.chunk_size, max_size=self.max_chunk_size)
+        readinto = body_reader(response)
+        position = offset
+        try:
+            with span("transfer", url=url, offset=offset):
+                while not cancellation_event.is_set():
+                    buf = writer.buffer(sizer.size)
+                    try:
+                        n = readinto(memoryview(buf)[: sizer.size])
+                    except BaseException:
+                        writer.release(buf)
+                        raise
+                    if not n:
+                        writer.release(buf)
+                        break
+                    self._throttle(n, url, cancellation_event)
+                    writer.write(position, buf, n)
+                    position += n
+                    sizer.update(n)
+                    if task is not None:
+                        task.add_bytes(n)
+                        if progress:
+                            progress(task)
+        except Exception:
+            # A read interrupted by the cancellation closing the socket.
+            if not cancellation_event.is_set():
+                raise
+        finally:
+            with span("close_file", "disk"):
+                writer.close(truncate_to=position)
+        if cancellation_event.is_set():
+            self._stopped(url, part_path, state)
+            return None
+        return hasher.hexdigest()
+
+    def _stream(
+        self,
+        url: str,
+        output_folder: str,
+        resolve_name: Callable[[requests.Response], str],
+        cancellation_event: CancellationToken,
+        task=None,
+        progress: Optional[Callable] = None,
+        cached: Optional[CachedResponse] = None,
+        **request_kwargs,
+    ) -> Optional[str]:
+        """
+        Stream ``url`` into ``output_folder``, resuming a previous ``.part`` file if
+        the server still reports the same ETag/Last-Modified. With ``cached``
+        validators the request is conditional, and a 304 keeps the cached file.
+
+        Returns the final file path, or None if the download was cancelled. On
+        cancellation the ``.part`` file and its sidecar are kept for a later resume,
+        unless the server sent no validator to resume against.
+        """
+        part_path = partial_path(output_folder, url)
+        state, offset, headers = self._resume_request(part_path, cached)
+
+        # Returns once the headers are in: the span is the time to first byte.
+        with span("request", "http", url=url, offset=offset):
+            response = self.session.get(url, stream=True, headers=headers, **request_kwargs)
+        # Cancelling or pausing closes the socket, so a stalled read does not hold the worker.
+        with response, closing_on_cancel(cancellation_event, response):
+            action = self._interpret(url, response.status_code, cached, part_path, state, offset)
+            if action == "not_modified":
+                return self._not_modified(url, cached, task)
+            if action == "write":
+                response.raise_for_status()
+                self._check_response(response)
+                digest = self._write(url, response, part_path, offset, cancellation_event, task, progress)
+                if digest is None:
+                    return None
+        if action == "restart":
+            return self._stream(
+                url, output_folder, resolve_name, cancellation_event, task, progress, **request_kwargs
+            )
+
+        file_path = os.path.join(output_folder, resolve_name(response))
+        return self._finalize(url, part_path, file_path, digest, response.headers)
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+
+def partial_path(output_folder: str, url: str) -> str:
+    """Stable ``.part`` path for a URL, independent of the final file name."""
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(output_folder, f".{digest}.part")
+
+
+def pick_validator(etag: Optional[str], last_modified: Optional[str]) -> Optional[str]:
+    """Return a validator usable in If-Range (weak ETags are not allowed there)."""
+    if etag and not etag.startswith("W/"):
+        return etag
+    return last_modified
+
+
+@dataclass
+class PartialState:
+    """Sidecar record describing a ``.part`` file so it can be resumed."""
+
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    total_size: int = 0
+    # [start, written, end] per range for segmented downloads
+    segments: List[List[int]] = field(default_factory=list)
+    # Single stream: bytes known to be on disk (the file itself may be preallocated)
+    written: Optional[int] = None
+
+    @property
+    def validator(self) -> Optional[str]:
+        return pick_validator(self.etag, self.last_modified)
+
+    @staticmethod
+    def path_for(part_path: str) -> str:
+        return part_path + ".json"
+
+    @classmethod
+    def load(cls, part_path: str) -> Optional["PartialState"]:
+        if not os.path.exists(part_path):
+            return None
+        try:
+            with open(cls.path_for(part_path), "r", encoding="utf-8") as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            logging.debug(f"Ignoring unreadable resume state for {part_path}: {e}")
+            return None
+
+    def save(self, part_path: str) -> None:
+        state_path = self.path_for(part_path)
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp_path, state_path)
+
+    def resume_offset(self, part_path: str) -> int:
+        """Byte a single-stream resume of ``part_path`` starts from; 0 if it cannot resume."""
+        if not self.validator or self.segments:
+            return 0
+        offset = os.path.getsize(part_path)
+        if self.written is not None:
+            offset = min(offset, self.written)
+        return offset
+
+    def matches(self, etag: Optional[str], last_modified: Optional[str], total_size: int) -> bool:
+        """True if the remote resource still looks like the one we started."""
+        if not self.validator or self.total_size != total_size:
+            return False
+        return self.validator == pick_validator(etag, last_modified)
+
+    @classmethod
+    def discard(cls, part_path: str) -> None:
+        for path in (part_path, cls.path_for(part_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @classmethod
+    def finish(cls, part_path: str, file_path: str) -> None:
+        """Move a completed ``.part`` file into place and drop its sidecar."""
+        os.replace(part_path, file_path)
+        state_path = cls.path_for(part_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
@@ -0,0 +1,298 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from core.cancellation import CancellationToken, closing_on_cancel
+from core.http_pool import HttpPool, default_pool
+from core.tracing import span
+from .stream_io import ChunkSizer, WriteBehindFile, body_reader
+
+
+class RangeNotSupported(Exception):
+    """Raised when the server ignores a Range request."""
+
+
+@dataclass
+class Segment:
+    start: int
+    end: int  # exclusive
+    position: int  # next byte to reserve
+    written: int = -1  # bytes before this offset are on disk
+
+    def __post_init__(self):
+        if self.written < 0:
+            self.written = self.position
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.end - self.position)
+
+
+class SegmentedDownload:
+    """Download one file over several parallel byte-range connections.
+
+    The file is split into ``segments`` ranges, each fetched by its own
+    worker into recycled buffers and handed to a WriteBehindFile, which
+    writes it at its offset in the preallocated output file. A worker
+    that finishes early steals the back half of the largest range still in
+    flight, so a slow connection does not hold up the whole file.
+
+    Passing ``resume_segments`` (``[start, written, end]`` triples from an
+    earlier checkpoint) continues a previous run in place; ``on_checkpoint``
+    is called with the current triples after every batched fdatasync (at
+    most every ``checkpoint_interval`` seconds) and on exit, so it never
+    records bytes that are not durable yet.
+    ``on_progress`` receives the total bytes on disk after every chunk.
+
+    With a ``hasher`` (e.g. ``hashlib.sha256()``), the file is hashed in
+    order while it downloads: bytes that extend the contiguous prefix are
+    hashed straight from memory, and ranges that arrived ahead of it are
+    read back (from the page cache) once the prefix reaches them.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        file_path: str,
+        total_size: int,
+        segments: int = 4,
+        min_segment_size: int = 1024 * 1024,
+        chunk_size: int = 64 * 1024,
+        max_chunk_size: int = 1024 * 1024,
+        timeout: float = 30,
+        validator: Optional[str] = None,
+        resume_segments: Optional[List[List[int]]] = None,
+        on_checkpoint: Optional[Callable[[List[List[int]]], None]] = None,
+        checkpoint_interval: float = 1.0,
+        session: Optional[HttpPool] = None,
+        throttle: Optional[Callable[..., None]] = None,
+        on_progress: Optional[Callable[[int], None]] = None,
+        hasher=None,
+    ):
+        self.url = url
+        self.file_path = file_path
+        self.total_size = total_size
+        self.segments = max(1, segments)
+        self.min_segment_size = min_segment_size
+        self.chunk_size = chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.timeout = timeout
+        self.validator = validator
+        self.resume_segments = resume_segments
+        self.on_checkpoint = on_checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.session = session or default_pool()
+        self.throttle = throttle
+        self.on_progress = on_progress
+        self.hasher = hasher
+        self._received = 0
+        self._hashed = 0
+        self._hash_lock = threading.Lock()
+        self._hash_file = None
+        self._writer: Optional[WriteBehindFile] = None
+
+        self._lock = threading.Lock()
+        self._segments: List[Segment] = []
+        self._errors: List[BaseException] = []
+        self._abort = threading.Event()
+
+    def _split(self) -> List[Segment]:
+        count = min(self.segments, max(1, self.total_size // self.min_segment_size))
+        size = self.total_size // count
+        segments = []
+        for i in range(count):
+            start = i * size
+            end = self.total_size if i == count - 1 else start + size
+            segments.append(Segment(start, end, start))
+        return segments
+
+    def checkpoint(self) -> List[List[int]]:
+        """Snapshot of ``[start, written, end]`` for every segment."""
+        with self._lock:
+            return [[s.start, s.written, s.end] for s in self._segments]
+
+    def _checkpoint(self) -> None:
+        if self.on_checkpoint:
+            self.on_checkpoint(self.checkpoint())
+
+    def _written(self, offset: int, data: memoryview) -> None:
+        """Writer callback: the bytes at ``offset`` are in the file."""
+        with self._lock:
+            for segment in self._segments:
+                if segment.start <= offset < segment.end:
+                    segment.written = offset + len(data)
+                    break
+        if self.hasher:
+            self._advance_hash(offset, data)
+
+    def _contiguous_end(self) -> int:
+        """End of the run of bytes on disk that starts at offset 0. Call with _lock held."""
+        end = 0
+        for segment in sorted(self._segments, key=lambda s: s.start):
+            if segment.start > end:
+                break
+            end = max(end, segment.written)
+            if segment.written < segment.end:
+                break
+        return end
+
+    def _hash_up_to(self, end: int) -> None:
+        """Hash bytes from disk up to ``end``. Call with _hash_lock held."""
+        while self._hashed < end:
+            self._hash_file.seek(self._hashed)
+            block = self._hash_file.read(min(1024 * 1024, end - self._hashed))
+            if not block:
+                break
+            self.hasher.update(block)
+            self._hashed += len(block)
+
+    def _advance_hash(self, offset: int, data: bytes) -> None:
+        # Whoever holds the lock hashes for everyone; anything it misses is
+        # picked up by the next chunk or by the final pass in run().
+        if not self._hash_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                end = self._contiguous_end()
+            if self._hashed == offset and offset + len(data) <= end:
+                self.hasher.update(data)
+                self._hashed += len(data)
+            self._hash_up_to(end)
+        finally:
+            self._hash_lock.release()
+
+    def _steal(self) -> Optional[Segment]:
+        """Split the largest in-flight segment and hand back its tail."""
+        with self._lock:
+            victim = max(self._segments, key=lambda s: s.remaining, default=None)
+            if victim is None or victim.remaining < 2 * self.min_segment_size:
+                return None
+            mid = victim.position + victim.remaining // 2
+            stolen = Segment(mid, victim.end, mid)
+            victim.end = mid
+            self._segments.append(stolen)
+            logging.debug(f"Stole bytes {stolen.start}-{stolen.end - 1} of {self.url}")
+            return stolen
+
+    def _fetch(self, segment: Segment, cancellation_event: CancellationToken) -> None:
+        headers = {"Range": f"bytes={segment.position}-{segment.end - 1}"}
+        if self.validator:
+            headers["If-Range"] = self.validator
+        with span("request", "http", url=self.url, offset=segment.position):
+            response = self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout)
+        with response, closing_on_cancel(cancellation_event, response), span(
+            "segment", url=self.url, start=segment.position, end=segment.end
+        ):
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise RangeNotSupported(f"Server ignored Range for {self.url}")
+
+            readinto = body_reader(response)
+            sizer = ChunkSizer(self.chunk_size, max_size=self.max_chunk_size)
+            while not (cancellation_event.is_set() or self._abort.is_set()):
+                with self._lock:
+                    wanted = min(sizer.size, segment.end - segment.position)
+                if wanted <= 0:
+                    return
+                buf = self._writer.buffer(wanted)
+                try:
+                    n = readinto(memoryview(buf)[:wanted])
+                except BaseException:
+                    self._writer.release(buf)
+                    raise
+                # Reserve the bytes under the lock so a concurrent steal
+                # never splits inside a chunk we are about to write.
+                with self._lock:
+                    offset = segment.position
+                    size = min(n, segment.end - offset)
+                    segment.position += max(0, size)
+                if size <= 0:
+                    self._writer.release(buf)
+                    return
+                if self.throttle:
+                    self.throttle(size, self.url, cancellation_event)
+                self._writer.write(offset, buf, size)
+                sizer.update(n)
+                with self._lock:
+                    self._received += size
+                    received = self._received
+                # Outside the lock: the callback may be slow, and every worker needs the lock.
+                if self.on_progress:
+                    self.on_progress(received)
+                if segment.position >= segment.end:
+                    return
+
+    def _worker(self, segment: Optional[Segment], cancellation_event: CancellationToken) -> None:
+        try:
+            if segment is None:
+                segment = self._steal()
+            while segment is not None:
+                if cancellation_event.is_set() or self._abort.is_set():
+                    return
+                self._fetch(segment, cancellation_event)
+                segment = self._steal()
+        except BaseException as e:
+            with self._lock:
+                self._errors.append(e)
+            self._abort.set()
+
+    def run(self, cancellation_event: CancellationToken) -> bool:
+        """Fetch every segment. Returns False if the download was cancelled."""
+        if self.resume_segments:
+            self._segments = [Segment(start, end, written) for start, written, end in self.resume_segments]
+            pending = [s for s in self._segments if s.remaining]
+            self._received = sum(s.written - s.start for s in self._segments)
+            # Idle workers start by stealing from the unfinished ranges.
+            pending += [None] * max(0, self.segments - len(pending))
+        else:
+            self._segments = self._split()
+            pending = list(self._segments)
+        self._writer = WriteBehindFile(
+            self.file_path,
+            size=None if self.resume_segments else self.total_size,
+            truncate=not self.resume_segments,
+            max_pending=2 * len(pending),
+            sync_interval=self.checkpoint_interval,
+            on_written=self._written,
+            on_sync=self._checkpoint,
+        )
+        self._checkpoint()
+
+        if self.hasher:
+            self._hash_file = open(self.file_path, "rb")
+
+        workers = [
+            threading.Thread(
+                target=self._worker,
+                args=(segment, cancellation_event),
+                name=f"Segment-{i}",
+                daemon=True,
+            )
+            for i, segment in enumerate(pending)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        try:
+            self._writer.close()
+        except OSError as e:
+            self._errors.append(e)
+        if self._hash_file:
+            with self._hash_lock:
+                if not self._errors and not cancellation_event.is_set():
+                    self._hash_up_to(self.total_size)
+            self._hash_file.close()
+            self._hash_file = None
+
+        self._checkpoint()
+        if cancellation_event.is_set():
+            # Errors from sockets closed by the cancellation are expected.
+            return False
+        if self._errors:
+            raise self._errors[0]
+        missing = sum(segment.remaining for segment in self._segments)
+        if missing:
+            raise IOError(f"Segmented download of {self.url} is missing {missing} bytes")
+        return True
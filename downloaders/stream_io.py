@@ -0,0 +1,293 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+import requests
+
+from core.tracing import span
+
+
+class ChunkSizer:
+    """
+    Read size that follows measured throughput.
+
+    Each read should take about ``target_interval`` seconds, so a slow link
+    still reports progress and checks for cancellation often while a fast
+    one is read in large blocks with little per-chunk overhead. Sizes are
+    powers of two between ``min_size`` and ``max_size``.
+    """
+
+    def __init__(
+        self,
+        initial: int = 64 * 1024,
+        min_size: int = 16 * 1024,
+        max_size: int = 4 * 1024 * 1024,
+        target_interval: float = 0.1,
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_interval = target_interval
+        self.size = min(max(initial, min_size), max_size)
+        self.rate: Optional[float] = None
+        self._last = time.monotonic()
+
+    def update(self, nbytes: int) -> int:
+        """Record a read of ``nbytes`` that just finished; returns the next read size."""
+        now = time.monotonic()
+        elapsed, self._last = now - self._last, now
+        if nbytes <= 0 or elapsed <= 0:
+            return self.size
+        instant = nbytes / elapsed
+        self.rate = instant if self.rate is None else 0.7 * self.rate + 0.3 * instant
+        wanted = self.rate * self.target_interval
+        size = self.size
+        # Move one power of two at a time so one odd read cannot swing it far.
+        if wanted >= 2 * size and size < self.max_size:
+            size *= 2
+        elif wanted < size / 2 and size > self.min_size:
+            size //= 2
+        self.size = size
+        return size
+
+
+def _iter_reader(response: requests.Response, chunk_size: int = 64 * 1024) -> Callable[[memoryview], int]:
+    """``readinto`` on top of ``iter_content``, which decodes compressed bodies."""
+    chunks = response.iter_content(chunk_size=chunk_size)
+    pending = memoryview(b"")
+
+    def readinto(view: memoryview) -> int:
+        nonlocal pending
+        if not pending:
+            pending = memoryview(next(chunks, b""))
+        n = min(len(pending), view.nbytes)
+        view[:n] = pending[:n]
+        pending = pending[n:]
+        return n
+
+    return readinto
+
+
+def body_reader(response: requests.Response) -> Callable[[memoryview], int]:
+    """
+    ``readinto`` for the body of a streamed response.
+
+    Uncompressed bodies are read straight from the connection into the
+    caller's buffer; urllib3's byte counters are kept in step so length
+    checks and connection reuse still work. Those are private attributes,
+    so if this urllib3 lacks them, and for compressed bodies, the body is
+    read through ``iter_content`` instead.
+    """
+    raw = response.raw
+    fp = getattr(raw, "_fp", None)
+    encoding = response.headers.get("Content-Encoding", "identity").lower()
+    if (
+        encoding not in ("", "identity")
+        or not hasattr(fp, "readinto")
+        or not hasattr(raw, "_fp_bytes_read")
+        or not hasattr(raw, "length_remaining")
+    ):
+        return _iter_reader(response)
+
+    expected = raw.length_remaining
+
+    def readinto(view: memoryview) -> int:
+        n = fp.readinto(view)
+        if n:
+            raw._fp_bytes_read += n
+            if raw.length_remaining is not None:
+                raw.length_remaining -= n
+        elif view.nbytes:
+            if expected is not None and raw.length_remaining:
+                raise requests.exceptions.ChunkedEncodingError(
+                    f"Connection closed with {raw.length_remaining} of {expected} bytes unread"
+                )
+            # The body is complete: let close() hand the connection back to the pool.
+            response._content_consumed = True
+        return n
+
+    return readinto
+
+
+class WriteBehindFile:
+    """
+    File written by a background thread, so network reads never wait on disk.
+
+    Callers take a buffer with ``buffer()``, fill it, and hand it over with
+    ``write()``; buffers come back to a small pool once written, so at most
+    ``max_pending`` are in flight and a slow disk holds the reader back
+    instead of growing memory. Writes are positional, so several threads may
+    fill different ranges of the same file. The file is preallocated when
+    its size is known, and fdatasync runs at most every ``sync_interval``
+    seconds (and on close) rather than per write.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size: Optional[int] = None,
+        truncate: bool = False,
+        max_pending: int = 8,
+        sync_interval: float = 1.0,
+        on_written: Optional[Callable[[int, memoryview], None]] = None,
+        on_sync: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Args:
+            path (str): File to write; created if missing.
+            size (int, optional): Final size, preallocated up front.
+            truncate (bool): Empty the file first.
+            max_pending (int): Buffers queued or being written at once.
+            sync_interval (float): Longest time written data waits for fdatasync.
+            on_written (Callable, optional): Called on the writer thread with the offset and
+                data of every write once it is in the file, in submission order.
+            on_sync (Callable, optional): Called on the writer thread after each fdatasync,
+                e.g. to checkpoint progress that is now durable.
+        """
+        self.path = path
+        self.max_pending = max_pending
+        self.sync_interval = sync_interval
+        self.on_written = on_written
+        self.on_sync = on_sync
+        flags = os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        if truncate:
+            flags |= os.O_TRUNC
+        self._fd = os.open(path, flags, 0o644)
+        if size:
+            self._preallocate(size)
+
+        self._queue: Deque[Tuple[int, bytearray, int]] = deque()
+        self._free: List[bytearray] = []
+        self._outstanding = 0
+        self._error: Optional[BaseException] = None
+        self._closing = False
+        self._dirty = False
+        self._last_sync = time.monotonic()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="WriteBehind", daemon=True)
+        self._thread.start()
+
+    def _preallocate(self, size: int) -> None:
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(self._fd, 0, size)
+                return
+            except OSError as e:
+                logging.debug(f"posix_fallocate failed for {self.path}: {e}")
+        os.ftruncate(self._fd, size)
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def buffer(self, size: int, timeout: Optional[float] = None) -> Optional[bytearray]:
+        """
+        A buffer of at least ``size`` bytes; blocks while ``max_pending`` are in
+        flight, or returns None if that lasts longer than ``timeout`` seconds.
+        """
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._outstanding < self.max_pending or self._error is not None, timeout
+            ):
+                return None
+            self._check()
+            self._outstanding += 1
+            while self._free:
+                buf = self._free.pop()
+                if len(buf) >= size:
+                    return buf
+        return bytearray(size)
+
+    def release(self, buf: bytearray) -> None:
+        """Give back a buffer from ``buffer()`` that was not written."""
+        with self._cond:
+            self._outstanding -= 1
+            self._free.append(buf)
+            self._cond.notify_all()
+
+    def write(self, offset: int, buf: bytearray, length: int) -> None:
+        """Queue the first ``length`` bytes of ``buf`` (from ``buffer()``) for ``offset``."""
+        with self._cond:
+            if self._error is not None:
+                self._outstanding -= 1
+                raise self._error
+            self._queue.append((offset, buf, length))
+            self._cond.notify_all()
+
+    def _pwrite(self, data: memoryview, offset: int) -> None:
+        while data:
+            if hasattr(os, "pwrite"):
+                written = os.pwrite(self._fd, data, offset)
+            else:  # Windows; only this thread writes, so seek + write is safe.
+                os.lseek(self._fd, offset, os.SEEK_SET)
+                written = os.write(self._fd, data)
+            data = data[written:]
+            offset += written
+
+    def _sync(self) -> None:
+        with span("fdatasync", "disk"):
+            (os.fdatasync if hasattr(os, "fdatasync") else os.fsync)(self._fd)
+        self._dirty = False
+        self._last_sync = time.monotonic()
+        if self.on_sync:
+            self.on_sync()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    timeout = None
+                    if self._dirty:
+                        timeout = max(0.0, self._last_sync + self.sync_interval - time.monotonic())
+                        if timeout == 0:
+                            break
+                    self._cond.wait(timeout)
+                item = self._queue.popleft() if self._queue else None
+                if item is None and self._closing:
+                    return
+            try:
+                if item is not None:
+                    offset, buf, length = item
+                    if self._error is None:
+                        data = memoryview(buf)[:length]
+                        with span("write", "disk", offset=offset, bytes=length):
+                            self._pwrite(data, offset)
+                        self._dirty = True
+                        if self.on_written:
+                            self.on_written(offset, data)
+                        data.release()
+                    with self._cond:
+                        self._outstanding -= 1
+                        self._free.append(buf)
+                        self._cond.notify_all()
+                if self._dirty and time.monotonic() - self._last_sync >= self.sync_interval:
+                    self._sync()
+            except BaseException as e:
+                with self._cond:
+                    self._error = e
+                    # Nothing more is written, so there is nothing left to sync either.
+                    self._dirty = False
+                    self._cond.notify_all()
+
+    def close(self, truncate_to: Optional[int] = None) -> None:
+        """
+        Write out everything queued, fdatasync and close. With
+        ``truncate_to``, the file is cut to that size first (e.g. to drop
+        the unwritten tail of a preallocated file). Raises the first write
+        error, if any.
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        try:
+            if self._error is None:
+                if truncate_to is not None:
+                    os.ftruncate(self._fd, truncate_to)
+                if self._dirty or truncate_to is not None:
+                    self._sync()
+        finally:
+            os.close(self._fd)
+        self._check()
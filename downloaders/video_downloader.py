@@ -1,34 +1,36 @@
-import threading
 import yt_dlp
-from .base_downloader import BaseDownloader
+from core.cancellation import CancellationToken
+from .ytdlp_downloader import YtDlpDownloader
 import logging
 
-class VideoDownloader(BaseDownloader):
-    def download(self, url: str, output_folder: str, cancellation_event: threading.Event = None):
+class VideoDownloader(YtDlpDownloader):
+    def download(
+        self,
+        url: str,
+        output_folder: str,
+        cancellation_event: CancellationToken = None,
+        task=None,
+        progress=None,
+    ):
         try:
             if cancellation_event is None:
-                cancellation_event = threading.Event()
-            
-            def progress_hook(d):
-                if cancellation_event.is_set():
-                    raise yt_dlp.utils.DownloadCancelled("Download stopped by user")
+                cancellation_event = CancellationToken()
 
             ydl_opts = {
                 'format': 'best',
                 'outtmpl': f'{output_folder}/%(title)s_%(timestamp)s.%(ext)s',
-                'overwrites': True,
-                'progress_hooks': [progress_hook],
                 'no_warnings': True,
-                'quiet': False
+                'quiet': False,
+                **self._common_options(url),
             }
 
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                if cancellation_event.is_set():
-                    logging.info("Download cancelled before starting")
-                    return
-                if not cancellation_event.is_set():
-                    ydl.download([url])
-            
+            if cancellation_event.is_set():
+                logging.info("Download cancelled before starting")
+                return
+            self.pool.download(
+                url, ydl_opts, self._progress_hook(url, cancellation_event, task, progress)
+            )
+
             logging.info(f"Video downloaded successfully to {output_folder}")
         except yt_dlp.utils.DownloadCancelled:
             logging.info("Download was cancelled")
@@ -36,6 +38,10 @@ class VideoDownloader(BaseDownloader):
         except yt_dlp.utils.DownloadError as e:
             if not cancellation_event.is_set():
                 logging.info(f"Failed to download video: {e}")
+                if task is not None:
+                    task.error = str(e)
         except Exception as e:
             if not cancellation_event.is_set():
                 logging.info(f"Unexpected error during download: {e}")
+                if task is not None:
+                    task.error = str(e)
@@ -0,0 +1,68 @@
+from typing import Callable, Optional
+
+import yt_dlp
+
+from core.cancellation import CancellationToken
+from core.rate_limiter import BandwidthLimiter
+from .base_downloader import BaseDownloader
+from .ytdlp_pool import YoutubeDLPool, default_ytdlp_pool
+
+
+class YtDlpDownloader(BaseDownloader):
+    """Base class for downloads handed to yt-dlp through a shared YoutubeDLPool."""
+
+    def __init__(
+        self,
+        download_folder: str,
+        limiter: Optional[BandwidthLimiter] = None,
+        pool: Optional[YoutubeDLPool] = None,
+        fragment_downloads: int = 4,
+    ):
+        """
+        Args:
+            download_folder (str): Default download folder.
+            limiter (BandwidthLimiter, optional): Shared bandwidth limiter.
+            pool (YoutubeDLPool, optional): Pool of yt-dlp instances and extracted metadata.
+            fragment_downloads (int): Fragments of a DASH/HLS stream fetched concurrently.
+        """
+        super().__init__(download_folder, limiter=limiter)
+        self.pool = pool or default_ytdlp_pool()
+        self.fragment_downloads = fragment_downloads
+
+    def _common_options(self, url: str) -> dict:
+        return {
+            "concurrent_fragment_downloads": self.fragment_downloads,
+            **self._ytdlp_rate_options(url),
+        }
+
+    def _progress_hook(
+        self,
+        url: str,
+        cancellation_event: CancellationToken,
+        task=None,
+        progress: Optional[Callable] = None,
+    ) -> Callable[[dict], None]:
+        """
+        yt-dlp progress hook that honours cancellation, throttles and reports
+        progress. yt-dlp calls it after every chunk, so a cancelled or paused
+        download stops at the next chunk boundary.
+        """
+        received = {"bytes": 0}
+
+        def hook(d):
+            if cancellation_event.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Download stopped by user")
+            if d.get("status") == "downloading":
+                # Keep yt-dlp under caps that were changed after it started.
+                downloaded = d.get("downloaded_bytes") or 0
+                if downloaded > received["bytes"]:
+                    self._throttle(downloaded - received["bytes"], url, cancellation_event)
+                received["bytes"] = downloaded
+                if task is not None:
+                    task.update_progress(
+                        downloaded, d.get("total_bytes") or d.get("total_bytes_estimate")
+                    )
+                    if progress:
+                        progress(task)
+
+        return hook
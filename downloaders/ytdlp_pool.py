@@ -0,0 +1,187 @@
+import copy
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import yt_dlp
+
+from core.metrics import record_retry
+from core.tracing import span
+from utils.cache import TTLCache
+from utils.url_utils import normalize_url
+
+# Options used to extract metadata; format selection happens later, per download.
+EXTRACT_OPTIONS = {"quiet": True, "no_warnings": True}
+
+# Options that change from one download to the next; applied at checkout
+# rather than splitting the pool.
+PER_USE_OPTIONS = ("ratelimit",)
+
+
+class _PooledYoutubeDL:
+    """A YoutubeDL instance whose progress hook can be swapped per download."""
+
+    def __init__(self, options: Dict[str, Any]):
+        self.ydl = yt_dlp.YoutubeDL(options)
+        self.hook: Optional[Callable[[dict], None]] = None
+        self.ydl.add_progress_hook(self._dispatch)
+
+    def _dispatch(self, status: dict) -> None:
+        if self.hook is not None:
+            self.hook(status)
+
+
+class YoutubeDLPool:
+    """
+    Long-lived yt-dlp instances keyed by option set, plus a TTL cache of
+    extracted metadata.
+
+    Creating a YoutubeDL loads and configures every extractor, and
+    extraction fetches the page and its manifests; both used to happen on
+    every download. Here an instance is checked out for one download at a
+    time and returned afterwards, and the unprocessed info dict of a URL is
+    extracted once and reused (until ``info_ttl`` expires, since media URLs
+    inside it are short-lived) by every later download of that URL,
+    whatever format it asks for.
+    """
+
+    def __init__(self, max_idle: int = 4, info_ttl: float = 900, info_cache_size: int = 1024):
+        """
+        Args:
+            max_idle (int): Idle instances kept per option set.
+            info_ttl (float): Seconds extracted metadata stays valid.
+            info_cache_size (int): Maximum number of cached info dicts.
+        """
+        self.max_idle = max_idle
+        self._idle: Dict[str, List[_PooledYoutubeDL]] = {}
+        self._info = TTLCache(info_cache_size, info_ttl)
+        self._extracting: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(options: Dict[str, Any]) -> str:
+        shared = {k: v for k, v in options.items() if k not in PER_USE_OPTIONS}
+        return json.dumps(shared, sort_keys=True, default=repr)
+
+    @contextmanager
+    def acquire(
+        self, options: Dict[str, Any], progress_hook: Optional[Callable[[dict], None]] = None
+    ) -> Iterator[yt_dlp.YoutubeDL]:
+        """
+        Check out a YoutubeDL configured with ``options`` for the duration of
+        the ``with`` block. ``progress_hook`` is only called for this use.
+        Instances are dropped instead of reused if the block raises anything
+        but a DownloadError.
+        """
+        key = self._key(options)
+        with self._lock:
+            idle = self._idle.get(key)
+            pooled = idle.pop() if idle else None
+        if pooled is None:
+            pooled = _PooledYoutubeDL(options)
+        pooled.hook = progress_hook
+        for name in PER_USE_OPTIONS:
+            pooled.ydl.params[name] = options.get(name)
+        reusable = False
+        try:
+            yield pooled.ydl
+            reusable = True
+        except yt_dlp.utils.DownloadError:
+            reusable = True
+            raise
+        finally:
+            pooled.hook = None
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if reusable and len(idle) < self.max_idle:
+                    idle.append(pooled)
+                    pooled = None
+            if pooled is not None:
+                pooled.ydl.close()
+
+    def extract_info(self, url: str) -> Dict[str, Any]:
+        """
+        Unprocessed metadata for ``url``, from the cache if possible.
+
+        Concurrent calls for the same URL share one extraction. The returned
+        dict is a private copy, safe to hand to ``process_ie_result``.
+        """
+        return self._extract(url)[0]
+
+    def _extract(self, url: str) -> Tuple[Dict[str, Any], bool]:
+        """Info dict for ``url`` and whether it came from the cache."""
+        key = normalize_url(url)
+        while True:
+            info = self._info.get(key)
+            if info is not None:
+                return copy.deepcopy(info), True
+            with self._lock:
+                running = self._extracting.get(key)
+                if running is None:
+                    running = self._extracting[key] = threading.Event()
+                    break
+            running.wait()
+
+        try:
+            with self.acquire(EXTRACT_OPTIONS) as ydl, span("extract_info", "ytdlp", url=url):
+                info = ydl.extract_info(url, download=False, process=False)
+            # Playlists may hold lazy entry generators; only single videos are cached.
+            if info.get("_type", "video") == "video":
+                self._info.put(key, info)
+                return copy.deepcopy(info), False
+            return info, False
+        finally:
+            with self._lock:
+                del self._extracting[key]
+            running.set()
+
+    def download(
+        self,
+        url: str,
+        options: Dict[str, Any],
+        progress_hook: Optional[Callable[[dict], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Download ``url`` with a pooled instance, reusing cached metadata.
+        If that fails with cached metadata, it is extracted again once, in
+        case the media URLs in it expired. Returns the processed info dict.
+        """
+        info, cached = self._extract(url)
+        try:
+            with self.acquire(options, progress_hook) as ydl, span("ytdlp_download", "ytdlp", url=url):
+                return ydl.process_ie_result(info, download=True)
+        except yt_dlp.utils.DownloadError:
+            if not cached:
+                raise
+            logging.info(f"Download of {url} failed with cached metadata; extracting again")
+            record_retry(url, "stale_metadata")
+        self.forget(url)
+        info, _ = self._extract(url)
+        with self.acquire(options, progress_hook) as ydl, span("ytdlp_download", "ytdlp", url=url):
+            return ydl.process_ie_result(info, download=True)
+
+    def forget(self, url: str) -> None:
+        """Drop cached metadata for ``url``, e.g. after its media URLs expired."""
+        self._info.pop(normalize_url(url))
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for instances in idle.values():
+            for pooled in instances:
+                pooled.ydl.close()
+
+
+_default_pool: Optional[YoutubeDLPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def default_ytdlp_pool() -> YoutubeDLPool:
+    """Process-wide pool shared by the video and audio downloaders."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = YoutubeDLPool()
+        return _default_pool
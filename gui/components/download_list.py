@@ -0,0 +1,257 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+def _host(url):
+    parts = url.split("/", 3)
+    return parts[2] if len(parts) > 2 else ""
+
+
+def _fraction(task):
+    if task.status == "completed":
+        return 1.0
+    if task.status == "converting":
+        return task.conversion
+    return task.downloaded / task.total_size if task.total_size > 0 else 0.0
+
+
+def _format_size(nbytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if nbytes < 1024:
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+    return f"{nbytes:.1f} TB"
+
+
+def _progress_bar(fraction, width=12):
+    filled = int(fraction * width)
+    return "█" * filled + "░" * (width - filled) + f" {fraction * 100:5.1f}%"
+
+
+class DownloadList(ttk.Frame):
+    """
+    Virtualized list of downloads.
+
+    Rows live in a plain dict of tasks; the Treeview only ever holds as many
+    items as fit on screen, and scrolling rewrites those items in place.
+    Memory and redraw time therefore depend on the window height, not on
+    the number of downloads. Sorting and filtering work on the task list
+    and are re-applied at most once per ``refresh``.
+    """
+
+    COLUMNS = (
+        ("url", "URL", 380),
+        ("type", "Type", 60),
+        ("host", "Host", 140),
+        ("status", "Status", 90),
+        ("progress", "Progress", 150),
+        ("speed", "Speed", 80),
+        ("eta", "ETA", 60),
+    )
+
+    SORT_KEYS = {
+        "url": lambda task: task.url,
+        "type": lambda task: task.choice or "",
+        "host": lambda task: _host(task.url),
+        "status": lambda task: task.status,
+        "progress": _fraction,
+        "speed": lambda task: task.calculate_speed(),
+        "eta": lambda task: task.estimate_time_remaining() or 0,
+    }
+
+    def __init__(self, parent, **kwargs):
+        super().__init__(parent, **kwargs)
+        self._tasks = {}
+        self._statuses = {}
+        self._view = []
+        self._view_dirty = False
+        self._dirty = False
+        self._top = 0
+        self._slots = []
+        self._sort_column = None
+        self._sort_reverse = False
+        self._status_filter = None
+        self._host_filter = ""
+        # Selection by URL: the Treeview items are reused for whatever rows are on screen.
+        self._selected = set()
+
+        self.tree = ttk.Treeview(
+            self,
+            columns=[name for name, _, _ in self.COLUMNS],
+            show="headings",
+            selectmode="extended",
+        )
+        for name, heading, width in self.COLUMNS:
+            self.tree.heading(name, text=heading, command=lambda column=name: self.sort_by(column))
+            self.tree.column(name, width=width, stretch=name == "url")
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", lambda e: self._scroll_by(-1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self._scroll_by(-1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_by(1, "units"))
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __contains__(self, url):
+        return url in self._tasks
+
+    def add(self, task):
+        """Add a row for ``task``; its later state changes are picked up by ``update_task``."""
+        if task.url in self._tasks:
+            return
+        self._tasks[task.url] = task
+        self._statuses[task.url] = task.status
+        self._view_dirty = True
+
+    def update_task(self, task):
+        """Note that ``task`` changed; the view is redrawn on the next ``refresh``."""
+        if task.url not in self._tasks:
+            return
+        self._tasks[task.url] = task
+        if self._statuses[task.url] != task.status:
+            self._statuses[task.url] = task.status
+            if self._status_filter or self._sort_column == "status":
+                self._view_dirty = True
+        self._dirty = True
+
+    def remove(self, urls):
+        for url in urls:
+            self._tasks.pop(url, None)
+            self._statuses.pop(url, None)
+            self._selected.discard(url)
+        self._view_dirty = True
+
+    def urls(self, status=None):
+        """URLs of all rows, or only those with the given status."""
+        if status is None:
+            return list(self._tasks)
+        return [url for url, row_status in self._statuses.items() if row_status == status]
+
+    def selected_urls(self):
+        """Selected URLs among the rows the current filter shows."""
+        return [url for url in self._view if url in self._selected]
+
+    def _visible(self):
+        """Treeview item -> URL of the row it currently shows."""
+        return dict(zip(self._slots, self._view[self._top:self._top + len(self._slots)]))
+
+    def _on_select(self, event=None):
+        visible = self._visible()
+        shown = set(visible.values())
+        chosen = {visible[item] for item in self.tree.selection() if item in visible}
+        self._selected = {url for url in self._selected if url not in shown} | chosen
+
+    def sort_by(self, column):
+        """Sort by ``column``; sorting by the same column again reverses the order."""
+        if self._sort_column == column:
+            self._sort_reverse = not self._sort_reverse
+        else:
+            self._sort_column, self._sort_reverse = column, False
+        for name, heading, _ in self.COLUMNS:
+            arrow = (" ▼" if self._sort_reverse else " ▲") if name == column else ""
+            self.tree.heading(name, text=heading + arrow)
+        self._view_dirty = True
+        self.refresh()
+
+    def set_filter(self, status=None, host=""):
+        """Show only rows with ``status`` and whose host contains ``host``."""
+        self._status_filter = status or None
+        self._host_filter = host.strip().lower()
+        self._top = 0
+        self._view_dirty = True
+        self.refresh()
+
+    def refresh(self):
+        """Redraw the visible rows if anything changed since the last call."""
+        if self._view_dirty:
+            self._rebuild_view()
+        elif not self._dirty:
+            return
+        self._dirty = False
+        self._render()
+
+    def _rebuild_view(self):
+        tasks = self._tasks.values()
+        if self._status_filter:
+            tasks = [task for task in tasks if task.status == self._status_filter]
+        if self._host_filter:
+            tasks = [task for task in tasks if self._host_filter in _host(task.url).lower()]
+        if self._sort_column:
+            tasks = sorted(tasks, key=self.SORT_KEYS[self._sort_column], reverse=self._sort_reverse)
+        self._view = [task.url for task in tasks]
+        self._view_dirty = False
+        self._clamp_top()
+
+    def _clamp_top(self):
+        self._top = max(0, min(self._top, len(self._view) - len(self._slots)))
+
+    def _values(self, task):
+        eta = task.estimate_time_remaining() if task.status == "downloading" else None
+        speed = task.calculate_speed() if task.status == "downloading" else 0
+        status = task.status.capitalize()
+        if task.entries or task.expanded:
+            # Playlist: entries finished so far, "+" while more are being queued
+            more = "" if task.expanded else "+"
+            status = f"{status} {task.entries_done}/{task.entries}{more}"
+        if task.error and task.status == "failed":
+            status = f"Failed: {task.error}"
+        return (
+            f"  ↳ {task.url}" if task.parent else task.url,
+            task.choice or "",
+            _host(task.url),
+            status,
+            _progress_bar(_fraction(task)),
+            f"{_format_size(speed)}/s" if speed else "",
+            f"{eta}s" if eta is not None else "",
+        )
+
+    def _render(self):
+        visible = self._visible()
+        for item, url in visible.items():
+            self.tree.item(item, values=self._values(self._tasks[url]))
+        for item in self._slots[len(visible):]:
+            self.tree.item(item, values=())
+        # Rows move between items as the view changes; the selection follows the URLs.
+        selection = [item for item, url in visible.items() if url in self._selected]
+        if set(selection) != set(self.tree.selection()):
+            self.tree.selection_set(selection)
+        if self._view:
+            first = self._top / len(self._view)
+            last = (self._top + len(self._slots)) / len(self._view)
+            self.scrollbar.set(first, min(1.0, last))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _on_resize(self, event):
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        heading_height = 24
+        count = max(1, (event.height - heading_height) // row_height)
+        while len(self._slots) < count:
+            self._slots.append(self.tree.insert("", tk.END, values=()))
+        while len(self._slots) > count:
+            self.tree.delete(self._slots.pop())
+        self._clamp_top()
+        self._render()
+
+    def _scroll_by(self, amount, what):
+        step = len(self._slots) if what == "pages" else 1
+        self._scroll_to(self._top + amount * step)
+
+    def _scroll_to(self, top):
+        previous = self._top
+        self._top = top
+        self._clamp_top()
+        if self._top != previous:
+            self._render()
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self._scroll_to(int(float(args[0]) * len(self._view)))
+        elif action == "scroll":
+            self._scroll_by(int(args[0]), args[1])
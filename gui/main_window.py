@@ -1,12 +1,17 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from .components.dialogs import prompt_download_choice
+from .components.download_list import DownloadList
 from .styles import configure_styles
+from core.progress import ProgressBus
 from managers.download_manager import DownloadManager
 import validators
 import threading
 
 class DownloaderGUI:
+    # Progress updates are applied to the widgets at most this often
+    FRAME_INTERVAL_MS = 50
+
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("SAOAS Downloader")
@@ -14,12 +19,13 @@ class DownloaderGUI:
         self.root.configure(bg='#E6E6FA')
 
         self.downloader = None
-        self.download_tasks = {}
+        self.progress_bus = ProgressBus()
 
         self.style = ttk.Style()
         configure_styles(self.style)
 
         self.setup_ui()
+        self.root.after(self.FRAME_INTERVAL_MS, self._apply_progress)
 
     def setup_ui(self):
         main_frame = ttk.Frame(self.root, padding=15, style='Main.TFrame')
@@ -60,6 +66,30 @@ class DownloaderGUI:
                                        style='Primary.TButton')
         select_folder_btn.pack(fill=tk.X, pady=5)
 
+        pause_selected_btn = ttk.Button(button_frame, text="Pause Selected",
+                                        command=self.pause_selected,
+                                        style='Secondary.TButton')
+        pause_selected_btn.pack(fill=tk.X, pady=5)
+
+        resume_selected_btn = ttk.Button(button_frame, text="Resume Selected",
+                                         command=self.resume_selected,
+                                         style='Secondary.TButton')
+        resume_selected_btn.pack(fill=tk.X, pady=5)
+
+        stop_selected_btn = ttk.Button(button_frame, text="Stop Selected",
+                                       command=self.stop_selected,
+                                       style='Danger.TButton')
+        stop_selected_btn.pack(fill=tk.X, pady=5)
+
+        stop_all_btn = ttk.Button(button_frame, text="Stop All",
+                                  command=self.stop_all,
+                                  style='Danger.TButton')
+        stop_all_btn.pack(fill=tk.X, pady=5)
+
+        clear_completed_btn = ttk.Button(button_frame, text="Clear Completed",
+                                         command=self.clear_completed,
+                                         style='Secondary.TButton')
+        clear_completed_btn.pack(fill=tk.X, pady=5)
 
         exit_btn = ttk.Button(button_frame, text="Exit",
                               command=self.root.quit,
@@ -69,22 +99,34 @@ class DownloaderGUI:
         downloads_frame = ttk.Frame(main_frame)
         downloads_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-        self.canvas = tk.Canvas(downloads_frame, bg='#f0f0f0')
-        self.scrollable_frame = ttk.Frame(self.canvas)
+        filter_frame = ttk.Frame(downloads_frame)
+        filter_frame.pack(side=tk.TOP, fill=tk.X, pady=(0, 5))
+
+        ttk.Label(filter_frame, text="Status:").pack(side=tk.LEFT, padx=5)
+        self.status_filter_var = tk.StringVar(value="all")
+        status_filter = ttk.Combobox(filter_frame, textvariable=self.status_filter_var, width=12,
+                                     values=["all", "pending", "downloading", "converting", "paused", "completed", "failed", "stopped"],
+                                     state="readonly")
+        status_filter.pack(side=tk.LEFT, padx=5)
 
-        scrollbar = ttk.Scrollbar(downloads_frame, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=scrollbar.set)
+        ttk.Label(filter_frame, text="Host:").pack(side=tk.LEFT, padx=5)
+        self.host_filter_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.host_filter_var, width=25).pack(side=tk.LEFT, padx=5)
 
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.scrollable_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        self.status_filter_var.trace_add("write", lambda *args: self.apply_filter())
+        self.host_filter_var.trace_add("write", lambda *args: self.apply_filter())
 
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.download_list = DownloadList(downloads_frame)
+        self.download_list.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
     def select_folder(self):
         folder = filedialog.askdirectory()
         if folder:
             self.downloader = DownloadManager(folder)
+            # Show downloads recovered from the folder's journal
+            for task in list(self.downloader.active_downloads.values()):
+                self.download_list.add(task)
+            self.download_list.refresh()
 
     def add_url(self):
         url = self.url_var.get().strip()
@@ -99,8 +141,11 @@ class DownloaderGUI:
         choice = prompt_download_choice(self.root, url)
         if not choice:
             return
-        self.downloader.queue_download(url, choice=choice)
-        self.create_download_entry(self.scrollable_frame, url, choice)
+        if not self.downloader.queue_download(url, choice=choice):
+            messagebox.showinfo("Info", "This URL is already queued")
+            return
+        self.download_list.add(self.downloader.active_downloads[url])
+        self.download_list.refresh()
 
         self.url_var.set('')
 
@@ -111,56 +156,73 @@ class DownloaderGUI:
 
         threading.Thread(
             target=self.downloader.start_downloads,
-            args=(self.update_progress,),
+            args=(self.progress_bus.publish,),
             daemon=True
         ).start()
 
-    def update_progress(self, task):
-        if task.url in self.download_tasks:
-            task_info = self.download_tasks[task.url]
-            if task.total_size > 0:
-                progress = (task.downloaded / task.total_size) * 100
-                task_info['progress']['value'] = progress
-                task_info['progress_label']['text'] = f"{progress:.2f}%"
-            if task.status == "completed":
-                task_info['pause_btn'].pack_forget()
-                task_info['stop_btn'].pack_forget()
+    def _apply_progress(self):
+        """Apply the latest state of every task that changed since the last frame"""
+        try:
+            for task in self.progress_bus.drain():
+                if task.parent in self.download_list and task.url not in self.download_list:
+                    # An entry queued by a playlist shown in the list
+                    self.download_list.add(task)
+                self.download_list.update_task(task)
+            self.download_list.refresh()
+        finally:
+            self.root.after(self.FRAME_INTERVAL_MS, self._apply_progress)
+
+    def apply_filter(self):
+        status = self.status_filter_var.get()
+        self.download_list.set_filter(
+            status=None if status == "all" else status,
+            host=self.host_filter_var.get(),
+        )
+
+    def _stop(self, urls):
+        if not self.downloader:
+            return
+        for url in urls:
+            task = self.downloader.active_downloads.get(url)
+            self.downloader.stop_download(url)
+            if task is not None:
+                self.download_list.update_task(task)
+        self.download_list.refresh()
+
+    def stop_selected(self):
+        self._stop(self.download_list.selected_urls())
+
+    def stop_all(self):
+        self._stop(
+            self.download_list.urls("pending")
+            + self.download_list.urls("downloading")
+            + self.download_list.urls("converting")
+            + self.download_list.urls("paused")
+        )
+
+    def pause_selected(self):
+        if not self.downloader:
+            return
+        for url in self.download_list.selected_urls():
+            self.downloader.pause_download(url)
+            task = self.downloader.find_task(url)
+            if task is not None:
+                self.download_list.update_task(task)
+        self.download_list.refresh()
+
+    def resume_selected(self):
+        if not self.downloader:
+            return
+        for url in self.download_list.selected_urls():
+            if self.downloader.resume_download(url):
+                self.download_list.update_task(self.downloader.find_task(url))
+        self.download_list.refresh()
+        # Paused downloads may be all that was left, so the scheduler may have returned.
+        self.start_downloads()
 
     def clear_completed(self):
-        for url, task in list(self.download_tasks.items()):
-            if task['progress']['value'] == 100:
-                task['frame'].destroy()
-                del self.download_tasks[url]
-
-    def create_download_entry(self, frame, url, content_type):
-        frame = ttk.Frame(frame, padding=5, relief="ridge")
-        frame.pack(fill=tk.X, pady=5)
-
-        ttk.Label(frame, text=url, width=50).pack(side=tk.LEFT, padx=5)
-        progress = ttk.Progressbar(frame,
-        length=200,
-        mode="determinate",
-        style='Custom.Horizontal.TProgressbar')
-        progress.pack(side=tk.LEFT, padx=5)
-
-        # Add a label to show the progress details
-        progress_label = ttk.Label(frame, text="0%")
-        progress_label.pack(side=tk.LEFT, padx=5)
-
-        # Stop button now calls stop_download with the url
-        stop_btn = ttk.Button(frame, text="Stop",
-            command=lambda: self.downloader.stop_download(url),
-            style='Danger.TButton')
-        stop_btn.pack(side=tk.LEFT, padx=5)
-
-
-        self.download_tasks[url] = {
-            'frame': frame,
-            'progress': progress,
-            'progress_label': progress_label,
-            'stop_btn': stop_btn,
-            'content_type': content_type
-        }
+        self.download_list.remove(self.download_list.urls("completed"))
+        self.download_list.refresh()
 
     def run(self):
         self.root.mainloop()
@@ -0,0 +1,316 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from core.cancellation import CancellationToken
+from core.concurrency import AdaptiveConcurrency, host_key
+from core.download_task import DownloadTask
+from core.tracing import record_interval
+from downloaders.partial import partial_path
+from .download_manager import DownloadManager
+
+
+class AsyncDownloadManager(DownloadManager):
+    """
+    Download manager that drives image and file transfers from a single asyncio
+    event loop, so thousands of small downloads can be in flight at once.
+
+    Queueing, pausing, stopping, revalidation, playlists, metrics, tracing and
+    progress callbacks work exactly as in DownloadManager, through the same
+    helpers. The adaptive concurrency controller decides what is dispatched.
+    yt-dlp based video/audio tasks are handed off to the manager's thread pool;
+    journal, SQLite and other blocking file work runs in the loop's default
+    executor, so the loop only waits on sockets.
+    """
+
+    def __init__(
+        self,
+        download_folder: str,
+        max_concurrency: int = 1000,
+        per_host_limit: int = 8,
+        chunk_size: int = 64 * 1024,
+        timeout: float = 60,
+        **kwargs,
+    ):
+        """
+        Args:
+            download_folder (str): Path to the download folder.
+            max_concurrency (int): Most transfers the adaptive limit may put in flight.
+            per_host_limit (int): Most concurrent transfers the adaptive limit allows per host.
+            chunk_size (int): Read size for streamed response bodies.
+            timeout (float): Total timeout per request in seconds.
+            **kwargs: Passed through to DownloadManager (max_workers sizes the yt-dlp thread pool).
+        """
+        # Read by _create_concurrency() during DownloadManager.__init__.
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        super().__init__(download_folder, **kwargs)
+
+    def _create_concurrency(self) -> AdaptiveConcurrency:
+        return AdaptiveConcurrency(
+            min_limit=self.min_workers,
+            max_limit=self.max_concurrency,
+            max_host_limit=self.per_host_limit,
+            goodput=self._goodput,
+        )
+
+    def _notify_scheduler(self, *args) -> None:
+        super()._notify_scheduler()
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass  # The loop has just closed.
+
+    async def _blocking(self, fn: Callable, *args) -> Any:
+        """Run short blocking work (SQLite, file metadata) off the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+
+    async def _in_pool(self, fn: Callable, *args) -> Any:
+        """Run a long blocking job (yt-dlp) on the manager's download threads"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args))
+
+    def start_downloads(
+        self,
+        progress_callback: Optional[Callable] = None,
+        prompt_user: Optional[Callable] = None,
+        wait_for_new: bool = False,
+    ) -> None:
+        """Process the download queue on a fresh event loop; see DownloadManager.start_downloads"""
+        asyncio.run(self.run(progress_callback, prompt_user, wait_for_new))
+
+    async def run(
+        self,
+        progress_callback: Optional[Callable] = None,
+        prompt_user: Optional[Callable] = None,
+        wait_for_new: bool = False,
+    ) -> None:
+        """Coroutine form of start_downloads for callers that already own a loop"""
+        with self._wakeup:
+            if self._scheduler_running:
+                return
+            self._scheduler_running = True
+            self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                pending = set()
+                while True:
+                    # Cleared before looking at the queue, so a task queued meanwhile wakes the wait below.
+                    self._wake.clear()
+                    while not self._stopping and self.concurrency.has_capacity():
+                        task = self.queue.get(blocked=self.concurrency.blocked_hosts())
+                        if task is None:
+                            break
+                        revalidation = self._revalidation(task, progress_callback)
+                        if revalidation is not None:
+                            pending.add(asyncio.wrap_future(revalidation))
+                            continue
+                        host = host_key(task.url)
+                        self.concurrency.started(host)
+                        pending.add(asyncio.create_task(
+                            self._run_async(session, task, host, progress_callback, prompt_user)
+                        ))
+                    if self._stopping and not pending:
+                        return
+                    if not pending and self.queue.empty() and not wait_for_new:
+                        return
+                    wake = asyncio.ensure_future(self._wake.wait())
+                    done, _ = await asyncio.wait(
+                        pending | {wake}, timeout=self.concurrency.retry_in(), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    wake.cancel()
+                    for future in done - {wake}:
+                        pending.discard(future)
+                        if future.exception():
+                            logging.error(f"Future failed: {future.exception()}")
+        finally:
+            self._loop = self._wake = None
+            with self._wakeup:
+                self._scheduler_running = False
+
+    async def _run_async(self, session, task: DownloadTask, host: str, progress_callback, prompt_user) -> None:
+        """Run one download and report its outcome to the concurrency controller"""
+        started = time.monotonic()
+        try:
+            await self.download_async(session, task, progress_callback, prompt_user)
+        finally:
+            elapsed = time.monotonic() - started
+            self.concurrency.finished(host, task.downloaded, elapsed, failed=task.status == "failed")
+            # Coroutines interleave on one thread, so their spans go on each task's own track.
+            record_interval("download", elapsed, task.task_id, url=task.url)
+
+    async def download_async(
+        self,
+        session: aiohttp.ClientSession,
+        task: DownloadTask,
+        progress_callback: Optional[Callable] = None,
+        prompt_user: Optional[Callable] = None,
+    ) -> None:
+        """Async counterpart of DownloadManager.download"""
+        cancellation_event = self._start_task(task)
+        progress = self._progress_reporter(progress_callback)
+        deferred = playlist = False
+        url_type = task.choice or "unknown"
+        started, downloaded_before = time.monotonic(), task.downloaded
+
+        try:
+            url = task.url
+            logging.info(f"Attempting to download: {url}")
+            if not task.choice:
+                # The fast path needs no I/O; only probes and prompts leave the loop.
+                url_type = self.classifier.classify_fast(url)
+                if url_type in (None, "video", "media"):
+                    url_type = await self._blocking(self._classify, url, prompt_user)
+            output_folder = str(self.download_folder)
+
+            progress(task, force=True)
+            if url_type in ("video", "audio") and await self._in_pool(
+                self._expand, task, url_type, progress_callback
+            ):
+                deferred = playlist = True
+                return
+            if url_type == "video":
+                await self._in_pool(
+                    self.video_downloader.download, url, output_folder, cancellation_event, task, progress
+                )
+            elif url_type == "audio":
+                result = await self._in_pool(
+                    self.audio_downloader.download, url, output_folder, cancellation_event, task, progress
+                )
+                if isinstance(result, Future):
+                    deferred = True
+                    self._defer_conversion(task, result, progress, progress_callback)
+                    return
+            elif url_type in ("image", "pdf", "file"):
+                await self._fetch(session, task, url_type, cancellation_event, progress)
+            else:
+                logging.error(f"Unknown URL type: {url_type}")
+                task.status = "failed"
+                return
+
+            self._settle(task, cancellation_event, progress)
+
+        except Exception as e:
+            self._fail(task, cancellation_event, e, progress)
+
+        finally:
+            self.rate_limiter.release(task.url)
+            if not playlist:
+                self._observe_transfer(task, url_type, None, downloaded_before, started)
+            if not deferred:
+                self._end_task(task, cancellation_event, progress_callback)
+
+    def _observe_response(self, response: aiohttp.ClientResponse, elapsed: float) -> None:
+        """Feed an aiohttp response to the hooks HttpPool calls with requests responses"""
+        observed = SimpleNamespace(
+            url=str(response.url),
+            status_code=response.status,
+            headers=response.headers,
+            elapsed=timedelta(seconds=elapsed),
+        )
+        self.concurrency.observe_response(observed)
+        self.metrics.observe_response(observed)
+
+    async def _fetch(
+        self,
+        session: aiohttp.ClientSession,
+        task: DownloadTask,
+        url_type: str,
+        cancellation_event: CancellationToken,
+        progress: Optional[Callable] = None,
+    ) -> Optional[str]:
+        """Stream one image/file into its ``.part`` file, resuming where possible."""
+        url = task.url
+        host = urlparse(url).netloc
+        output_folder = str(self.download_folder)
+        downloader = self.image_downloader if url_type == "image" else self.file_downloader
+        cached = await self._blocking(downloader._cached, url, output_folder)
+        if cached is None:
+            file_path = await self._blocking(downloader._stored, url, output_folder)
+            if file_path:
+                return file_path
+        part_path = partial_path(output_folder, url)
+        state, offset, headers = await self._blocking(downloader._resume_request, part_path, cached)
+
+        # Images are fetched without certificate checks, as in ImageDownloader.
+        request_kwargs = {"ssl": False} if url_type == "image" else {}
+        requested = time.monotonic()
+        async with session.get(url, headers=headers, **request_kwargs) as response:
+            self._observe_response(response, time.monotonic() - requested)
+            record_interval("request", time.monotonic() - requested, task.task_id, "http", url=url)
+            action = await self._blocking(
+                downloader._interpret, url, response.status, cached, part_path, state, offset
+            )
+            if action == "not_modified":
+                return await self._blocking(downloader._not_modified, url, cached, task)
+            if action == "restart":
+                return await self._fetch(session, task, url_type, cancellation_event, progress)
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            if url_type == "image" and "image" not in content_type:
+                raise ValueError("The URL does not point to an image.")
+
+            state, offset, hasher = await self._blocking(
+                downloader._begin, url, response.status, response.headers, part_path, offset, task
+            )
+            writer = await self._blocking(downloader._part_writer, part_path, state, offset, hasher)
+            position = offset
+            # stop_download() runs on another thread; the response is closed on the loop.
+            loop = asyncio.get_running_loop()
+            unregister = cancellation_event.on_cancel(lambda: loop.call_soon_threadsafe(response.close))
+            transfer_started = time.monotonic()
+            try:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    if cancellation_event.is_set():
+                        break
+                    n = len(chunk)
+                    await self.rate_limiter.acquire_async(n, host, url, cancellation_event)
+                    buf = writer.buffer(n, timeout=0)
+                    if buf is None:
+                        # The disk is behind; wait for a free buffer off the loop.
+                        buf = await self._blocking(writer.buffer, n)
+                    memoryview(buf)[:n] = chunk
+                    writer.write(position, buf, n)
+                    position += n
+                    task.add_bytes(n)
+                    if progress:
+                        progress(task)
+            except Exception:
+                if not cancellation_event.is_set():
+                    raise
+            finally:
+                unregister()
+                record_interval("transfer", time.monotonic() - transfer_started, task.task_id, url=url)
+                await self._blocking(writer.close, position)
+            if cancellation_event.is_set():
+                await self._blocking(downloader._stopped, url, part_path, state)
+                return None
+
+        if url_type == "image":
+            file_name = self.image_downloader._file_name(response, task.filename)
+        else:
+            file_name = self.file_downloader._file_name(url, content_type)
+        file_path = os.path.join(output_folder, file_name)
+        await self._blocking(
+            downloader._finalize, url, part_path, file_path, hasher.hexdigest(), response.headers
+        )
+        return file_path
@@ -1,18 +1,37 @@
+import itertools
 import logging
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+from urllib.parse import urlparse
+import requests
+from core.cancellation import CancellationToken
+from core.concurrency import AdaptiveConcurrency, host_key
+from core.content_store import ContentStore
 from core.download_task import DownloadTask
+from core.journal import DownloadJournal
+from core.metrics import DownloadMetrics, MetricsServer
+from core.http_pool import HttpPool
 from core.priority_queue import PriorityDownloadQueue
-from core.rate_limiter import RateLimiter
+from core.progress import ProgressThrottle
+from core.rate_limiter import BandwidthLimiter
+from core.tracing import enable_tracing, record_interval, span
+from core.transcoder import TranscodeCancelled, Transcoder
+from core.validator_cache import ValidatorCache
 from downloaders.audio_downloader import AudioDownloader
 from downloaders.file_downloader import FileDownloader
 from downloaders.image_downloader import ImageDownloader
 from downloaders.video_downloader import VideoDownloader
-from utils.url_utils import determine_url_type
+from downloaders.ytdlp_pool import YoutubeDLPool
+from utils.ffmpeg import find_ffmpeg
+from utils.file_utils import state_dir
+from utils.crawler import CrawlStats, Crawler
+from utils.logging_setup import setup_logging
+from utils.url_classifier import UrlClassifier
+from utils.url_utils import determine_url_type, resolve_url_type
 
 
 class DownloadManager:
@@ -22,18 +41,51 @@ class DownloadManager:
         min_workers: int = 2,
         max_workers: int = 5,
         rate_limit: Optional[float] = None,
+        http_pool: Optional[HttpPool] = None,
+        host_rate_limit: Optional[float] = None,
+        task_rate_limit: Optional[float] = None,
+        journal: bool = True,
+        dedup: bool = True,
+        revalidate: bool = True,
+        fragment_downloads: int = 4,
+        file_segments: int = 4,
+        playlist_batch: int = 100,
+        transcode_workers: Optional[int] = None,
+        json_logs: bool = False,
+        metrics_port: Optional[int] = None,
+        trace_file: Optional[str] = None,
     ):
         """
         Initialize the Download Manager.
 
         Args:
             download_folder (str): Path to the download folder.
-            min_workers (int): Minimum number of worker threads.
-            max_workers (int): Maximum number of worker threads.
+            min_workers (int): Fewest concurrent downloads the adaptive limit may drop to.
+            max_workers (int): Most concurrent downloads the adaptive limit may grow to.
             rate_limit (float, optional): Rate limit for downloads in bytes per second.
+            http_pool (HttpPool, optional): Connection pool shared by all HTTP downloads.
+            host_rate_limit (float, optional): Default per-host rate limit in bytes per second.
+            task_rate_limit (float, optional): Default per-download rate limit in bytes per second.
+            journal (bool): Persist the queue and progress so they survive a crash or restart.
+            dedup (bool): Store identical content once (as hardlinks) and skip URLs already downloaded.
+            revalidate (bool): Re-check files from earlier runs with conditional requests
+                instead of downloading them again.
+            fragment_downloads (int): Fragments of a DASH/HLS stream fetched concurrently by yt-dlp.
+            file_segments (int): Parallel range connections per large file; 1 disables segmented mode.
+            playlist_batch (int): Playlist entries queued at a time while a playlist is expanded.
+            transcode_workers (int, optional): Concurrent ffmpeg conversions; defaults to the number of cores.
+            json_logs (bool): Write downloader.log as JSON lines. Logging is set up by the
+                first manager in the process; later ones keep that configuration.
+            metrics_port (int, optional): Serve metrics for Prometheus on this local port
+                (0 picks a free one). They are always available from ``self.metrics.snapshot()``.
+            trace_file (str, optional): Trace every download's phases and write them to this
+                file as Chrome/Perfetto trace JSON when the process exits.
         """
         self.download_folder = Path(download_folder)
         self.download_folder.mkdir(parents=True, exist_ok=True)
+        setup_logging(self.download_folder / "downloader.log", json_lines=json_logs)
+        if trace_file:
+            enable_tracing(export_to=trace_file)
 
         self.min_workers = min_workers
         self.max_workers = max_workers
@@ -46,16 +98,305 @@ class DownloadManager:
         self.active_downloads: Dict[str, Any] = {}
         self.completed_downloads: Dict[str, Any] = {}
 
-        self.rate_limiter = (
-            RateLimiter(rate_limit, int(rate_limit * 2)) if rate_limit else None
+        self.rate_limiter = BandwidthLimiter(
+            global_rate=rate_limit,
+            host_rate=host_rate_limit,
+            task_rate=task_rate_limit,
         )
 
-        self.video_downloader = VideoDownloader(download_folder)
-        self.audio_downloader = AudioDownloader(download_folder)
-        self.image_downloader = ImageDownloader(download_folder)
-        self.file_downloader = FileDownloader(download_folder)
-        self.cancellation_events: Dict[str, threading.Event] = {}
+        # All workers may be on one host, each with file_segments range requests and a probe.
+        self.http_pool = http_pool or HttpPool(pool_maxsize=max_workers * (file_segments + 1))
+        self.concurrency = self._create_concurrency()
+        self.http_pool.add_response_hook(self.concurrency.observe_response)
+        self.metrics = DownloadMetrics()
+        self.http_pool.add_response_hook(self.metrics.observe_response)
+        self.metrics_server = (
+            MetricsServer(self.metrics.registry, metrics_port) if metrics_port is not None else None
+        )
+
+        self.ytdlp_pool = YoutubeDLPool()
+        # Audio is converted in its own stage so download workers go back to the network.
+        ffmpeg = find_ffmpeg()
+        self.transcoder = Transcoder(ffmpeg, workers=transcode_workers) if ffmpeg else None
+        self.video_downloader = VideoDownloader(
+            download_folder,
+            limiter=self.rate_limiter,
+            pool=self.ytdlp_pool,
+            fragment_downloads=fragment_downloads,
+        )
+        self.audio_downloader = AudioDownloader(
+            download_folder,
+            limiter=self.rate_limiter,
+            pool=self.ytdlp_pool,
+            fragment_downloads=fragment_downloads,
+            transcoder=self.transcoder,
+        )
+        self.content_store = (
+            ContentStore(state_dir(self.download_folder) / "content.db") if dedup else None
+        )
+        self.validator_cache = (
+            ValidatorCache(state_dir(self.download_folder) / "validators.db") if revalidate else None
+        )
+        # Earlier downloads are revalidated here before dispatch, so unchanged ones never take a download slot.
+        self._revalidator = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="Revalidator") if revalidate else None
+        )
+        # HEAD responses of revalidated tasks whose file changed (None if the request failed)
+        self._probes: Dict[str, Optional[requests.Response]] = {}
+        self.image_downloader = ImageDownloader(
+            download_folder,
+            session=self.http_pool,
+            limiter=self.rate_limiter,
+            content_store=self.content_store,
+            validator_cache=self.validator_cache,
+        )
+        self.file_downloader = FileDownloader(
+            download_folder,
+            segments=file_segments,
+            session=self.http_pool,
+            limiter=self.rate_limiter,
+            content_store=self.content_store,
+            validator_cache=self.validator_cache,
+        )
+        self.classifier = UrlClassifier(session=self.http_pool)
+        self.cancellation_tokens: Dict[str, CancellationToken] = {}
+        self._by_id: Dict[str, DownloadTask] = {}
+
+        self.playlist_batch = playlist_batch
+        self._expansions: Dict[str, Iterator[dict]] = {}
+        self._entry_progress: Dict[str, tuple] = {}
+        # Entries of recovered playlists already in the journal, skipped when the playlist is expanded again
+        self._known_entries: Dict[str, Set[str]] = {}
+        self._playlist_lock = threading.Lock()
+
+        self._wakeup = threading.Condition()
+        self._scheduler_running = False
+        self._stopping = False
+
+        self.journal = (
+            DownloadJournal(state_dir(self.download_folder) / "journal.db") if journal else None
+        )
+        if self.journal:
+            self._recover()
+
+    def _recover(self) -> None:
+        """Re-queue downloads that were pending or in flight when the journal was last written"""
+        tasks = self.journal.load_resumable()
+        for task in tasks:
+            self._track(task)
+        self._relink(tasks + self.journal.load_finished_entries())
+        # Paused downloads are listed again but wait for resume_download().
+        self.queue.extend(task for task in tasks if task.status != "paused")
+        if tasks:
+            logging.info(f"Recovered {len(tasks)} downloads from the journal")
+
+    def _relink(self, entries: List[DownloadTask]) -> None:
+        """Rebuild the entry counts and byte progress of recovered playlists from their journaled entries"""
+        by_parent: Dict[str, List[DownloadTask]] = {}
+        for entry in entries:
+            if entry.parent in self.active_downloads:
+                by_parent.setdefault(entry.parent, []).append(entry)
+        for url, children in by_parent.items():
+            playlist = self.active_downloads[url]
+            playlist.entries = len(children)
+            playlist.entries_done = playlist.entries_failed = 0
+            playlist.total_size = sum(child.total_size for child in children)
+            playlist.downloaded = sum(child.downloaded for child in children)
+            for child in children:
+                if child.status in DownloadJournal.FINISHED_STATUSES:
+                    playlist.entries_done += 1
+                    if child.status == "failed":
+                        playlist.entries_failed += 1
+                else:
+                    self._entry_progress[child.url] = (child.downloaded, child.total_size)
+            self._known_entries[url] = {child.url for child in children}
+
+    def _create_concurrency(self) -> AdaptiveConcurrency:
+        return AdaptiveConcurrency(
+            min_limit=self.min_workers,
+            max_limit=self.max_workers,
+            goodput=self._goodput,
+        )
 
+    def _goodput(self) -> float:
+        """Bytes per second of running transfers. Playlists only sum up their entries, so they are left out."""
+        return sum(task.calculate_speed() for task in list(self.active_downloads.values()) if not task.entries)
+
+    def _record(self, task: DownloadTask) -> None:
+        if not self.journal:
+            return
+        if task.status in DownloadJournal.FINISHED_STATUSES:
+            if task.entries:
+                self.journal.forget_entries(task.url)
+            # A finished entry stays journaled while its playlist runs, so recovery can count it.
+            if not task.parent or task.parent not in self.active_downloads:
+                self.journal.forget(task.url)
+                return
+        self.journal.record(task)
+
+    def _track(self, task: DownloadTask) -> None:
+        self.active_downloads[task.url] = task
+        self._by_id[task.task_id] = task
+
+    def _untrack(self, task: DownloadTask) -> None:
+        if self.active_downloads.get(task.url) is task:
+            del self.active_downloads[task.url]
+            if task.status == "completed":
+                self.completed_downloads[task.url] = task
+        self._by_id.pop(task.task_id, None)
+
+    def find_task(self, key: str) -> Optional[DownloadTask]:
+        """The queued, running or paused task with URL or task id ``key``."""
+        return self.active_downloads.get(key) or self._by_id.get(key)
+
+    def _revalidation(self, task: DownloadTask, progress_callback: Optional[Callable]) -> Optional[Future]:
+        """
+        Hand ``task`` to the revalidation pool if an earlier download of its
+        URL is still on disk; returns the pool's future, or None if the task
+        can be dispatched right away.
+        """
+        if self.validator_cache is None or task.choice in ("video", "audio") or task.url in self._probes:
+            return None
+        # A primary-key lookup and a stat, cheap enough for the scheduler thread.
+        cached = self.validator_cache.get(task.url, str(self.download_folder))
+        if cached is None:
+            return None
+        return self._revalidator.submit(self._revalidate, task, cached, progress_callback)
+
+    def _revalidate(self, task: DownloadTask, cached, progress_callback: Optional[Callable]) -> None:
+        """
+        Ask the server whether the file ``task`` downloaded before changed.
+        An unchanged file completes the task without it ever taking a
+        download slot; otherwise the task is queued again, and the response
+        is kept for the downloader so it does not probe the URL a second time.
+        """
+        if task.status != "pending":
+            return  # Stopped or paused meanwhile
+        try:
+            with span("revalidate", url=task.url):
+                response = self.http_pool.head(
+                    task.url, allow_redirects=True, timeout=10, headers=cached.conditional_headers()
+                )
+        except Exception as e:
+            logging.debug(f"Revalidation of {task.url} failed: {e}")
+            response = None
+        if response is not None and (
+            response.status_code == 304 or (response.ok and cached.matches(response.headers))
+        ):
+            self.validator_cache.touch(task.url)
+            cancellation_event = self._start_task(task)
+            task.update_progress(cached.size, cached.size)
+            started = time.monotonic()
+            self._skip_unchanged(task, self._progress_reporter(progress_callback))
+            self.rate_limiter.release(task.url)
+            self._observe_transfer(task, task.choice or "unknown", "unchanged", task.downloaded, started)
+            self._end_task(task, cancellation_event, progress_callback)
+            return
+        self._probes[task.url] = response
+        if task.status == "pending":
+            self.queue.put(task)
+
+    def _progress_reporter(self, progress_callback: Optional[Callable]) -> ProgressThrottle:
+        """Throttled per-download progress sink that also journals byte progress"""
+        def report(task: DownloadTask) -> None:
+            self._record(task)
+            playlists = self._update_playlists(task) if task.parent else ()
+            if progress_callback:
+                progress_callback(task)
+                for playlist in playlists:
+                    progress_callback(playlist)
+
+        return ProgressThrottle(report)
+
+    def _start_task(self, task: DownloadTask) -> CancellationToken:
+        """Mark ``task`` as running and record how long it waited in the queue"""
+        cancellation_event = CancellationToken()
+        self.cancellation_tokens[task.url] = cancellation_event
+        self.rate_limiter.register(task.url, urlparse(task.url).netloc)
+        task.status = "downloading"
+        task.error = None
+        logging.info(f"Task {task.url} started downloading at {datetime.now()}")
+        task.start_time = task.start_time or time.time()
+        self._record(task)
+        if task.queued_at is not None:
+            waited = time.monotonic() - task.queued_at
+            self.metrics.queued(host_key(task.url), task.choice or "unknown", waited)
+            record_interval("queue_wait", waited, task.task_id, url=task.url)
+            task.queued_at = None
+        return cancellation_event
+
+    def _classify(self, url: str, prompt_user: Optional[Callable] = None) -> str:
+        with span("classify"):
+            return determine_url_type(url, prompt_user=prompt_user, classifier=self.classifier)
+
+    def _skip_unchanged(self, task: DownloadTask, progress: Callable) -> None:
+        task.status = "completed"
+        progress(task, force=True)
+        logging.info(f"Unchanged since the last download, skipped: {task.url}")
+
+    def _defer_conversion(
+        self, task: DownloadTask, future: Future, progress: Callable, progress_callback: Optional[Callable]
+    ) -> None:
+        """Leave an audio download converting; the transcoder's future completes it"""
+        task.status = "converting"
+        progress(task, force=True)
+        future.add_done_callback(lambda done: self._conversion_finished(task, done, progress_callback))
+
+    def _settle(self, task: DownloadTask, cancellation_event: CancellationToken, progress: Callable) -> None:
+        """Set the status of a task whose downloader returned"""
+        url = task.url
+        if cancellation_event.paused:
+            task.status = "paused"
+            progress(task, force=True)
+            logging.info(f"Download paused: {url}")
+        elif cancellation_event.is_set():
+            task.status = "stopped"
+            logging.info(f"Download cancelled: {url}")
+        elif task.error:
+            task.status = "failed"
+            progress(task, force=True)
+            logging.error(f"Failed to download {url}: {task.error}")
+        else:
+            task.status = "completed"
+            if not task.total_size:
+                task.total_size = task.downloaded
+            progress(task, force=True)
+            logging.info(f"Download completed: {url}")
+
+    def _fail(
+        self, task: DownloadTask, cancellation_event: CancellationToken, error: Exception, progress: Callable
+    ) -> None:
+        """Set the status of a task whose downloader raised"""
+        if cancellation_event.paused:
+            task.status = "paused"
+        elif not cancellation_event.is_set():
+            task.status = "failed"
+            task.error = str(error)
+            progress(task, force=True)
+            logging.error(f"Failed to download {task.url}: {error}")
+
+    def _observe_transfer(
+        self, task: DownloadTask, url_type: str, outcome: Optional[str], downloaded_before: int, started: float
+    ) -> None:
+        # Audio waiting for conversion has finished its transfer.
+        outcome = outcome or ("completed" if task.status == "converting" else task.status)
+        self.metrics.finished(
+            host_key(task.url), url_type, outcome, task.downloaded - downloaded_before, time.monotonic() - started
+        )
+
+    def _end_task(
+        self, task: DownloadTask, cancellation_event: CancellationToken, progress_callback: Optional[Callable]
+    ) -> None:
+        """Release a task that no longer runs, unless it is paused"""
+        if self.cancellation_tokens.get(task.url) is cancellation_event:
+            del self.cancellation_tokens[task.url]
+        self._probes.pop(task.url, None)
+        if task.status != "paused":
+            # A paused task stays listed so it can be resumed.
+            self._untrack(task)
+        self._record(task)
+        if task.parent:
+            self._entry_finished(task, progress_callback)
 
     def download(
         self,
@@ -64,159 +405,480 @@ class DownloadManager:
         prompt_user: Optional[Callable] = None,
     ):
         """Main method to download based on URL type."""
-        cancellation_event = threading.Event()
-        self.cancellation_events[task.url] = cancellation_event
-        logging.info("It is adedddeded")
-        task.status = "downloading"
-        logging.info(f"Task {task.url} started downloading at {datetime.now()}")
-        task.start_time = time.time()
+        cancellation_event = self._start_task(task)
+        progress = self._progress_reporter(progress_callback)
+        # Set when the task outlives this call: a playlist being expanded or audio being converted
+        deferred = False
+        url_type = task.choice or "unknown"
+        started, downloaded_before = time.monotonic(), task.downloaded
+        playlist = False
 
         try:
             url = task.url
             logging.info(f"Attempting to download: {url}")
-            url_type = None
-            if task.choice:
-                url_type = task.choice
-            else:
-                determine_url_type(url, prompt_user=prompt_user)
+            if not task.choice:
+                url_type = self._classify(url, prompt_user)
             output_folder = str(self.download_folder)
 
-            if progress_callback:
-                progress_callback(task)
+            progress(task, force=True)
+            if url_type in ("video", "audio") and self._expand(task, url_type, progress_callback):
+                deferred = playlist = True
+                return
             if url_type == "video":
-                self.video_downloader.download(url, output_folder, cancellation_event)
+                self.video_downloader.download(url, output_folder, cancellation_event, task, progress)
             elif url_type == "audio":
-                self.audio_downloader.download(url, output_folder, cancellation_event)
+                result = self.audio_downloader.download(
+                    url, output_folder, cancellation_event, task, progress
+                )
+                if isinstance(result, Future):
+                    deferred = True
+                    self._defer_conversion(task, result, progress, progress_callback)
+                    return
             elif url_type == "image":
-                self.image_downloader.download(url, output_folder, task.filename, cancellation_event)
-            elif url_type == "pdf":
-                self.file_downloader.download(url, output_folder, cancellation_event)
+                self.image_downloader.download(
+                    url, output_folder, task.filename, cancellation_event, task, progress
+                )
+            elif url_type in ("pdf", "file"):
+                self.file_downloader.download(
+                    url, output_folder, cancellation_event, task, progress, probe=self._probes.pop(url, None)
+                )
             else:
                 logging.error(f"Unknown URL type: {url_type}")
                 task.status = "failed"
                 return
-            
-            if cancellation_event.is_set():
-                task.status = "stopped"
-                logging.info(f"Download cancelled: {url}")
-            else:
-                task.status = "completed"
-                task.downloaded = task.total_size = 100
-                if progress_callback:
-                    progress_callback(task)
-                logging.info(f"Download completed: {url}")
 
+            self._settle(task, cancellation_event, progress)
+
+        except Exception as e:
+            self._fail(task, cancellation_event, e, progress)
+
+        finally:
+            self.rate_limiter.release(task.url)
+            if not playlist:
+                self._observe_transfer(task, url_type, None, downloaded_before, started)
+            if not deferred:
+                self._end_task(task, cancellation_event, progress_callback)
+
+    def _conversion_finished(
+        self, task: DownloadTask, future: Future, progress_callback: Optional[Callable]
+    ) -> None:
+        """Complete an audio download once the transcoder is done with it"""
+        cancellation_event = self.cancellation_tokens.pop(task.url, None)
+        try:
+            path = future.result()
+            task.status = "completed"
+            logging.info(f"Download completed: {task.url} ({path})")
         except Exception as e:
-            if not cancellation_event.is_set():
+            if cancellation_event is not None and cancellation_event.paused:
+                # The downloaded stream is kept; resuming converts it again.
+                task.status = "paused"
+                logging.info(f"Conversion paused: {task.url}")
+            elif isinstance(e, TranscodeCancelled) or (
+                cancellation_event is not None and cancellation_event.is_set()
+            ):
+                task.status = "stopped"
+                logging.info(f"Conversion cancelled: {task.url}")
+            else:
                 task.status = "failed"
                 task.error = str(e)
-                if progress_callback:
-                    progress_callback(task)
-                logging.error(f"Failed to download {task.url}: {e}")
+                logging.error(f"Failed to convert {task.url}: {e}")
+        if task.status != "paused":
+            self._untrack(task)
+        self._record(task)
+        if progress_callback:
+            progress_callback(task)
+        if task.parent:
+            self._entry_finished(task, progress_callback)
 
-        finally:
-            if task.url in self.active_downloads:
-                del self.active_downloads[task.url]
-            
-            if task.url in self.cancellation_events:
-                del self.cancellation_events[task.url]
-
-    def queue_download(self, url: str, filename: str = "", priority: int = 0, choice=None) -> None:
-        """Add a download task to the queue with optional priority"""
+    def _expand(
+        self, task: DownloadTask, url_type: str, progress_callback: Optional[Callable] = None
+    ) -> bool:
+        """
+        If ``task`` is a playlist or channel, queue its next batch of entries
+        as child tasks and return True.
+
+        Entries are pulled lazily from yt-dlp's flat extraction, at most
+        ``playlist_batch`` per call. While entries remain, the playlist task
+        is queued again behind the batch it just added, so it continues
+        once those have been dispatched and the queue never holds more than
+        about one batch per playlist.
+        """
+        entries = self._expansions.get(task.url)
+        if entries is None:
+            info = self.ytdlp_pool.extract_info(task.url)
+            if info.get("_type") not in ("playlist", "multi_video"):
+                return False
+            entries = self._expansions[task.url] = iter(info.get("entries") or ())
+            task.choice = url_type
+            logging.info(f"Expanding playlist {task.url}")
+
+        pulled = added = 0
+        for entry in itertools.islice(entries, self.playlist_batch):
+            pulled += 1
+            entry_url = entry.get("webpage_url") or entry.get("original_url") or entry.get("url")
+            if not entry_url or "://" not in entry_url:
+                logging.info(f"Skipping playlist entry without a URL: {entry.get('id')}")
+                continue
+            if entry_url in self._known_entries.get(task.url, ()):
+                continue
+            running = self.active_downloads.get(entry_url)
+            if running is not None and running.status == "downloading":
+                continue
+            child = DownloadTask(
+                url=entry_url, filename="", priority=task.priority, choice=url_type, parent=task.url
+            )
+            if not self.queue.put(child):
+                continue
+            self._track(child)
+            self._record(child)
+            added += 1
+        with self._playlist_lock:
+            task.entries += added
+
+        if pulled < self.playlist_batch:
+            self._expansions.pop(task.url, None)
+            self._known_entries.pop(task.url, None)
+            with self._playlist_lock:
+                task.expanded = True
+            logging.info(f"Playlist {task.url} expanded into {task.entries} downloads")
+            self._finish_playlist(task, progress_callback)
+        elif task.status not in ("stopped", "paused"):
+            self.queue.put(task)
+        self._notify_scheduler()
+        return True
+
+    def _update_playlists(self, task: DownloadTask) -> List[DownloadTask]:
+        """Fold an entry's byte progress into its playlist (and theirs, for nested ones)."""
+        changed = []
+        with self._playlist_lock:
+            while task.parent:
+                playlist = self.active_downloads.get(task.parent)
+                if playlist is None:
+                    break
+                last_downloaded, last_total = self._entry_progress.get(task.url, (0, 0))
+                self._entry_progress[task.url] = (task.downloaded, task.total_size)
+                playlist.total_size += task.total_size - last_total
+                playlist.update_progress(playlist.downloaded + task.downloaded - last_downloaded)
+                changed.append(playlist)
+                task = playlist
+        return changed
+
+    def _entry_finished(self, task: DownloadTask, progress_callback: Optional[Callable]) -> None:
+        """Count a finished playlist entry and complete the playlist after its last one."""
+        if task.status not in ("completed", "failed", "stopped"):
+            return
+        playlists = self._update_playlists(task)
+        with self._playlist_lock:
+            self._entry_progress.pop(task.url, None)
+            playlist = self.active_downloads.get(task.parent)
+            if playlist is None:
+                return
+            playlist.entries_done += 1
+            if task.status == "failed":
+                playlist.entries_failed += 1
+        if progress_callback:
+            for changed in playlists:
+                progress_callback(changed)
+        self._finish_playlist(playlist, progress_callback)
+
+    def _finish_playlist(self, playlist: DownloadTask, progress_callback: Optional[Callable] = None) -> None:
+        with self._playlist_lock:
+            if not playlist.expanded or playlist.entries_done < playlist.entries:
+                return
+            if playlist.status != "downloading":
+                return
+            if playlist.entries and playlist.entries_failed == playlist.entries:
+                playlist.status = "failed"
+                playlist.error = f"all {playlist.entries} entries failed"
+            else:
+                playlist.status = "completed"
+                if playlist.entries_failed:
+                    playlist.error = f"{playlist.entries_failed} of {playlist.entries} entries failed"
+            self._entry_progress.pop(playlist.url, None)
+        self._untrack(playlist)
+        self._record(playlist)
+        logging.info(
+            f"Playlist {playlist.url} finished: {playlist.entries - playlist.entries_failed} "
+            f"of {playlist.entries} entries downloaded"
+        )
+        if progress_callback:
+            progress_callback(playlist)
+        if playlist.parent:
+            self._entry_finished(playlist, progress_callback)
+
+    def set_rate_limit(
+        self,
+        rate: Optional[float],
+        host: Optional[str] = None,
+        url: Optional[str] = None,
+    ) -> None:
+        """
+        Change a bandwidth cap while downloads are running.
+
+        Args:
+            rate (float, optional): Bytes per second, or None to lift the cap.
+            host (str, optional): Apply to this host only.
+            url (str, optional): Apply to this download only.
+        """
+        if url:
+            self.rate_limiter.set_task_rate(rate, url)
+        elif host:
+            self.rate_limiter.set_host_rate(rate, host)
+        else:
+            self.rate_limiter.set_global_rate(rate)
+        logging.info(f"Rate limit for {url or host or 'all downloads'} set to {rate}")
+
+    def queue_download(self, url: str, filename: str = "", priority: int = 0, choice=None) -> bool:
+        """Add a download task to the queue with optional priority.
+
+        Returns False if the URL is already queued or downloading.
+        """
+        running = self.active_downloads.get(url)
+        if running is not None and running.status == "downloading":
+            logging.info(f"Already downloading: {url}")
+            return False
         task = DownloadTask(url=url, filename=filename, priority=priority, choice=choice)
-        self.queue.put(task)
-        self.active_downloads[url] = task
+        if not self.queue.put(task):
+            logging.info(f"Already queued: {url}")
+            return False
+        self._track(task)
+        self._record(task)
+        self._notify_scheduler()
         logging.info(f"Queued download: {url} (priority: {priority})")
+        return True
+
+    def queue_downloads(self, urls: Iterable[str], priority: int = 0) -> int:
+        """
+        Classify and queue many URLs at once, e.g. links harvested from a page.
+
+        URLs that need a probe are probed concurrently. Pages and URLs that
+        could not be classified are skipped. Returns how many were queued.
+        """
+        urls = list(dict.fromkeys(urls))
+        kinds = self.classifier.classify_many(urls)
+        added = skipped = 0
+        for url in urls:
+            url_type = resolve_url_type(url, kinds[url])
+            if url_type in ("html", "unknown"):
+                skipped += 1
+                continue
+            running = self.active_downloads.get(url)
+            if running is not None and running.status == "downloading":
+                continue
+            task = DownloadTask(url=url, filename="", priority=priority, choice=url_type)
+            if not self.queue.put(task):
+                continue
+            self._track(task)
+            self._record(task)
+            added += 1
+        if added:
+            self._notify_scheduler()
+        logging.info(f"Queued {added} of {len(urls)} downloads ({skipped} not downloadable)")
+        return added
+
+    def crawl(self, start_urls: Iterable[str], priority: int = 0, **crawler_options) -> CrawlStats:
+        """
+        Crawl pages from ``start_urls`` and queue every matching link as soon
+        as it is found, so downloads can start while the crawl is running.
+
+        Args:
+            start_urls (Iterable[str]): Pages to start from.
+            priority (int): Priority of the queued downloads.
+            **crawler_options: Passed to Crawler (max_depth, max_pages, kinds, pattern, ...).
+        """
+        crawler = Crawler(session=self.http_pool, classifier=self.classifier, **crawler_options)
+        return crawler.crawl(
+            start_urls,
+            lambda url, kind: self.queue_download(
+                url, priority=priority, choice=resolve_url_type(url, kind)
+            ),
+        )
 
     def start_downloads(
         self,
         progress_callback: Optional[Callable] = None,
         prompt_user: Optional[Callable] = None,
+        wait_for_new: bool = False,
     ) -> None:
-        """Process download queue with dynamic thread adjustment"""
-        try:
-            active_futures = []
+        """
+        Process the download queue until it is drained.
 
-            while not self.queue.empty() or active_futures:
+        The scheduler sleeps until a task is queued or a running download
+        finishes, so it costs no CPU while waiting. How many downloads run
+        at once, overall and per host, is decided by ``self.concurrency``
+        from observed goodput, latency and errors. Tasks queued while it is
+        running are picked up by the running scheduler; calling this again
+        meanwhile returns immediately.
 
-                optimal_workers = min(
-                    self.max_workers, max(self.min_workers, len(active_futures) + 1)
-                )
+        Args:
+            progress_callback (Callable, optional): Called with the task on progress.
+            prompt_user (Callable, optional): Asked for the URL type when it is ambiguous.
+            wait_for_new (bool): Keep running on an empty queue until shutdown() is called.
+        """
+        with self._wakeup:
+            if self._scheduler_running:
+                return
+            self._scheduler_running = True
+            self._stopping = False
 
-                if len(active_futures) < optimal_workers:
-                    task = self.queue.get()
-                    if task:
-                        future = self.executor.submit(
-                            self.download, task, progress_callback, prompt_user
-                        )
-                        active_futures.append(future)
+        active = set()
+        try:
+            while True:
+                with self._wakeup:
+                    while True:
+                        self._reap(active)
+                        if self._stopping and not active:
+                            return
+                        if not self._stopping and self.concurrency.has_capacity():
+                            task = self.queue.get(blocked=self.concurrency.blocked_hosts())
+                            if task is not None:
+                                break
+                        if not active and self.queue.empty() and not wait_for_new:
+                            return
+                        self._wakeup.wait(self.concurrency.retry_in())
 
-                done, active_futures = self.wait_for_futures(active_futures)
+                revalidation = self._revalidation(task, progress_callback)
+                if revalidation is not None:
+                    active.add(revalidation)
+                    revalidation.add_done_callback(self._notify_scheduler)
+                    continue
+                host = host_key(task.url)
+                self.concurrency.started(host)
+                future = self.executor.submit(self._run, task, host, progress_callback, prompt_user)
+                active.add(future)
+                future.add_done_callback(self._notify_scheduler)
 
         except Exception as e:
             logging.error(f"Error in download manager: {e}")
             raise
+        finally:
+            with self._wakeup:
+                self._scheduler_running = False
 
-    def wait_for_futures(self, futures: list) -> tuple[list, list]:
-        """Wait for some futures to complete and handle results"""
-        done = []
-        still_active = []
-
-        for future in futures:
-            if future.done():
-                try:
-                    future.result()
-                    done.append(future)
-                except Exception as e:
-                    logging.error(f"Future failed: {e}")
-                    done.append(future)
-            else:
-                still_active.append(future)
+    def _run(self, task: DownloadTask, host: str, progress_callback, prompt_user) -> None:
+        """Run one download and report its outcome to the concurrency controller"""
+        started = time.monotonic()
+        try:
+            with span("download", url=task.url, task=task.task_id):
+                self.download(task, progress_callback, prompt_user)
+        finally:
+            self.concurrency.finished(
+                host, task.downloaded, time.monotonic() - started, failed=task.status == "failed"
+            )
 
-        return done, still_active
+    def _notify_scheduler(self, *args) -> None:
+        with self._wakeup:
+            self._wakeup.notify_all()
 
+    def _reap(self, futures: set) -> None:
+        """Drop finished futures from ``futures``, logging any that raised"""
+        for future in [f for f in futures if f.done()]:
+            futures.discard(future)
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"Future failed: {e}")
+
+    def shutdown(self, cancel_active: bool = False) -> None:
+        """
+        Stop dispatching queued tasks; the scheduler returns once running
+        downloads finish. With cancel_active, running downloads are stopped too.
+        """
+        with self._wakeup:
+            self._stopping = True
+        self._notify_scheduler()
+        if cancel_active:
+            for token in list(self.cancellation_tokens.values()):
+                token.cancel()
 
     def get_download_stats(self) -> Dict[str, Any]:
         """Get current download statistics"""
-        active_count = len(self.active_downloads)
-        completed_count = len(self.completed_downloads)
-        total_downloaded = sum(
-            task.downloaded for task in self.active_downloads.values()
-        )
+        active = list(self.active_downloads.values())
+        completed = list(self.completed_downloads.values())
+        # Playlists only sum up their entries' bytes.
+        total_downloaded = sum(task.downloaded for task in active + completed if not task.entries)
 
         return {
-            "active_downloads": active_count,
-            "completed_downloads": completed_count,
+            "active_downloads": len(active),
+            "completed_downloads": len(completed),
             "total_downloaded": total_downloaded,
-            "download_speed": sum(
-                task.speed for task in self.active_downloads.values()
-            ),
+            "download_speed": self._goodput(),
+            "connection_pool": self.http_pool.get_stats(),
+            "concurrency": self.concurrency.snapshot(),
+            "transcoder": self.transcoder.get_stats() if self.transcoder else None,
         }
 
-    def stop_download(self, url: str) -> None:
-        matching_task = next((task for task in self.active_downloads.values() if task.url == url), None)
-        
-        if matching_task:
-            url_to_stop = matching_task.url
-            
-            if url_to_stop in self.cancellation_events:
-                self.cancellation_events[url_to_stop].set()
-            
-            matching_task.status = "stopped"
-            self.active_downloads.pop(url_to_stop, None)
-            logging.info(f"Download for {url_to_stop} has been stopped.")
+    def stop_download(self, key: str) -> None:
+        """
+        Stop the download with URL or task id ``key``. A running download is
+        interrupted at once: its socket is closed, not left to time out.
+        """
+        task = self.find_task(key)
+        if task is None:
+            logging.error(f"No active download found for {key}")
+            return
+
+        token = self.cancellation_tokens.get(task.url)
+        if token is not None:
+            token.cancel()
+
+        task.status = "stopped"
+        queued = self.queue.remove(task.url)
+        self._untrack(task)
+        self._record(task)
+        logging.info(f"Download for {task.url} has been stopped.")
+
+        if self._expansions.pop(task.url, None) is not None or task.entries:
+            # Stopping a playlist stops the entries it queued.
+            for child in [t for t in list(self.active_downloads.values()) if t.parent == task.url]:
+                self.stop_download(child.url)
+        elif queued is not None and task.parent:
+            # Never dispatched, so its playlist would otherwise wait for it forever.
+            self._entry_finished(task, None)
+
+    def pause_download(self, key: str) -> bool:
+        """
+        Pause the download with URL or task id ``key``.
+
+        A queued task is taken off the queue. A running one stops at its next
+        chunk and gives its worker slot back; the partial file is kept, so
+        resume_download() continues where it left off. Returns False if there
+        was nothing to pause.
+        """
+        task = self.find_task(key)
+        if task is None or task.status not in ("pending", "downloading", "converting"):
+            return False
+        playlist = task.entries or task.url in self._expansions
+        if self.queue.remove(task.url) is not None or playlist:
+            task.status = "paused"
+            self._record(task)
+        token = self.cancellation_tokens.get(task.url)
+        if token is not None:
+            token.pause()
+        logging.info(f"Download for {task.url} paused.")
+        if playlist:
+            for child in [t for t in list(self.active_downloads.values()) if t.parent == task.url]:
+                self.pause_download(child.url)
+        return True
+
+    def resume_download(self, key: str) -> bool:
+        """Queue a paused download again; returns False if ``key`` is not paused."""
+        task = self.find_task(key)
+        # A running download counts as paused once its worker has let go of it.
+        if task is None or task.status != "paused" or task.url in self.cancellation_tokens:
+            return False
+        if task.expanded:
+            # Every entry is queued already; the playlist just waits for them again.
+            task.status = "downloading"
         else:
-            matching_task = next((task for task in self.active_downloads.values() 
-                                if url in task.url or task.url in url), None)
-            
-            if matching_task:
-                url_to_stop = matching_task.url
-                
-                if url_to_stop in self.cancellation_events:
-                    self.cancellation_events[url_to_stop].set()
-                
-                matching_task.status = "stopped"
-                self.active_downloads.pop(url_to_stop, None)
-                logging.info(f"Download for {url_to_stop} has been stopped.")
-            else:
-                logging.error(f"No active download found for {url}")
+            task.status = "pending"
+            if not self.queue.put(task):
+                return False
+        self._record(task)
+        logging.info(f"Download for {task.url} resumed.")
+        if task.entries:
+            for child in [t for t in list(self.active_downloads.values()) if t.parent == task.url]:
+                self.resume_download(child.url)
+        self._finish_playlist(task)
+        self._notify_scheduler()
+        return True
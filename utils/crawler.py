@@ -0,0 +1,242 @@
+import hashlib
+import logging
+import math
+import re
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from core.http_pool import HttpPool, default_pool
+from utils.url_classifier import HTML, UrlClassifier, kind_from_content_type
+from utils.url_utils import iter_links, normalize_url
+
+
+def _host(url: str) -> str:
+    try:
+        return urlparse(url).hostname or ""
+    except ValueError:  # e.g. an unbalanced "[" in the host
+        return ""
+
+
+def _with_scheme(url: str) -> str:
+    """``url`` with "https://" in front if it has no scheme, as typed into an address bar."""
+    url = url.strip()
+    return url if "://" in url else f"https://{url}"
+
+
+class BloomFilter:
+    """
+    Fixed-size probabilistic set for crawls too large for an exact seen-set.
+
+    ``add`` may report a new URL as already seen with probability about
+    ``error_rate`` once ``capacity`` items are stored, but never the reverse.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        Args:
+            capacity (int): Number of items the filter is sized for.
+            error_rate (float): Target false-positive rate at capacity.
+        """
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> bool:
+        """Add ``item``; returns False if it was (probably) present already."""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                added = True
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[p // 8] & (1 << (p % 8)) for p in self._positions(item))
+
+
+class SeenSet:
+    """Exact seen-set with the same ``add`` contract as BloomFilter."""
+
+    def __init__(self):
+        self._items = set()
+
+    def add(self, item: str) -> bool:
+        if item in self._items:
+            return False
+        self._items.add(item)
+        return True
+
+    def __contains__(self, item: str) -> bool:
+        return item in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+@dataclass
+class CrawlStats:
+    pages: int = 0
+    links: int = 0
+    matches: int = 0
+    errors: int = 0
+
+
+class Crawler:
+    """
+    Breadth-first crawler that harvests downloadable links.
+
+    Pages are fetched concurrently and parsed as they stream in. Every link
+    is resolved, normalized and checked against a seen-set; links whose kind
+    (see UrlClassifier) is wanted are handed to ``on_match`` as soon as they
+    are found, while other links on an allowed domain are crawled up to
+    ``max_depth``.
+    """
+
+    def __init__(
+        self,
+        session: Optional[HttpPool] = None,
+        classifier: Optional[UrlClassifier] = None,
+        max_depth: int = 2,
+        max_pages: int = 1000,
+        workers: int = 8,
+        allowed_domains: Optional[Iterable[str]] = None,
+        kinds: Iterable[str] = ("image", "file", "video", "audio"),
+        pattern: Optional[str] = None,
+        bloom_capacity: Optional[int] = None,
+    ):
+        """
+        Args:
+            session (HttpPool, optional): Pool used to fetch pages.
+            classifier (UrlClassifier, optional): Decides the kind of each link.
+            max_depth (int): Link distance from the start pages that is still crawled.
+            max_pages (int): Stop after fetching this many pages.
+            workers (int): Pages fetched concurrently.
+            allowed_domains (Iterable[str], optional): Hosts (and their subdomains) to crawl;
+                defaults to the hosts of the start URLs. Matches may be on any host.
+            kinds (Iterable[str]): Link kinds reported as matches.
+            pattern (str, optional): Regular expression a match must also contain.
+            bloom_capacity (int, optional): Use a Bloom filter sized for this many URLs
+                instead of an exact seen-set.
+        """
+        self.session = session or default_pool()
+        self.classifier = classifier or UrlClassifier(session=self.session)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.workers = workers
+        self.allowed_domains = set(allowed_domains) if allowed_domains else None
+        self.kinds = set(kinds)
+        self.pattern = re.compile(pattern) if pattern else None
+        self.bloom_capacity = bloom_capacity
+        self.stats = CrawlStats()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _allowed(self, url: str) -> bool:
+        labels = _host(url).split(".")
+        return any(".".join(labels[i:]) in self._domains for i in range(len(labels)))
+
+    def _wanted(self, url: str, kind: Optional[str]) -> bool:
+        return kind in self.kinds and (self.pattern is None or self.pattern.search(url) is not None)
+
+    def _match(self, url: str, kind: str, on_match: Callable[[str, str], None]) -> None:
+        with self._lock:
+            self.stats.matches += 1
+        try:
+            on_match(url, kind)
+        except Exception as e:
+            logging.error(f"Crawler match handler failed for {url}: {e}")
+
+    def _visit(self, url: str, depth: int, on_match: Callable[[str, str], None]) -> List[Tuple[str, int]]:
+        """Fetch one page and report its matches; returns the pages to crawl next."""
+        pages = []
+        try:
+            with self.session.get(url, stream=True) as response:
+                response.raise_for_status()
+                kind = kind_from_content_type(response.headers.get("Content-Type", ""))
+                if kind != HTML:
+                    # A link without a telling extension that turned out not to be a page.
+                    if self._wanted(url, kind):
+                        self._match(url, kind, on_match)
+                    return pages
+                with self._lock:
+                    self.stats.pages += 1
+
+                for link in iter_links(response.iter_content(64 * 1024), response.url):
+                    if self._stop.is_set():
+                        break
+                    key = normalize_url(link)
+                    with self._lock:
+                        self.stats.links += 1
+                        if not self._seen.add(key):
+                            continue
+                    kind = self.classifier.classify_fast(link)
+                    if self._wanted(link, kind):
+                        self._match(link, kind, on_match)
+                    elif kind in (None, HTML) and depth < self.max_depth and self._allowed(key):
+                        pages.append((link, depth + 1))
+        except requests.RequestException as e:
+            with self._lock:
+                self.stats.errors += 1
+            logging.info(f"Crawler could not fetch {url}: {e}")
+        except Exception as e:
+            # A bad page (or on_match) must not end the crawl; links found so far are kept.
+            with self._lock:
+                self.stats.errors += 1
+            logging.error(f"Crawler failed on {url}: {e}")
+        return pages
+
+    def crawl(self, start_urls: Iterable[str], on_match: Callable[[str, str], None]) -> CrawlStats:
+        """
+        Crawl from ``start_urls`` and call ``on_match(url, kind)`` for every wanted link.
+        Start URLs without a scheme are fetched over https.
+
+        ``on_match`` is called from worker threads while the crawl is running.
+        Returns the crawl statistics once no pages are left or ``stop`` is called.
+        """
+        self.stats = CrawlStats()
+        self._stop.clear()
+        self._seen = BloomFilter(self.bloom_capacity) if self.bloom_capacity else SeenSet()
+        start_urls = [_with_scheme(url) for url in start_urls]
+        self._domains = self.allowed_domains or {_host(normalize_url(url)) for url in start_urls}
+
+        frontier = deque()
+        for url in start_urls:
+            if self._seen.add(normalize_url(url)):
+                frontier.append((url, 0))
+        fetched = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="Crawler") as executor:
+            running = set()
+            while not self._stop.is_set():
+                while frontier and len(running) < self.workers and fetched < self.max_pages:
+                    url, depth = frontier.popleft()
+                    running.add(executor.submit(self._visit, url, depth, on_match))
+                    fetched += 1
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    frontier.extend(future.result())
+            for future in running:
+                future.cancel()
+
+        logging.info(
+            f"Crawl finished: {self.stats.pages} pages, {self.stats.links} links, "
+            f"{self.stats.matches} matches, {self.stats.errors} errors"
+        )
+        return self.stats
@@ -0,0 +1,32 @@
+import functools
+import logging
+import os
+import shutil
+from typing import Optional
+
+# Install locations checked when ffmpeg is not on PATH
+FFMPEG_PATHS = (
+    "/usr/bin/ffmpeg",
+    "/usr/local/bin/ffmpeg",
+    "/opt/homebrew/bin/ffmpeg",
+    "C:\\Program Files\\FFmpeg\\bin\\ffmpeg.exe",
+    "C:\\Program Files (x86)\\FFmpeg\\bin\\ffmpeg.exe",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def find_ffmpeg() -> Optional[str]:
+    """
+    Path of the ffmpeg executable, or None if it is not installed.
+
+    Looks at the FFMPEG_PATH environment variable, then PATH, then the usual
+    install locations. The result is cached, so the search runs once per
+    process.
+    """
+    candidates = [os.environ.get("FFMPEG_PATH"), shutil.which("ffmpeg"), *FFMPEG_PATHS]
+    for path in candidates:
+        if path and os.path.isfile(path) and os.access(path, os.X_OK):
+            logging.info(f"Using ffmpeg at {path}")
+            return path
+    logging.info("ffmpeg not found; audio cannot be converted")
+    return None
@@ -1,4 +1,5 @@
 import re
+from pathlib import Path
 
 
 def sanitize_filename(filename):
@@ -14,3 +15,19 @@ def sanitize_filename(filename):
     sanitized = re.sub(r'[<>:"/\\|?*]', "", filename)
     sanitized = sanitized[:255]
     return sanitized.strip() or "downloaded_audio"
+
+
+def state_dir(download_folder):
+    """
+    Hidden folder inside a download folder for the manager's own state files
+    (journal, indexes, caches). Created on first use.
+
+    Args:
+        download_folder (str | Path): The download folder
+
+    Returns:
+        Path: The state folder
+    """
+    path = Path(download_folder) / ".downloader"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
@@ -0,0 +1,208 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+FILE_FORMAT = "%(asctime)s - %(threadName)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed with ``extra=``.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any fields passed with ``extra=``."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per call site, so a message logged for every chunk or
+    progress hook cannot flood the log. Records at ``max_level`` and above
+    always pass. The first message let through after some were dropped
+    says how many.
+    """
+
+    def __init__(self, rate: float = 5.0, burst: int = 20, max_level: int = logging.INFO):
+        """
+        Args:
+            rate (float): Messages per second allowed from one call site.
+            burst (int): Messages a quiet call site may log at once.
+            max_level (int): Lowest level that is never limited.
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        self._buckets: Dict[Tuple[str, int], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.max_level:
+            return True
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # [tokens, last refill, messages dropped]
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            dropped, bucket[2] = bucket[2], 0
+        if dropped:
+            record.msg = f"{record.getMessage()} ({dropped} similar messages suppressed)"
+            record.args = None
+        return True
+
+
+class _BatchFileHandler(logging.FileHandler):
+    """File handler that leaves flushing to the writer, once per batch."""
+
+    def flush(self) -> None:
+        pass
+
+    def flush_batch(self) -> None:
+        super().flush()
+
+
+class _LogWriter:
+    """Background thread that drains the log queue and writes it in batches."""
+
+    def __init__(self, records: queue.SimpleQueue, handlers: List[logging.Handler], batch_size: int = 512):
+        self.records = records
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread = threading.Thread(target=self._run, name="LogWriter", daemon=True)
+        self._thread.start()
+
+    def _handle(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _run(self) -> None:
+        while True:
+            record = self.records.get()
+            stop = record is None
+            if not stop:
+                self._handle(record)
+            # Everything that queued up meanwhile goes out with a single flush.
+            for _ in range(self.batch_size):
+                try:
+                    record = self.records.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    continue
+                self._handle(record)
+            for handler in self.handlers:
+                if isinstance(handler, _BatchFileHandler):
+                    handler.flush_batch()
+            if stop:
+                return
+
+    def stop(self) -> None:
+        self.records.put(None)
+        self._thread.join()
+        for handler in self.handlers:
+            handler.close()
+
+
+_writer: Optional[_LogWriter] = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(
+    log_file: Optional[Union[str, Path]] = None,
+    json_lines: bool = False,
+    level: int = logging.DEBUG,
+    console_level: int = logging.INFO,
+    rate: Optional[float] = 5.0,
+    burst: int = 20,
+) -> bool:
+    """
+    Configure process-wide logging once; later calls change nothing.
+
+    Log calls only put the record on a queue. A background thread writes
+    it to the console and ``log_file``, flushing the file once per batch,
+    so download threads never wait on log I/O.
+
+    Args:
+        log_file (str, optional): File that gets every record at ``level`` and above.
+        json_lines (bool): Write the file as JSON lines instead of text.
+        level (int): Lowest level logged at all.
+        console_level (int): Lowest level printed to the console.
+        rate (float, optional): Debug messages per second allowed per call site;
+            None disables rate limiting.
+        burst (int): Messages a call site may log at once before ``rate`` applies.
+
+    Returns:
+        bool: True if this call configured logging.
+    """
+    global _writer
+    with _setup_lock:
+        if _writer is not None:
+            return False
+
+        console = logging.StreamHandler(sys.stderr)
+        console.setLevel(console_level)
+        console.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers: List[logging.Handler] = [console]
+        if log_file is not None:
+            file_handler = _BatchFileHandler(log_file, encoding="utf-8")
+            file_handler.setLevel(level)
+            file_handler.setFormatter(JsonFormatter() if json_lines else logging.Formatter(FILE_FORMAT))
+            handlers.append(file_handler)
+
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(records)
+        if rate is not None:
+            queue_handler.addFilter(RateLimitFilter(rate, burst))
+
+        root = logging.getLogger()
+        root.handlers.clear()
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+        _writer = _LogWriter(records, handlers)
+        atexit.register(shutdown_logging)
+        return True
+
+
+def shutdown_logging() -> None:
+    """Write out queued records and close the log file."""
+    global _writer
+    with _setup_lock:
+        writer, _writer = _writer, None
+        if writer is None:
+            return
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                root.removeHandler(handler)
+    writer.stop()
@@ -0,0 +1,204 @@
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+from urllib.parse import unquote
+
+import requests
+
+from core.http_pool import HttpPool, default_pool
+from utils.cache import TTLCache
+from utils.url_utils import normalize_url
+
+
+# URL kinds. "media" is an extractor page (e.g. a YouTube watch URL) that can
+# be fetched as video or audio; the caller decides which.
+VIDEO, AUDIO, IMAGE, FILE, HTML, MEDIA, UNKNOWN = (
+    "video", "audio", "image", "file", "html", "media", "unknown"
+)
+
+EXTENSION_KINDS = {
+    **dict.fromkeys(
+        ("mp4", "m4v", "mkv", "webm", "mov", "avi", "wmv", "flv", "mpg", "mpeg", "3gp", "ts", "m3u8", "mpd"),
+        VIDEO,
+    ),
+    # Direct audio files are saved as they are; AUDIO means extracting and converting a stream.
+    **dict.fromkeys(("mp3", "m4a", "aac", "wav", "flac", "ogg", "oga", "opus", "wma", "aiff"), FILE),
+    **dict.fromkeys(
+        ("jpg", "jpeg", "png", "gif", "webp", "bmp", "svg", "ico", "tif", "tiff", "avif", "heic"),
+        IMAGE,
+    ),
+    **dict.fromkeys(
+        (
+            "pdf", "zip", "gz", "tgz", "bz2", "xz", "7z", "rar", "tar", "iso", "dmg", "exe", "msi",
+            "deb", "rpm", "apk", "jar", "whl", "bin", "doc", "docx", "xls", "xlsx", "ppt", "pptx",
+            "odt", "ods", "epub", "csv", "json", "xml", "txt", "srt", "vtt",
+        ),
+        FILE,
+    ),
+    **dict.fromkeys(("html", "htm", "xhtml"), HTML),
+}
+
+# Sites handled by a yt-dlp extractor; subdomains match too.
+EXTRACTOR_DOMAINS = {
+    **dict.fromkeys(
+        (
+            "youtube.com", "youtu.be", "youtube-nocookie.com", "vimeo.com", "dailymotion.com", "dai.ly",
+            "twitch.tv", "tiktok.com", "facebook.com", "fb.watch", "instagram.com", "rumble.com",
+        ),
+        MEDIA,
+    ),
+    **dict.fromkeys(("soundcloud.com", "bandcamp.com", "mixcloud.com", "audiomack.com"), AUDIO),
+}
+
+STREAMING_CONTENT_TYPES = ("application/vnd.apple.mpegurl", "application/x-mpegurl", "application/dash+xml")
+
+
+def _split(url: str):
+    """Host and path of a normalized URL."""
+    parts = url.split("/", 3)
+    host = parts[2] if len(parts) > 2 else ""
+    path = "/" + parts[3] if len(parts) > 3 else "/"
+    host = host.rpartition("@")[2].split(":", 1)[0]
+    return host, path.split("?", 1)[0]
+
+
+def kind_from_content_type(content_type: str) -> str:
+    content_type = content_type.split(";", 1)[0].strip().lower()
+    if content_type.startswith("video/") or content_type in STREAMING_CONTENT_TYPES:
+        return VIDEO
+    if content_type.startswith("image/"):
+        return IMAGE
+    if content_type in ("text/html", "application/xhtml+xml"):
+        return HTML
+    return FILE
+
+
+class UrlClassifier:
+    """
+    Decides what kind of resource a URL points to.
+
+    Most URLs are classified from their host and extension alone, without a
+    request. The rest are probed with HEAD; results are kept in an LRU+TTL
+    cache keyed by normalized URL, and hosts whose probes fail are
+    remembered for a short while so a dead host does not cost one timeout
+    per URL. ``classify_many`` probes a batch concurrently.
+    """
+
+    def __init__(
+        self,
+        session: Optional[HttpPool] = None,
+        cache_size: int = 100_000,
+        ttl: float = 3600,
+        failure_ttl: float = 60,
+        probe_timeout: float = 5,
+        max_workers: int = 32,
+    ):
+        """
+        Args:
+            session (HttpPool, optional): Pool used for probes; defaults to the shared pool.
+            cache_size (int): Maximum number of cached probe results.
+            ttl (float): Seconds a probe result stays valid.
+            failure_ttl (float): Seconds a host is skipped after a failed probe.
+            probe_timeout (float): Timeout for each probe request.
+            max_workers (int): Concurrent probes in classify_many.
+        """
+        self.session = session
+        self.probe_timeout = probe_timeout
+        self.max_workers = max_workers
+        self.failure_ttl = failure_ttl
+        self._cache = TTLCache(cache_size, ttl)
+        self._failed_hosts = TTLCache(4096, failure_ttl)
+
+    def classify_fast(self, url: str) -> Optional[str]:
+        """Kind from the URL alone, or None if a probe is needed."""
+        host, path = _split(normalize_url(url))
+        labels = host.split(".")
+        for i in range(len(labels) - 1):
+            kind = EXTRACTOR_DOMAINS.get(".".join(labels[i:]))
+            if kind:
+                return kind
+        name = posixpath.basename(unquote(path))
+        _, dot, extension = name.rpartition(".")
+        if dot:
+            return EXTENSION_KINDS.get(extension.lower())
+        return None
+
+    def classify(self, url: str) -> str:
+        """Kind of ``url``, probing the server only if the URL itself does not tell."""
+        kind = self.classify_fast(url)
+        if kind:
+            return kind
+        key = normalize_url(url)
+        kind = self._cache.get(key)
+        if kind is None:
+            kind = self._probe(url, key)
+        return kind
+
+    def classify_many(self, urls: Iterable[str]) -> Dict[str, str]:
+        """Classify a batch of URLs, probing the uncached ones concurrently."""
+        results = {}
+        to_probe = {}
+        for url in urls:
+            kind = self.classify_fast(url)
+            if kind is None:
+                key = normalize_url(url)
+                kind = self._cache.get(key)
+                if kind is None:
+                    to_probe.setdefault(key, []).append(url)
+                    continue
+            results[url] = kind
+
+        if to_probe:
+            workers = min(self.max_workers, len(to_probe))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Classifier") as executor:
+                probes = {
+                    key: executor.submit(self._probe, urls_for_key[0], key)
+                    for key, urls_for_key in to_probe.items()
+                }
+                for key, future in probes.items():
+                    kind = future.result()
+                    for url in to_probe[key]:
+                        results[url] = kind
+        return results
+
+    def _probe(self, url: str, key: str) -> str:
+        host, _ = _split(key)
+        if host in self._failed_hosts:
+            return UNKNOWN
+        session = self.session or default_pool()
+        try:
+            response = session.head(url, allow_redirects=True, timeout=self.probe_timeout)
+            if response.status_code in (403, 405, 501):
+                # Some servers refuse HEAD; the headers of a GET are just as good.
+                with session.get(url, allow_redirects=True, stream=True, timeout=self.probe_timeout) as response:
+                    pass
+        except (requests.ConnectionError, requests.Timeout) as e:
+            logging.info(f"Probe of {url} failed: {e}")
+            self._failed_hosts.put(host, True)
+            return UNKNOWN
+        except requests.RequestException as e:
+            logging.info(f"Probe of {url} failed: {e}")
+            return UNKNOWN
+
+        if response.status_code >= 400:
+            kind = UNKNOWN
+            self._cache.put(key, kind, ttl=self.failure_ttl)
+        else:
+            kind = kind_from_content_type(response.headers.get("Content-Type", ""))
+            self._cache.put(key, kind)
+        return kind
+
+
+_default_classifier: Optional[UrlClassifier] = None
+_default_classifier_lock = threading.Lock()
+
+
+def default_classifier() -> UrlClassifier:
+    """Process-wide classifier used when no classifier is injected."""
+    global _default_classifier
+    with _default_classifier_lock:
+        if _default_classifier is None:
+            _default_classifier = UrlClassifier()
+        return _default_classifier
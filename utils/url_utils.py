@@ -1,46 +1,115 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
-from typing import List, Optional
+import logging
+import re
+from typing import Iterable, Iterator, Optional
+from urllib.parse import urldefrag, urljoin
 
+from lxml import etree
 
-def extract_links(url):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
+from core.http_pool import HttpPool, default_pool
+
+
+_DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+_URL_PARTS = re.compile(r"([A-Za-z][A-Za-z0-9+.-]*)://([^/?#]*)([^?#]*)(\?[^#]*)?")
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for duplicate detection: lower-case scheme and
+    host, default port and fragment dropped, empty path replaced by "/".
+    URLs without an authority part are returned stripped but otherwise as-is.
+    """
+    url = url.strip()
+    match = _URL_PARTS.match(url)
+    if match is None:
+        return url
+    scheme, netloc, path, query = match.groups()
+    scheme = scheme.lower()
+    userinfo, at, host = netloc.rpartition("@")
+    host = host.lower()
+    default_port = _DEFAULT_PORTS.get(scheme)
+    if default_port and host.endswith(default_port):
+        host = host[: -len(default_port)]
+    return f"{scheme}://{userinfo}{at}{host}{path or '/'}{query or ''}"
+
+
+# Tags whose attribute points at something a crawler may want
+LINK_ATTRIBUTES = {
+    "a": "href",
+    "area": "href",
+    "img": "src",
+    "source": "src",
+    "video": "src",
+    "audio": "src",
+    "embed": "src",
+}
+
+
+def iter_links(chunks: Iterable[bytes], base_url: str) -> Iterator[str]:
+    """
+    Yield absolute link targets from an HTML document as it arrives.
+
+    ``chunks`` are fed to an incremental lxml parser, so links are produced
+    while the page is still downloading. Fragments are dropped and
+    ``<base href>`` is honoured.
+    """
+    parser = etree.HTMLPullParser(events=("start",), tag=("base", *LINK_ATTRIBUTES))
+    base = base_url
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        links = [a["href"] for a in soup.find_all("a", href=True)]
+    def drain():
+        nonlocal base
+        for _, element in parser.read_events():
+            if element.tag == "base":
+                if element.get("href"):
+                    base = urljoin(base_url, element.get("href").strip())
+                continue
+            value = element.get(LINK_ATTRIBUTES[element.tag])
+            if value:
+                link = urldefrag(urljoin(base, value.strip()))[0]
+                if link.startswith(("http://", "https://")):
+                    yield link
 
-        return links
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from drain()
+    parser.close()
+    yield from drain()
+
+
+def extract_links(url, session: Optional[HttpPool] = None):
+    """Absolute, de-duplicated link targets found on the page at ``url``."""
+    try:
+        with (session or default_pool()).get(url, stream=True) as response:
+            response.raise_for_status()
+            return list(dict.fromkeys(iter_links(response.iter_content(64 * 1024), response.url)))
     except Exception as e:
-        print(f"Failed to extract links: {e}")
+        logging.error(f"Failed to extract links: {e}")
         return []
 
 
-def determine_url_type(url: str, prompt_user=None) -> str:
-    """Determine the type of the given URL with optional user interaction."""
-    try:
-        parsed_url = urlparse(url)
-        if "youtube.com" in parsed_url.netloc or "facebook" or "youtu.be" in parsed_url.netloc:
-            if prompt_user:
-                return prompt_user(url)
-            return "audio"
-
-        response = requests.head(url, allow_redirects=True, timeout=10)
-        content_type = response.headers.get("Content-Type", "").lower()
-        print(content_type)
-
-        if "video" in content_type:
-            if prompt_user:
-                return prompt_user(url)
-        elif "audio" in content_type:
-            return "audio"
-        elif "image" in content_type:
-            return "image"
-        elif "text/html" in content_type:
-            return "html"
-        else:
-            return "file"
-    except requests.RequestException:
-        return "unknown"
+def determine_url_type(url: str, prompt_user=None, classifier=None) -> str:
+    """
+    Determine the type of the given URL with optional user interaction.
+
+    Returns one of "video", "audio", "image", "file", "html" or "unknown".
+    Extractor pages and video streams are offered to ``prompt_user``, which
+    picks the download type; without it they default to audio and video.
+    Callers with their own connection pool pass a long-lived ``classifier``
+    built on it, so its cache outlives the call.
+    """
+    from utils.url_classifier import default_classifier
+
+    if classifier is None:
+        classifier = default_classifier()
+    kind = classifier.classify(url)
+    return resolve_url_type(url, kind, prompt_user)
+
+
+def resolve_url_type(url: str, kind: str, prompt_user=None) -> str:
+    """Turn a classifier kind into a download type, asking the user where it is ambiguous."""
+    from utils.url_classifier import MEDIA, VIDEO
+
+    if kind in (MEDIA, VIDEO) and prompt_user:
+        return prompt_user(url)
+    if kind == MEDIA:
+        return "audio"
+    return kind